@@ -23,12 +23,27 @@ class Settings(BaseSettings):
     # --- STORAGE CONFIG ---
     LOCAL_STORAGE_DIR: str = os.getenv("STORAGE_DIR", "./storage")
     MAX_IMAGE_WIDTH: int = int(os.getenv("MAX_IMAGE_WIDTH", "1280"))
+    UPLOAD_JPEG_QUALITY: int = int(os.getenv("UPLOAD_JPEG_QUALITY", "92"))
+    KEEP_ORIGINAL_UPLOADS: bool = os.getenv("KEEP_ORIGINAL_UPLOADS", "false").lower() == "true"
     
     # --- MODEL CONFIG ---
     MODEL_PATH: str = os.getenv("MODEL_PATH", "app/models/model_final.pth")
-    MODEL_CONFIDENCE_THRESHOLD: float = float(os.getenv("MODEL_CONFIDENCE_THRESHOLD", "0.5"))
-    MODEL_DEVICE: str = os.getenv("MODEL_DEVICE", "cuda")  # "cuda" or "cpu"
+    MODEL_CONFIDENCE_THRESHOLD: float = float(os.getenv("MODEL_CONFIDENCE_THRESHOLD", "0.5"))  # Operating threshold (evaluation time)
+    MODEL_SCORE_FLOOR: float = float(os.getenv("MODEL_SCORE_FLOOR", "0.05"))  # Detections stored down to this score
+    MODEL_DEVICE: str = os.getenv("MODEL_DEVICE", "cuda")  # "cuda" or "cpu" (falls back to cpu if CUDA unavailable)
     MODEL_VERSION: str = os.getenv("MODEL_VERSION", "v1.0")
+    MODEL_BACKEND: str = os.getenv("MODEL_BACKEND", "detectron2")  # "detectron2" or "onnxruntime"
+    MODEL_ONNX_PATH: str = os.getenv("MODEL_ONNX_PATH", "app/models/model_final.onnx")
+    MODEL_EXPORT_SCORE_THRESH: float = float(os.getenv("MODEL_EXPORT_SCORE_THRESH", "0.05"))  # Lowest score kept in the ONNX graph (MODEL_SCORE_FLOOR must not be below it)
+    MODEL_ONNX_REQUIRE_PARITY: bool = os.getenv("MODEL_ONNX_REQUIRE_PARITY", "true").lower() == "true"  # Only load ONNX graphs that passed the export parity check
+    MODEL_REGISTRY: str = os.getenv("MODEL_REGISTRY", "")  # JSON {version: {"path", "backend"}} of extra models
+    MODEL_REGISTRY_MAX_MB: int = int(os.getenv("MODEL_REGISTRY_MAX_MB", "2048"))  # Estimated size of the models kept loaded per worker; 0 = no size cap
+    MODEL_REGISTRY_MAX_LOADED: int = int(os.getenv("MODEL_REGISTRY_MAX_LOADED", "0"))  # Optional count cap on top; 0 = none
+    ORT_INTRA_OP_THREADS: int = int(os.getenv("ORT_INTRA_OP_THREADS", "0"))  # 0 = onnxruntime default
+    TORCH_NUM_THREADS: int = int(os.getenv("TORCH_NUM_THREADS", "0"))  # 0 = all CPUs
+    INFERENCE_PRELOAD_MODEL: bool = os.getenv("INFERENCE_PRELOAD_MODEL", "true").lower() == "true"  # Load before fork (detectron2 on cpu only: CUDA does not survive fork) + warm up
+    INFERENCE_WARMUP_IMAGE: str = os.getenv("INFERENCE_WARMUP_IMAGE", "templates/normal.jpg")
+    INFERENCE_WARMUP_TIMEOUT: float = float(os.getenv("INFERENCE_WARMUP_TIMEOUT", "120"))  # Seconds a child may spend in warm-up before the pool gives up on it
     
     # --- CELERY CONFIG ---
     CELERY_BROKER_URL: str = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
@@ -38,9 +53,63 @@ class Settings(BaseSettings):
     CELERY_ACCEPT_CONTENT: list[str] = ["json"]
     CELERY_TIMEZONE: str = "UTC"
     CELERY_ENABLE_UTC: bool = True
+    CELERY_INTERACTIVE_QUEUE: str = os.getenv("CELERY_INTERACTIVE_QUEUE", "interactive")  # Single frames, small batches, orchestration
+    CELERY_BULK_QUEUE: str = os.getenv("CELERY_BULK_QUEUE", "bulk")  # Large (re-)evaluations, re-thresholds
+    INTERACTIVE_MAX_FRAMES: int = int(os.getenv("INTERACTIVE_MAX_FRAMES", "16"))  # Batches up to this many frames use the interactive queue
+    
+    # --- FIRESTORE BULK I/O (workers) ---
+    FIRESTORE_READ_BATCH_SIZE: int = int(os.getenv("FIRESTORE_READ_BATCH_SIZE", "300"))  # Documents per get_all call
+    FIRESTORE_WRITE_BATCH_SIZE: int = int(os.getenv("FIRESTORE_WRITE_BATCH_SIZE", "500"))  # Max 500 (Firestore limit)
+    FIRESTORE_WRITE_FLUSH_SECONDS: float = float(os.getenv("FIRESTORE_WRITE_FLUSH_SECONDS", "5"))
+    FIRESTORE_WRITE_RETRIES: int = int(os.getenv("FIRESTORE_WRITE_RETRIES", "3"))  # Commit attempts per chunk
     
     # --- INFERENCE CONFIG ---
-    INFERENCE_MAX_WORKERS: int = int(os.getenv("INFERENCE_MAX_WORKERS", "2"))  # Parallel workers
+    INFERENCE_MAX_WORKERS: int = int(os.getenv("INFERENCE_MAX_WORKERS", "2"))  # Chunks a batch is split into (one Celery task each)
+    INFERENCE_BATCH_SIZE: int = int(os.getenv("INFERENCE_BATCH_SIZE", "4"))  # Images per forward pass
+    INFERENCE_BATCH_WINDOW: int = int(os.getenv("INFERENCE_BATCH_WINDOW", "4"))  # Batches decoded together for resolution grouping
+    INFERENCE_PREFETCH_DEPTH: int = int(os.getenv("INFERENCE_PREFETCH_DEPTH", "16"))  # Max frames decoded ahead of the model
+    INFERENCE_DECODE_THREADS: int = int(os.getenv("INFERENCE_DECODE_THREADS", "2"))  # Threads reading/decoding frames
+    INFERENCE_TASK_TIME_BUDGET: int = int(os.getenv("INFERENCE_TASK_TIME_BUDGET", "180"))  # Seconds per task before continuing in a new one (soft limit is 240)
+    INFERENCE_RETURN_MASKS: bool = os.getenv("INFERENCE_RETURN_MASKS", "false").lower() == "true"  # Run the Mask R-CNN mask head
+
+    # --- REDIS (progress store; defaults to the Celery broker) ---
+    REDIS_URL: str = os.getenv("REDIS_URL", os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0"))
+    REDIS_SOCKET_TIMEOUT: float = float(os.getenv("REDIS_SOCKET_TIMEOUT", "0.5"))  # Seconds; Firestore fallback after that
+    PROGRESS_STORE_ENABLED: bool = os.getenv("PROGRESS_STORE_ENABLED", "true").lower() == "true"
+    PROGRESS_STORE_TTL: int = int(os.getenv("PROGRESS_STORE_TTL", "86400"))  # Seconds a finished run stays in Redis
+    PROGRESS_EVENTS_MAXLEN: int = int(os.getenv("PROGRESS_EVENTS_MAXLEN", "10000"))  # Events kept per batch (resume window)
+    PROGRESS_EVENTS_KEEPALIVE: int = int(os.getenv("PROGRESS_EVENTS_KEEPALIVE", "15"))  # Seconds between SSE keep-alives
+    BATCH_LOCK_TTL: int = int(os.getenv("BATCH_LOCK_TTL", "1800"))  # Seconds a batch job's lease lasts without a refresh (covers queue wait)
+
+    # --- STAGE METRICS (Prometheus, optional prometheus_client) ---
+    METRICS_PORT: int = int(os.getenv("METRICS_PORT", "0"))  # Worker /metrics port; 0 = off
+    METRICS_PORT_SPAN: int = int(os.getenv("METRICS_PORT_SPAN", "8"))  # Next ports tried when METRICS_PORT is taken (several workers per host)
+    METRICS_MULTIPROC_DIR: str = os.getenv("METRICS_MULTIPROC_DIR", "./cache/prometheus_multiproc")  # Per-child sample files (one subdirectory per worker)
+
+    # --- EVALUATION PROGRESS (frame status writes while a batch runs) ---
+    EVAL_PROGRESS_FLUSH_FRAMES: int = int(os.getenv("EVAL_PROGRESS_FLUSH_FRAMES", "10"))  # Flush after this many frames...
+    EVAL_PROGRESS_FLUSH_SECONDS: float = float(os.getenv("EVAL_PROGRESS_FLUSH_SECONDS", "5"))  # ...or this many seconds
+
+    # --- RESOLUTION CASCADE (low-res pass, full-res only when ambiguous) ---
+    INFERENCE_CASCADE_ENABLED: bool = os.getenv("INFERENCE_CASCADE_ENABLED", "false").lower() == "true"
+    INFERENCE_CASCADE_MIN_SIZE: int = int(os.getenv("INFERENCE_CASCADE_MIN_SIZE", "512"))
+    INFERENCE_CASCADE_MAX_SIZE: int = int(os.getenv("INFERENCE_CASCADE_MAX_SIZE", "800"))
+    INFERENCE_CASCADE_MARGIN: float = float(os.getenv("INFERENCE_CASCADE_MARGIN", "0.15"))  # Polar body confidence band around threshold
+
+    # --- INFERENCE SERVER (one model per node, micro-batched; empty URL = in-process) ---
+    INFERENCE_SERVER_URL: str = os.getenv("INFERENCE_SERVER_URL", "")  # e.g. "http://127.0.0.1:8765"
+    INFERENCE_SERVER_HOST: str = os.getenv("INFERENCE_SERVER_HOST", "127.0.0.1")
+    INFERENCE_SERVER_PORT: int = int(os.getenv("INFERENCE_SERVER_PORT", "8765"))
+    INFERENCE_SERVER_BATCH_WINDOW_MS: int = int(os.getenv("INFERENCE_SERVER_BATCH_WINDOW_MS", "10"))  # Wait for more requests
+    INFERENCE_SERVER_MAX_BATCH: int = int(os.getenv("INFERENCE_SERVER_MAX_BATCH", "16"))  # Images collected per batching round
+    INFERENCE_SERVER_TIMEOUT: int = int(os.getenv("INFERENCE_SERVER_TIMEOUT", "120"))  # Request timeout (seconds), plus the per-image part below
+    INFERENCE_SERVER_TIMEOUT_PER_IMAGE: float = float(os.getenv("INFERENCE_SERVER_TIMEOUT_PER_IMAGE", "2"))  # Added per image in the request
+    INFERENCE_SERVER_MAX_QUEUED: int = int(os.getenv("INFERENCE_SERVER_MAX_QUEUED", "256"))  # Images waiting before new requests get 503
+
+    # --- INFERENCE CACHE (per worker node) ---
+    INFERENCE_CACHE_ENABLED: bool = os.getenv("INFERENCE_CACHE_ENABLED", "true").lower() == "true"
+    INFERENCE_CACHE_PATH: str = os.getenv("INFERENCE_CACHE_PATH", "./cache/inference_cache.sqlite3")
+    INFERENCE_CACHE_MAX_MB: int = int(os.getenv("INFERENCE_CACHE_MAX_MB", "512"))
 
     # Class Config: 
     class Config:
@@ -0,0 +1,162 @@
+# app/core/firestore_batch.py
+import time
+from typing import List, Optional, Set, Tuple
+from celery.exceptions import SoftTimeLimitExceeded
+from google.api_core import exceptions as google_exceptions
+from app.config import settings
+from app.core import metrics
+from app.core.firebase import db
+
+# Firestore rejects a WriteBatch with more than 500 operations
+MAX_BATCH_OPS = 500
+
+# Worth retrying as is; any other error is about the writes themselves
+_TRANSIENT_ERRORS = (
+    google_exceptions.Aborted,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.InternalServerError,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    ConnectionError,
+    TimeoutError,
+)
+
+
+class BufferedWriter:
+    """
+    Buffer document writes (update / set / delete) and commit them through
+    Firestore WriteBatch
+
+    Writes are flushed when max_ops are buffered or when flush_interval
+    seconds have passed since the last flush (checked on each write), and
+    on flush() / leaving the `with` block. Transient commit errors are
+    retried with backoff. A WriteBatch is all-or-nothing, so on any other
+    error (e.g. NOT_FOUND for one update) the chunk is split in halves and
+    committed again until the bad documents are isolated; only those are
+    collected in `failed_ids` so the caller can account for them. Given a
+    metric_stage (e.g. "persist" for frame results), commit time per
+    document is recorded as that stage metric.
+
+    Usage:
+        with BufferedWriter() as writer:
+            writer.update(db.collection("frames").document(frame_id), {...})
+        if writer.failed_ids: ...
+    """
+
+    def __init__(
+        self,
+        max_ops: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        retries: Optional[int] = None,
+        metric_stage: Optional[str] = None
+    ):
+        self.max_ops = min(MAX_BATCH_OPS, max(1, max_ops or settings.FIRESTORE_WRITE_BATCH_SIZE))
+        self.flush_interval = (
+            flush_interval if flush_interval is not None else settings.FIRESTORE_WRITE_FLUSH_SECONDS
+        )
+        self.retries = max(1, retries or settings.FIRESTORE_WRITE_RETRIES)
+        self.metric_stage = metric_stage
+        self.failed_ids: Set[str] = set()
+        self._pending: List[Tuple[str, object, Optional[dict]]] = []
+        self._last_flush = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+
+    def update(self, doc_ref, data: dict):
+        """Queue doc_ref.update(data); may trigger a flush"""
+        self._add("update", doc_ref, data)
+
+    def set(self, doc_ref, data: dict):
+        """Queue doc_ref.set(data); may trigger a flush"""
+        self._add("set", doc_ref, data)
+
+    def delete(self, doc_ref):
+        """Queue doc_ref.delete(); may trigger a flush"""
+        self._add("delete", doc_ref, None)
+
+    def _add(self, op: str, doc_ref, data: Optional[dict]):
+        self._pending.append((op, doc_ref, data))
+        if (
+            len(self._pending) >= self.max_ops
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush(self) -> List[str]:
+        """
+        Commit everything buffered (in chunks of at most max_ops)
+
+        If the soft time limit interrupts a commit, the chunk being committed
+        and every later one go back into the buffer (writes are idempotent,
+        so recommitting a chunk that did land is harmless) and the next
+        flush() retries them.
+
+        Returns:
+            IDs of documents whose chunk could not be committed in this flush
+
+        Raises:
+            SoftTimeLimitExceeded: Passed through after re-buffering
+        """
+        pending, self._pending = self._pending, []
+        self._last_flush = time.monotonic()
+
+        failed = []
+        for start in range(0, len(pending), self.max_ops):
+            try:
+                failed.extend(self._commit_chunk(pending[start:start + self.max_ops]))
+            except SoftTimeLimitExceeded:
+                self._pending = pending[start:] + self._pending
+                self.failed_ids.update(failed)
+                raise
+
+        self.failed_ids.update(failed)
+        return failed
+
+    def _commit_chunk(self, chunk: List[Tuple[str, object, Optional[dict]]]) -> List[str]:
+        """
+        Commit one chunk
+
+        Returns:
+            IDs of the documents that could not be written
+
+        Raises:
+            SoftTimeLimitExceeded: Passed through, never retried
+        """
+        for attempt in range(self.retries):
+            batch = db.batch()
+            for op, doc_ref, data in chunk:
+                if op == "update":
+                    batch.update(doc_ref, data)
+                elif op == "set":
+                    batch.set(doc_ref, data)
+                else:
+                    batch.delete(doc_ref)
+            try:
+                start = time.perf_counter()
+                batch.commit()
+                if self.metric_stage:
+                    metrics.observe(
+                        self.metric_stage, (time.perf_counter() - start) / len(chunk), count=len(chunk)
+                    )
+                return []
+            except SoftTimeLimitExceeded:
+                raise
+            except _TRANSIENT_ERRORS as e:
+                print(
+                    f"Warning: Firestore batch commit failed ({len(chunk)} writes, "
+                    f"attempt {attempt + 1}/{self.retries}): {e}"
+                )
+                if attempt + 1 < self.retries:
+                    time.sleep(0.5 * 2 ** attempt)
+            except Exception as e:
+                if len(chunk) == 1:
+                    print(f"Warning: Firestore write to {chunk[0][1].id} failed: {e}")
+                    return [chunk[0][1].id]
+                # Not transient: keep the healthy writes by splitting off the bad ones
+                middle = len(chunk) // 2
+                return self._commit_chunk(chunk[:middle]) + self._commit_chunk(chunk[middle:])
+        return [doc_ref.id for _, doc_ref, _ in chunk]
@@ -0,0 +1,210 @@
+# app/core/metrics.py
+#
+# Per-stage timing of frame processing
+#
+# StageTimer measures the stages of one unit of work (a frame, a forward
+# pass); the per-frame result is stored as detectionResults.timings (ms).
+# When METRICS_PORT is set, the same numbers feed a Prometheus histogram
+# (prometheus_client, optional dependency). Celery children are forked, so
+# the histogram runs in prometheus_client's multiprocess mode: each child
+# writes to METRICS_MULTIPROC_DIR/worker-<parent pid> and the worker parent
+# serves the aggregate on METRICS_PORT, or the next free port when another
+# worker on the host has it (start_metrics_server, called from worker_init).
+
+import errno
+import glob
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+from app.config import settings
+
+STAGES = ("read", "decode", "preprocess", "forward", "postprocess", "evaluate", "persist")
+
+# Seconds; frames take ~1 ms (decode of a cached size) up to seconds (CPU forward pass)
+_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_histogram = None
+_prometheus_missing = False
+
+
+class StageTimer:
+    """
+    Accumulate seconds per stage
+
+    Usage:
+        timer = StageTimer()
+        with timer.stage("decode"):
+            ...
+        timer.as_ms()  # {"decode": 1.23}
+    """
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, seconds: float):
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+    def merge(self, seconds: Dict[str, float], scale: float = 1.0):
+        """Add another timer's seconds (scaled, e.g. 1/n for one image of a batch)"""
+        for name, value in seconds.items():
+            self.add(name, value * scale)
+
+    def as_ms(self) -> Dict[str, float]:
+        """{stage: milliseconds} in STAGES order"""
+        ordered = sorted(self.seconds, key=lambda name: STAGES.index(name) if name in STAGES else len(STAGES))
+        return {name: round(self.seconds[name] * 1000, 2) for name in ordered}
+
+
+@contextmanager
+def time_stage(timer: Optional[StageTimer], name: str):
+    """timer.stage(name), or nothing when timer is None"""
+    if timer is None:
+        yield
+        return
+    with timer.stage(name):
+        yield
+
+
+def is_enabled() -> bool:
+    return settings.METRICS_PORT > 0
+
+
+def _import_prometheus_client():
+    """Lazy import prometheus_client (optional: metrics are skipped without it)"""
+    global _prometheus_missing
+    if _prometheus_missing:
+        return None
+    try:
+        import prometheus_client
+        return prometheus_client
+    except ImportError:
+        _prometheus_missing = True
+        print("Warning: prometheus_client is not installed; stage metrics are disabled")
+        return None
+
+
+def _get_histogram():
+    global _histogram
+    if _histogram is None:
+        prometheus_client = _import_prometheus_client()
+        if prometheus_client is None:
+            return None
+        _histogram = prometheus_client.Histogram(
+            "inference_stage_seconds",
+            "Frame processing time per stage (persist: per document written)",
+            ["stage"],
+            buckets=_BUCKETS,
+        )
+    return _histogram
+
+
+def observe(stage: str, seconds: float, count: int = 1):
+    """Record `count` samples of `seconds` for a stage (no-op unless METRICS_PORT is set)"""
+    if not is_enabled():
+        return
+    try:
+        histogram = _get_histogram()
+        if histogram is None:
+            return
+        child = histogram.labels(stage=stage)
+        for _ in range(count):
+            child.observe(seconds)
+    except Exception as e:
+        print(f"Warning: Failed to record {stage} metric: {e}")
+
+
+def observe_timings(timings_ms: Optional[Dict[str, float]]):
+    """Record a detectionResults.timings object ({stage: ms})"""
+    if not timings_ms or not is_enabled():
+        return
+    for stage, ms in timings_ms.items():
+        observe(stage, ms / 1000)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _remove_stale_worker_dirs(root: str):
+    """Remove the sample directories of workers that are no longer running"""
+    for path in glob.glob(os.path.join(root, "worker-*")):
+        try:
+            pid = int(os.path.basename(path)[len("worker-"):])
+        except ValueError:
+            continue
+        # Our own pid: left by an earlier process that had the same pid
+        if pid == os.getpid() or not _pid_alive(pid):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def start_metrics_server(port: Optional[int] = None) -> Optional[int]:
+    """
+    Serve the aggregate of this worker's processes on /metrics
+
+    Must run in the worker parent before the pool forks and before anything
+    imports prometheus_client, because the multiprocess directory is
+    read from the environment at import time.
+
+    Each worker gets its own directory, so workers sharing a host neither
+    sum nor delete each other's samples. If the port is taken, the next
+    METRICS_PORT_SPAN - 1 ports are tried.
+
+    Returns:
+        The port served on, or None if metrics could not be started
+    """
+    port = port or settings.METRICS_PORT
+
+    root = settings.METRICS_MULTIPROC_DIR
+    os.makedirs(root, exist_ok=True)
+    # Samples of dead workers would otherwise pile up
+    _remove_stale_worker_dirs(root)
+    multiproc_dir = os.path.join(root, f"worker-{os.getpid()}")
+    os.makedirs(multiproc_dir, exist_ok=True)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = multiproc_dir
+
+    prometheus_client = _import_prometheus_client()
+    if prometheus_client is None:
+        return None
+    from prometheus_client import multiprocess
+
+    registry = prometheus_client.CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    for candidate in range(port, port + max(1, settings.METRICS_PORT_SPAN)):
+        try:
+            prometheus_client.start_http_server(candidate, registry=registry)
+        except OSError as e:
+            if e.errno == errno.EADDRINUSE:
+                continue
+            raise
+        print(f"Stage metrics on http://0.0.0.0:{candidate}/metrics")
+        return candidate
+
+    print(f"Warning: No free metrics port in {port}-{port + max(1, settings.METRICS_PORT_SPAN) - 1}")
+    return None
+
+
+def mark_process_dead(pid: int):
+    """Drop a finished child's live samples (multiprocess mode)"""
+    if not is_enabled() or not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        return
+    prometheus_client = _import_prometheus_client()
+    if prometheus_client is None:
+        return
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(pid)
@@ -0,0 +1,57 @@
+# app/core/redis_client.py
+import os
+from typing import Optional
+from app.config import settings
+
+# One client per process (connection pools must not cross a fork)
+_client = None
+_client_pid: Optional[int] = None
+
+
+def _import_redis():
+    """Lazy import redis - installed with the Celery Redis transport"""
+    try:
+        import redis
+        return redis
+    except ImportError:
+        raise ImportError(
+            "redis is not installed. "
+            "Install it (pip install redis) to use the Redis progress store."
+        )
+
+
+def get_redis():
+    """
+    Shared Redis client (settings.REDIS_URL, the Celery broker by default)
+
+    Responses are decoded to str. Socket timeouts are short: callers treat
+    Redis as a cache and fall back to Firestore on any error.
+    """
+    global _client, _client_pid
+
+    if _client is not None and _client_pid == os.getpid():
+        return _client
+
+    redis = _import_redis()
+    _client = redis.Redis.from_url(
+        settings.REDIS_URL,
+        decode_responses=True,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+    )
+    _client_pid = os.getpid()
+    return _client
+
+
+def get_async_redis():
+    """
+    New asyncio Redis client for one long-lived reader (e.g. an SSE stream);
+    the caller closes it with `await client.aclose()`
+    """
+    _import_redis()
+    import redis.asyncio as aioredis
+    return aioredis.Redis.from_url(
+        settings.REDIS_URL,
+        decode_responses=True,
+        socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+    )
@@ -1,9 +1,17 @@
 # app/routes/evaluation_routes.py
 
-from fastapi import APIRouter, Depends, HTTPException
+import json
+import uuid
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
 from app.core.permissions import require_role
 from app.core.auth_jwt import get_current_user
 from app.core.firebase import db
+from app.services.evaluation_progress import get_evaluation_request_id, list_frame_statuses
+from app.services import batch_lock, progress_store
+from app.config import settings
 from datetime import datetime
 from app.schemas.evaluation_request_schema import (
     EvaluationRequestCreate,
@@ -13,30 +21,92 @@ from app.schemas.evaluation_request_schema import (
 router = APIRouter(prefix="/evaluation", tags=["Evaluation"])
 
 
+def _validate_model_version(model_version: Optional[str]):
+    """400 if model_version is not in the model registry"""
+    if model_version is None:
+        return
+    from app.services.model_service import get_model_specs
+    if model_version not in get_model_specs():
+        raise HTTPException(status_code=400, detail=f"Unknown model version: {model_version}")
+
+
 def _get_evaluate_batch_task():
     """Lazy import to avoid importing detectron2 in FastAPI server"""
     from app.tasks.inference_tasks import evaluate_batch, re_evaluate_batch
     return evaluate_batch, re_evaluate_batch
 
 
+def _running_job(batch_id: str, job_id: str) -> dict:
+    """Response for a submission that coalesces into the job already running on the batch"""
+    return {
+        "evaluationRequestId": get_evaluation_request_id(batch_id),
+        "taskId": job_id,
+        "status": "already_running"
+    }
+
+
+def _progress(total_frames: int, completed_frames: int, failed_frames: int) -> float:
+    """Fraction of frames processed (both completed and failed count as processed)"""
+    if total_frames <= 0:
+        return 0.0
+    return (completed_frames + failed_frames) / total_frames
+
+
+def _derive_status(status: str, total_frames: int, completed_frames: int) -> str:
+    """
+    Evaluation status: the stored one once terminal, otherwise from frame counts
+
+    Counts never make a run "completed": all frames can be done while the
+    batch is still being finalized (eggRecord, eligibility), and clients
+    stop polling on "completed".
+    """
+    if status in ("completed", "failed"):
+        return status
+    if total_frames == 0 or completed_frames == 0:
+        return "pending"
+    return "processing"
+
+
+def _sse(event: str, data: dict, event_id: Optional[str] = None) -> str:
+    """Format one Server-Sent Event"""
+    lines = []
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
 @router.post("/batch/{batch_id}/start", dependencies=[Depends(require_role(["staff", "admin"]))])
 def start_batch_evaluation(
     batch_id: str,
+    model_version: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
     """
     Start evaluation for a batch (first time)
     
     Creates evaluation request and triggers Celery task to process all frames
+    Optional ?model_version= selects a registered model (canary / shadow runs)
+    While a job holds the batch, its taskId is returned instead (status "already_running")
     """
+    _validate_model_version(model_version)
+    
     # Check if batch exists
     batch_doc = db.collection("retrievalBatches").document(batch_id).get()
     if not batch_doc.exists:
         raise HTTPException(status_code=404, detail="Batch not found")
     
+    # One job per batch: the task id is generated up front and holds the lock
+    job_id = str(uuid.uuid4())
+    running_job_id = batch_lock.acquire(batch_id, job_id)
+    if running_job_id:
+        return _running_job(batch_id, running_job_id)
+    
     # Check if evaluation request already exists
     existing = db.collection("evaluationRequests").where("batchId", "==", batch_id).limit(1).stream()
     if list(existing):
+        batch_lock.release(batch_id, job_id)
         raise HTTPException(status_code=400, detail="Evaluation already started for this batch. Use /re-evaluate to re-run.")
     
     # Create evaluation request
@@ -45,19 +115,26 @@ def start_batch_evaluation(
         "initiatedBy": current_user["userId"],
         "createdAt": datetime.utcnow(),
         "status": "pending",
-        "frameList": [],
+        "totalFrames": 0,
+        "completedFrames": 0,
+        "failedFrames": 0,
         "errorLog": None,
         "reportSummary": None
     }
     
     eval_req_ref = db.collection("evaluationRequests").document()
     eval_req_ref.set(eval_req_data)
+    progress_store.clear(batch_id)
     
     # Lazy import task
     evaluate_batch, _ = _get_evaluate_batch_task()
     
     # Start Celery task
-    task = evaluate_batch.delay(batch_id)
+    try:
+        task = evaluate_batch.apply_async(args=[batch_id], kwargs={"model_version": model_version}, task_id=job_id)
+    except Exception:
+        batch_lock.release(batch_id, job_id)
+        raise
     
     return {
         "evaluationRequestId": eval_req_ref.id,
@@ -69,18 +146,29 @@ def start_batch_evaluation(
 @router.post("/batch/{batch_id}/re-evaluate", dependencies=[Depends(require_role(["staff", "admin"]))])
 def re_evaluate_batch_route(
     batch_id: str,
+    model_version: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
     """
     Re-evaluate a batch (overwrite existing results)
     
     This will re-process all frames in the batch and overwrite existing detectionResults and evaluationResult
+    Optional ?model_version= selects a registered model (canary / shadow runs)
+    While a job holds the batch, its taskId is returned instead (status "already_running")
     """
+    _validate_model_version(model_version)
+    
     # Check if batch exists
     batch_doc = db.collection("retrievalBatches").document(batch_id).get()
     if not batch_doc.exists:
         raise HTTPException(status_code=404, detail="Batch not found")
     
+    # One job per batch: the task id is generated up front and holds the lock
+    job_id = str(uuid.uuid4())
+    running_job_id = batch_lock.acquire(batch_id, job_id)
+    if running_job_id:
+        return _running_job(batch_id, running_job_id)
+    
     # Find existing evaluation request or create new one
     existing_req = db.collection("evaluationRequests").where("batchId", "==", batch_id).limit(1).stream()
     eval_req_id = None
@@ -94,8 +182,7 @@ def re_evaluate_batch_route(
             "status": "pending",
             "initiatedBy": current_user["userId"],
             "updatedAt": datetime.utcnow(),
-            "errorLog": None,
-            "frameList": []
+            "errorLog": None
         })
     else:
         # Create new evaluation request
@@ -104,7 +191,9 @@ def re_evaluate_batch_route(
             "initiatedBy": current_user["userId"],
             "createdAt": datetime.utcnow(),
             "status": "pending",
-            "frameList": [],
+            "totalFrames": 0,
+            "completedFrames": 0,
+            "failedFrames": 0,
             "errorLog": None,
             "reportSummary": None
         }
@@ -112,11 +201,18 @@ def re_evaluate_batch_route(
         eval_req_ref.set(eval_req_data)
         eval_req_id = eval_req_ref.id
     
+    # Previous run's progress must not be served while the new one starts
+    progress_store.clear(batch_id)
+    
     # Lazy import task
     _, re_evaluate_batch = _get_evaluate_batch_task()
     
     # Start Celery task for re-evaluation
-    task = re_evaluate_batch.delay(batch_id)
+    try:
+        task = re_evaluate_batch.apply_async(args=[batch_id], kwargs={"model_version": model_version}, task_id=job_id)
+    except Exception:
+        batch_lock.release(batch_id, job_id)
+        raise
     
     return {
         "evaluationRequestId": eval_req_id,
@@ -126,25 +222,152 @@ def re_evaluate_batch_route(
     }
 
 
+@router.post("/batch/{batch_id}/re-threshold", dependencies=[Depends(require_role(["staff", "admin"]))])
+def re_threshold_batch_route(
+    batch_id: str,
+    threshold: Optional[float] = Query(None, ge=0, le=1),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Recompute maturity for a batch at a new confidence threshold
+    
+    Uses the stored detections only (no model inference), then refreshes
+    eggRecord and eligibility. Omit threshold to go back to the default.
+    Locked like /re-evaluate: a running job's taskId is returned instead.
+    """
+    batch_doc = db.collection("retrievalBatches").document(batch_id).get()
+    if not batch_doc.exists:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    
+    job_id = str(uuid.uuid4())
+    running_job_id = batch_lock.acquire(batch_id, job_id)
+    if running_job_id:
+        return {"taskId": running_job_id, "threshold": threshold, "status": "already_running"}
+    
+    # Lazy import to avoid importing detectron2 in FastAPI server
+    from app.tasks.inference_tasks import rethreshold_batch
+    
+    try:
+        task = rethreshold_batch.apply_async(args=[batch_id, threshold], task_id=job_id)
+    except Exception:
+        batch_lock.release(batch_id, job_id)
+        raise
+    
+    return {
+        "taskId": task.id,
+        "threshold": threshold,
+        "status": "re-threshold_started"
+    }
+
+
+@router.post("/frame/{frame_id}/re-evaluate", dependencies=[Depends(require_role(["staff", "admin"]))])
+def re_evaluate_frame_route(
+    frame_id: str,
+    model_version: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Re-evaluate a single frame (overwrite its detectionResults and evaluationResult)
+
+    Runs on the interactive queue, so it does not wait behind batch jobs.
+    The batch's progress, eggRecord and eligibility are refreshed afterwards.
+    Optional ?model_version= selects a registered model (canary / shadow runs)
+    409 while a job (batch evaluation, re-threshold, another frame) holds the batch
+    """
+    _validate_model_version(model_version)
+
+    frame_doc = db.collection("frames").document(frame_id).get()
+    if not frame_doc.exists:
+        raise HTTPException(status_code=404, detail="Frame not found")
+    batch_id = (frame_doc.to_dict() or {}).get("batchId")
+
+    # The frame's eggRecord / eligibility update must not race a batch job
+    job_id = str(uuid.uuid4())
+    if batch_id:
+        running_job_id = batch_lock.acquire(batch_id, job_id)
+        if running_job_id:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Batch {batch_id} is being evaluated (task {running_job_id}). Retry when it has finished."
+            )
+
+    # Lazy import to avoid importing detectron2 in FastAPI server
+    from app.tasks.inference_tasks import process_single_frame
+
+    try:
+        task = process_single_frame.apply_async(
+            args=[frame_id],
+            kwargs={"force": True, "model_version": model_version},
+            queue=settings.CELERY_INTERACTIVE_QUEUE,
+            task_id=job_id
+        )
+    except Exception:
+        if batch_id:
+            batch_lock.release(batch_id, job_id)
+        raise
+
+    return {
+        "frameId": frame_id,
+        "batchId": batch_id,
+        "taskId": task.id,
+        "status": "re-evaluation_started"
+    }
+
+
 @router.get("/batch/{batch_id}/status")
-def get_evaluation_status(batch_id: str):
+def get_evaluation_status(
+    batch_id: str,
+    include_frames: bool = False,
+    page_size: int = Query(100, ge=1, le=500),
+    page_token: Optional[str] = None
+):
     """
     Get evaluation status for a batch
     
+    Served from the Redis progress store while a run is stored there (no
+    Firestore reads for counts); otherwise counts come from the
+    evaluationRequest document itself. Per-frame statuses are only read when
+    include_frames is set, one page at a time from Firestore (pass
+    nextPageToken back as page_token for the next page).
+    
     Returns:
         {
             "id": str,
             "batchId": str,
             "status": "pending" | "processing" | "completed" | "failed",
-            "frameList": [...],
             "reportSummary": ...,
             "totalFrames": int,
             "completedFrames": int,
             "failedFrames": int,
             "progress": float,  # 0.0 - 1.0
-            "batchStatus": str | None
+            "batchStatus": str | None,
+            "frameList": [...],  # only with include_frames
+            "nextPageToken": str | None  # only with include_frames
         }
     """
+    # 0) Hot path: progress published by the workers to Redis
+    hot = progress_store.get_progress(batch_id)
+    if hot:
+        total_frames = hot["totalFrames"]
+        completed_frames = hot["completedFrames"]
+        failed_frames = hot["failedFrames"]
+        response = {
+            "id": hot.get("evaluationRequestId"),
+            "batchId": batch_id,
+            "status": _derive_status(hot.get("status", "pending"), total_frames, completed_frames),
+            "totalFrames": total_frames,
+            "completedFrames": completed_frames,
+            "failedFrames": failed_frames,
+            "progress": _progress(total_frames, completed_frames, failed_frames),
+            "batchStatus": hot.get("batchStatus"),
+            "updatedAt": hot.get("updatedAt"),
+        }
+        if include_frames and response["id"]:
+            response["frameList"], response["nextPageToken"] = list_frame_statuses(
+                response["id"], page_size, page_token
+            )
+        return response
+
     # 1) Load evaluation request (if any)
     eval_req_stream = db.collection("evaluationRequests").where(
         "batchId", "==", batch_id
@@ -159,15 +382,17 @@ def get_evaluation_status(batch_id: str):
         raise HTTPException(status_code=404, detail="Evaluation request not found")
 
     eval_data = eval_doc.to_dict() or {}
+    # Requests written before per-frame status documents keep a frameList array
+    legacy_frame_list = eval_data.pop("frameList", None) or []
 
-    # 2) Derive progress primarily from evaluationRequest.frameList (task-driven)
-    frame_list = eval_data.get("frameList") or []
-    total_frames = len(frame_list)
-    completed_frames = 0
-    failed_frames = 0
+    # 2) Derive progress primarily from the counters maintained by the tasks
+    total_frames = eval_data.get("totalFrames") or 0
+    completed_frames = eval_data.get("completedFrames") or 0
+    failed_frames = eval_data.get("failedFrames") or 0
 
-    if frame_list:
-        for item in frame_list:
+    if total_frames == 0 and legacy_frame_list:
+        total_frames = len(legacy_frame_list)
+        for item in legacy_frame_list:
             status_val = str(item.get("status", "")).lower()
             if status_val in ("completed", "done"):
                 completed_frames += 1
@@ -187,24 +412,10 @@ def get_evaluation_status(batch_id: str):
             elif frame_data.get("error"):
                 failed_frames += 1
 
-    progress = 0.0
-    if total_frames > 0:
-        # Treat both completed and failed as "processed"
-        progress = (completed_frames + failed_frames) / total_frames
+    progress = _progress(total_frames, completed_frames, failed_frames)
 
     # 3) Derive evaluation status (pending/processing/completed/failed)
-    status = eval_data.get("status", "pending")
-
-    # If not explicitly failed, derive from frames
-    if status != "failed":
-        if total_frames == 0:
-            status = "pending"
-        elif completed_frames == 0:
-            status = "pending"
-        elif completed_frames < total_frames:
-            status = "processing"
-        else:
-            status = "completed"
+    status = _derive_status(eval_data.get("status", "pending"), total_frames, completed_frames)
 
     # 4) Also expose current batch status for UI
     batch_status = None
@@ -213,7 +424,7 @@ def get_evaluation_status(batch_id: str):
         batch_status = batch_doc.to_dict().get("status", status)
 
     # 5) Return enriched evaluation status
-    return {
+    response = {
         "id": eval_doc.id,
         **eval_data,
         "status": status,
@@ -222,4 +433,86 @@ def get_evaluation_status(batch_id: str):
         "failedFrames": failed_frames,
         "progress": progress,
         "batchStatus": batch_status,
-    }
\ No newline at end of file
+    }
+
+    # 6) Optional page of per-frame statuses
+    if include_frames:
+        if legacy_frame_list:
+            # Legacy requests: the array was already read with the document
+            response["frameList"] = legacy_frame_list
+            response["nextPageToken"] = None
+        else:
+            response["frameList"], response["nextPageToken"] = list_frame_statuses(
+                eval_doc.id, page_size, page_token
+            )
+
+    return response
+
+
+@router.get("/batch/{batch_id}/events")
+async def stream_evaluation_events(
+    batch_id: str,
+    request: Request,
+    last_event_id: Optional[str] = Query(None),
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID")
+):
+    """
+    Live evaluation progress as Server-Sent Events
+    
+    Events: run-started, frame-completed, frame-failed, batch-completed,
+    batch-failed (data is JSON). Each event carries its Redis stream ID as
+    the SSE id; a reconnecting EventSource sends it back as Last-Event-ID
+    (or pass ?last_event_id=) and continues after it. A "progress" snapshot
+    (same counts as /status) is sent first on new connections; the stream
+    ends after batch-completed / batch-failed (or right after the snapshot
+    if the run is already finished).
+    """
+    if not progress_store.is_enabled():
+        raise HTTPException(status_code=404, detail="Progress events are not enabled")
+    
+    resume_from = last_event_id_header or last_event_id
+    
+    async def event_source():
+        follow_from = resume_from
+        if not follow_from:
+            # Stream position first, then the snapshot: an event written in
+            # between is sent after the snapshot (possibly already counted in
+            # it) instead of being lost
+            follow_from = await run_in_threadpool(progress_store.get_last_event_id, batch_id)
+            snapshot = await run_in_threadpool(progress_store.get_progress, batch_id)
+            if snapshot:
+                yield _sse("progress", {
+                    **snapshot,
+                    "progress": _progress(
+                        snapshot["totalFrames"], snapshot["completedFrames"], snapshot["failedFrames"]
+                    ),
+                })
+                if snapshot.get("status") in ("completed", "failed"):
+                    # Nothing more will happen in this run
+                    return
+        
+        events = progress_store.iter_events(
+            batch_id, follow_from, block_ms=settings.PROGRESS_EVENTS_KEEPALIVE * 1000
+        )
+        try:
+            async for item in events:
+                if await request.is_disconnected():
+                    break
+                if item is None:
+                    # Comment line: keeps proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+                    continue
+                event_id, event, data = item
+                yield _sse(event, data, event_id)
+                if event in progress_store.TERMINAL_EVENTS:
+                    break
+        finally:
+            # Closes the Redis connection of this stream
+            await events.aclose()
+    
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
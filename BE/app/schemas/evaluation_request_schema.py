@@ -34,6 +34,9 @@ class EvaluationRequestResponse(BaseModel):
     createdAt: datetime
     updatedAt: Optional[datetime] = None
     status: str  # "pending", "processing", "completed", "failed"
-    frameList: Optional[List[FrameListItem]] = None
+    totalFrames: Optional[int] = None
+    completedFrames: Optional[int] = None
+    failedFrames: Optional[int] = None
+    frameList: Optional[List[FrameListItem]] = None  # one page, only when requested
     errorLog: Optional[str] = None
     reportSummary: Optional[ReportSummary] = None
\ No newline at end of file
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, validator
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import datetime
 from enum import Enum
 
@@ -32,17 +32,22 @@ class Detection(BaseModel):
     class_: DetectionClass = Field(alias="class")
     confidence: float = Field(ge=0, le=1)
     bbox: BoundingBox
+    mask: Optional[dict] = None  # RLE {"size": [h, w], "counts": [...]} (only with INFERENCE_RETURN_MASKS)
 
 
 class DetectionResults(BaseModel):
     detections: List[Detection]
     inferenceTimestamp: datetime
     modelVersion: Optional[str] = None
+    scoreFloor: Optional[float] = None  # Lowest score kept by the worker
+    cascadePass: Optional[str] = None  # "low" | "full" when the resolution cascade decided the frame
+    timings: Optional[Dict[str, float]] = None  # ms per stage: read, decode, preprocess, forward, postprocess, evaluate
 
 
 class EvalResult(BaseModel):
     maturity: MaturityStatus
     quality: QualityStatus
+    threshold: Optional[float] = None  # Operating confidence threshold used
     evaluatedAt: Optional[datetime] = None
 
 
@@ -59,6 +64,10 @@ class FrameResponse(BaseModel):
     uploadedBy: str
     uploadedAt: Optional[datetime]
     frameURL: str
+    width: Optional[int] = None
+    height: Optional[int] = None
+    originalWidth: Optional[int] = None
+    originalHeight: Optional[int] = None
     maturity: Optional[MaturityStatus] = None  # Get from evaluationResult.maturity only
     evaluationResult: Optional[EvalResult] = None
     detectionResults: Optional[DetectionResults] = None
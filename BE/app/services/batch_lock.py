@@ -0,0 +1,132 @@
+# app/services/batch_lock.py
+#
+# One evaluation job per batch: a Redis lease (SET NX PX) whose value is the
+# job's Celery task id.
+#
+#   eval:{batch_id}:lock  string  job id, expires after BATCH_LOCK_TTL
+#
+# The route pre-generates the task id and acquires the lease before
+# submitting. Every task of the job (chunks, continuations) refreshes it,
+# and _finalize_batch releases it. A job that dies without finalizing loses
+# the lease when it expires. When Redis is unavailable, jobs are not locked
+# (a warning is logged) rather than blocked.
+
+from typing import Optional
+from app.config import settings
+from app.core.redis_client import get_redis
+
+# Extend the lease if we still hold it; take it back if it expired meanwhile
+# KEYS: lock key
+# ARGV: job id, ttl (ms)
+# Returns "" when held by this job, else the other holder's job id
+_REFRESH_LUA = """
+local holder = redis.call("GET", KEYS[1])
+if holder == ARGV[1] then
+    redis.call("PEXPIRE", KEYS[1], ARGV[2])
+    return ""
+end
+if not holder then
+    redis.call("SET", KEYS[1], ARGV[1], "PX", ARGV[2])
+    return ""
+end
+return holder
+"""
+
+# Delete the lease only if this job still holds it
+_RELEASE_LUA = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+# Script objects only hold the SHA; each call passes the current process's
+# client, so a script registered before a fork never uses the parent's pool
+_refresh_script = None
+_release_script = None
+
+
+def _lock_key(batch_id: str) -> str:
+    return f"eval:{batch_id}:lock"
+
+
+def _ttl_ms() -> int:
+    return max(1, settings.BATCH_LOCK_TTL) * 1000
+
+
+def acquire(batch_id: str, job_id: str) -> Optional[str]:
+    """
+    Take the batch's lease for a new job
+
+    Args:
+        batch_id: Batch ID
+        job_id: Celery task id the job will be submitted with
+
+    Returns:
+        None if the lease was taken (or Redis is unavailable), else the job id
+        of the evaluation already running for this batch
+    """
+    try:
+        client = get_redis()
+        holder = None
+        # Second attempt only if the lease expired between SET and GET
+        for _ in range(2):
+            if client.set(_lock_key(batch_id), job_id, nx=True, px=_ttl_ms()):
+                return None
+            holder = client.get(_lock_key(batch_id))
+            if holder is not None:
+                return holder
+        return holder
+    except Exception as e:
+        print(f"Warning: Failed to lock batch {batch_id} in Redis, continuing without lock: {e}")
+        return None
+
+
+def refresh(batch_id: str, job_id: Optional[str]) -> bool:
+    """
+    Extend the lease of a running job (called by each of its tasks)
+
+    Returns:
+        False if another job holds the batch now, True otherwise
+    """
+    global _refresh_script
+
+    if not job_id:
+        return True
+    try:
+        client = get_redis()
+        if _refresh_script is None:
+            _refresh_script = client.register_script(_REFRESH_LUA)
+        holder = _refresh_script(keys=[_lock_key(batch_id)], args=[job_id, _ttl_ms()], client=client)
+    except Exception as e:
+        print(f"Warning: Failed to refresh lock of batch {batch_id} in Redis: {e}")
+        return True
+
+    if holder:
+        print(f"Warning: Batch {batch_id} is locked by job {holder}, not by {job_id}")
+        return False
+    return True
+
+
+def release(batch_id: str, job_id: Optional[str]):
+    """Give the lease up (no-op if another job holds it)"""
+    global _release_script
+
+    if not job_id:
+        return
+    try:
+        client = get_redis()
+        if _release_script is None:
+            _release_script = client.register_script(_RELEASE_LUA)
+        _release_script(keys=[_lock_key(batch_id)], args=[job_id], client=client)
+    except Exception as e:
+        print(f"Warning: Failed to release lock of batch {batch_id} in Redis: {e}")
+
+
+def get_holder(batch_id: str) -> Optional[str]:
+    """Job id currently holding the batch (None if unlocked or Redis is unavailable)"""
+    try:
+        return get_redis().get(_lock_key(batch_id))
+    except Exception as e:
+        print(f"Warning: Failed to read lock of batch {batch_id} from Redis: {e}")
+        return None
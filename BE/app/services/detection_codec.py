@@ -0,0 +1,155 @@
+# app/services/detection_codec.py
+
+import base64
+import numpy as np
+from typing import Dict, List, Tuple
+
+# Model class names (4 classes from training)
+CLASS_NAMES = ["Polar-Body", "cytoplasm", "oocyte", "polarbody"]
+
+# Mapping for normalized class names
+CLASS_MAPPING = {
+    "Polar-Body": "polar-body",  # Original image, not actual PB
+    "polarbody": "polarbody",     # Actual polar body for MI/MII evaluation
+    "cytoplasm": "cytoplasm",
+    "oocyte": "oocyte"
+}
+
+# Normalized name per class id (index = class id)
+NORMALIZED_CLASS_NAMES = np.array(
+    [CLASS_MAPPING.get(name, name.lower()) for name in CLASS_NAMES], dtype=object
+)
+_CLASS_IDS = {name: i for i, name in enumerate(NORMALIZED_CLASS_NAMES)}
+
+# Stored detectionResults layout:
+#   classIds: uint8[n], scores: uint16[n] (score * 65535),
+#   boxes: uint16[n * 4] (x1, y1, x2, y2 * boxScale), all little-endian bytes
+COMPACT_FORMAT = "columnar-v1"
+SCORE_SCALE = 65535
+BOX_SCALE = 4  # quarter-pixel boxes, up to 16383 px
+
+
+def json_default(obj):
+    """json.dumps default: packed detection columns are bytes"""
+    if isinstance(obj, bytes):
+        return {"__b64__": base64.b64encode(obj).decode("ascii")}
+    return str(obj)
+
+
+def json_object_hook(obj: Dict):
+    """json.loads object_hook: inverse of json_default"""
+    if len(obj) == 1 and "__b64__" in obj:
+        return base64.b64decode(obj["__b64__"])
+    return obj
+
+
+def is_compact(detection_results: Dict) -> bool:
+    return isinstance(detection_results, dict) and detection_results.get("format") == COMPACT_FORMAT
+
+
+def encode_detections(class_ids: np.ndarray, scores: np.ndarray, boxes: np.ndarray) -> Dict:
+    """
+    Pack per-detection arrays into the compact columnar form
+
+    Args:
+        class_ids: int[n] model class ids
+        scores: float[n] in [0, 1]
+        boxes: float[n, 4] xyxy in image pixels
+
+    Returns:
+        {"format", "count", "classIds", "scores", "boxes", "boxScale"}
+    """
+    class_ids = np.asarray(class_ids).reshape(-1)
+    scores = np.asarray(scores, dtype=np.float32).reshape(-1)
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+
+    q_scores = np.rint(np.clip(scores, 0.0, 1.0) * SCORE_SCALE).astype("<u2")
+    q_boxes = np.rint(np.clip(boxes * BOX_SCALE, 0, np.iinfo(np.uint16).max)).astype("<u2")
+
+    return {
+        "format": COMPACT_FORMAT,
+        "count": int(class_ids.size),
+        "classIds": class_ids.astype(np.uint8).tobytes(),
+        "scores": q_scores.tobytes(),
+        "boxes": q_boxes.tobytes(),
+        "boxScale": BOX_SCALE,
+    }
+
+
+def decode_arrays(detection_results: Dict) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Unpack a compact (or legacy list-of-dicts) detectionResults to arrays
+
+    Returns:
+        (class_ids int[n], scores float32[n], boxes float32[n, 4])
+    """
+    if not is_compact(detection_results):
+        detections = (detection_results or {}).get("detections") or []
+        class_ids = np.array([_CLASS_IDS.get(d.get("class"), -1) for d in detections], dtype=np.int16)
+        scores = np.array([d.get("confidence", 0.0) for d in detections], dtype=np.float32)
+        boxes = np.array(
+            [[d["bbox"]["x1"], d["bbox"]["y1"], d["bbox"]["x2"], d["bbox"]["y2"]] for d in detections],
+            dtype=np.float32
+        ).reshape(-1, 4)
+        return class_ids, scores, boxes
+
+    class_ids = np.frombuffer(detection_results["classIds"], dtype=np.uint8)
+    scores = np.frombuffer(detection_results["scores"], dtype="<u2").astype(np.float32) / SCORE_SCALE
+    boxes = (
+        np.frombuffer(detection_results["boxes"], dtype="<u2").astype(np.float32).reshape(-1, 4)
+        / detection_results.get("boxScale", BOX_SCALE)
+    )
+    return class_ids, scores, boxes
+
+
+def expand_detections(detection_results: Dict, min_score: float = 0.0) -> List[Dict]:
+    """
+    Detections in the API schema: [{"class", "confidence", "bbox": {x1, y1, x2, y2}}]
+    (legacy documents that already store the list are returned as-is)
+
+    Args:
+        detection_results: Stored detectionResults
+        min_score: Drop detections below this confidence
+    """
+    if not is_compact(detection_results):
+        detections = (detection_results or {}).get("detections") or []
+        if min_score > 0:
+            detections = [d for d in detections if d.get("confidence", 1.0) >= min_score]
+        return detections
+
+    class_ids, scores, boxes = decode_arrays(detection_results)
+    masks = detection_results.get("masks")
+    names = NORMALIZED_CLASS_NAMES[class_ids]
+
+    detections = []
+    for i in np.flatnonzero(scores >= min_score):
+        x1, y1, x2, y2 = boxes[i].tolist()
+        detection = {
+            "class": names[i],
+            "confidence": float(scores[i]),
+            "bbox": {"x1": x1, "y1": y1, "x2": x2, "y2": y2},
+        }
+        if masks:
+            detection["mask"] = masks[i]
+        detections.append(detection)
+    return detections
+
+
+def expand_detection_results(detection_results: Dict, min_score: float = 0.0) -> Dict:
+    """
+    Full detectionResults in the API (DetectionResults) schema; packed
+    columns are replaced by the "detections" list, other fields are kept
+
+    Args:
+        detection_results: Stored detectionResults
+        min_score: Drop detections below this confidence (operating threshold)
+    """
+    if not is_compact(detection_results):
+        if min_score > 0:
+            return {**detection_results, "detections": expand_detections(detection_results, min_score)}
+        return detection_results
+
+    packed = {"format", "count", "classIds", "scores", "boxes", "boxScale", "masks"}
+    expanded = {k: v for k, v in detection_results.items() if k not in packed}
+    expanded["detections"] = expand_detections(detection_results, min_score)
+    return expanded
@@ -0,0 +1,235 @@
+# app/services/evaluation_progress.py
+
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from firebase_admin import firestore
+from app.config import settings
+from app.core.firebase import db
+from app.core.firestore_batch import BufferedWriter
+from app.services import progress_store
+
+# evaluationRequests/{id}/frames/{frameId}: {"frameId", "frameURL", "status", "updatedAt"}
+FRAMES_SUBCOLLECTION = "frames"
+
+# Parent counter per frame status (any other status counts as pending)
+_STATUS_COUNTERS = {
+    "completed": "completedFrames",
+    "done": "completedFrames",
+    "failed": "failedFrames",
+}
+
+# Frames per status transaction (Firestore allows 500 writes per transaction)
+_TRANSACTION_FRAMES = 400
+
+
+def get_evaluation_request_id(batch_id: str) -> Optional[str]:
+    """ID of the evaluationRequest for a batch (None if there is none)"""
+    eval_req_stream = db.collection("evaluationRequests").where(
+        "batchId", "==", batch_id
+    ).limit(1).stream()
+    for req in eval_req_stream:
+        return req.id
+    return None
+
+
+def reset_frame_statuses(eval_req_id: str, frame_list: List[Dict]):
+    """
+    Start a new evaluation run: write one status document per frame and
+    reset the counters on the parent evaluationRequest
+
+    Per-frame statuses live in evaluationRequests/{id}/frames/{frameId}
+    (not in a frameList array on the parent), so the parent stays small no
+    matter how many frames a batch has. Status documents of frames that are
+    no longer in the batch are removed; a legacy frameList field is dropped.
+
+    Args:
+        eval_req_id: evaluationRequest ID
+        frame_list: [{"frameId", "frameURL", "status"}]
+    """
+    parent_ref = db.collection("evaluationRequests").document(eval_req_id)
+    frames_ref = parent_ref.collection(FRAMES_SUBCOLLECTION)
+    frame_ids = {item["frameId"] for item in frame_list}
+    now = datetime.utcnow()
+
+    counts = {"completedFrames": 0, "failedFrames": 0}
+    with BufferedWriter() as writer:
+        for snapshot in frames_ref.select([]).stream():
+            if snapshot.id not in frame_ids:
+                writer.delete(snapshot.reference)
+        for item in frame_list:
+            writer.set(frames_ref.document(item["frameId"]), {**item, "updatedAt": now})
+            counter = _STATUS_COUNTERS.get(item.get("status"))
+            if counter:
+                counts[counter] += 1
+
+    parent_ref.update({
+        "totalFrames": len(frame_list),
+        **counts,
+        "frameList": firestore.DELETE_FIELD,
+        "updatedAt": now,
+    })
+
+
+def merge_frame_statuses(eval_req_id: str, frame_statuses: Dict[str, str]):
+    """
+    Apply {frame_id: status} to the evaluationRequest's frame status documents
+
+    Each chunk is a transaction that reads the current statuses, writes the
+    changed ones and moves the parent's completedFrames / failedFrames
+    counters by the difference (Increment), so chunks of the same batch
+    running on different workers never lose each other's updates. Frames
+    without a status document (not part of this run) are ignored.
+    """
+    if not frame_statuses:
+        return
+
+    items = list(frame_statuses.items())
+    for start in range(0, len(items), _TRANSACTION_FRAMES):
+        _merge_chunk(eval_req_id, dict(items[start:start + _TRANSACTION_FRAMES]))
+
+
+def _merge_chunk(eval_req_id: str, frame_statuses: Dict[str, str]):
+    parent_ref = db.collection("evaluationRequests").document(eval_req_id)
+    frames_ref = parent_ref.collection(FRAMES_SUBCOLLECTION)
+
+    @firestore.transactional
+    def merge(transaction):
+        refs = [frames_ref.document(frame_id) for frame_id in frame_statuses]
+        now = datetime.utcnow()
+        deltas = {"completedFrames": 0, "failedFrames": 0}
+
+        for snapshot in transaction.get_all(refs):
+            if not snapshot.exists:
+                continue
+            old_status = (snapshot.to_dict() or {}).get("status")
+            new_status = frame_statuses[snapshot.id]
+            if old_status == new_status:
+                continue
+            if old_status in _STATUS_COUNTERS:
+                deltas[_STATUS_COUNTERS[old_status]] -= 1
+            if new_status in _STATUS_COUNTERS:
+                deltas[_STATUS_COUNTERS[new_status]] += 1
+            transaction.update(snapshot.reference, {"status": new_status, "updatedAt": now})
+
+        parent_update = {"updatedAt": now}
+        for field, delta in deltas.items():
+            if delta:
+                parent_update[field] = firestore.Increment(delta)
+        transaction.update(parent_ref, parent_update)
+
+    merge(db.transaction())
+
+
+def list_frame_statuses(
+    eval_req_id: str,
+    page_size: int = 100,
+    page_token: Optional[str] = None
+) -> Tuple[List[Dict], Optional[str]]:
+    """
+    One page of frame statuses, ordered by frameId
+
+    Args:
+        eval_req_id: evaluationRequest ID
+        page_size: Max frames returned
+        page_token: nextPageToken of the previous page (None for the first page)
+
+    Returns:
+        ([{"frameId", "frameURL", "status"}], nextPageToken or None)
+    """
+    query = (
+        db.collection("evaluationRequests").document(eval_req_id)
+        .collection(FRAMES_SUBCOLLECTION)
+        .order_by("frameId")
+    )
+    if page_token:
+        query = query.start_after({"frameId": page_token})
+
+    frames = []
+    for snapshot in query.limit(page_size).stream():
+        data = snapshot.to_dict() or {}
+        frames.append({
+            "frameId": data.get("frameId", snapshot.id),
+            "frameURL": data.get("frameURL", ""),
+            "status": data.get("status", "pending"),
+        })
+
+    next_page_token = frames[-1]["frameId"] if len(frames) == page_size else None
+    return frames, next_page_token
+
+
+class ProgressWriter:
+    """
+    Coalesce per-frame status updates into periodic status writes
+
+    Statuses are buffered and merged into the evaluationRequest every
+    EVAL_PROGRESS_FLUSH_FRAMES frames or EVAL_PROGRESS_FLUSH_SECONDS seconds,
+    whichever comes first, which bounds the write rate per task while the
+    status endpoint still sees progress during long batches.
+
+    Args:
+        batch_id: Batch ID (its evaluationRequest is looked up on first flush)
+        before_flush: Called before each flush, e.g. to commit the frame
+            documents first; may return IDs of frames whose write failed,
+            which are then reported as "failed"
+    """
+
+    def __init__(
+        self,
+        batch_id: str,
+        before_flush: Optional[Callable[[], Optional[Iterable[str]]]] = None,
+        flush_frames: Optional[int] = None,
+        flush_seconds: Optional[float] = None
+    ):
+        self.batch_id = batch_id
+        self.before_flush = before_flush
+        self.flush_frames = max(1, flush_frames or settings.EVAL_PROGRESS_FLUSH_FRAMES)
+        self.flush_seconds = (
+            flush_seconds if flush_seconds is not None else settings.EVAL_PROGRESS_FLUSH_SECONDS
+        )
+        self._pending: Dict[str, str] = {}
+        self._last_flush = time.monotonic()
+        self._eval_req_id: Optional[str] = None
+        self._looked_up = False
+
+    def record(self, frame_id: str, status: str):
+        """Buffer a frame status; may trigger a flush"""
+        self._pending[frame_id] = status
+        if (
+            len(self._pending) >= self.flush_frames
+            or time.monotonic() - self._last_flush >= self.flush_seconds
+        ):
+            self.flush()
+
+    def flush(self):
+        """Write buffered statuses (kept for the next flush if the write fails)"""
+        self._last_flush = time.monotonic()
+
+        if self.before_flush:
+            for frame_id in self.before_flush() or []:
+                if frame_id in self._pending:
+                    self._pending[frame_id] = "failed"
+
+        if not self._pending:
+            return
+
+        # Hot copy for status polling (transition-aware, safe to repeat on retry)
+        progress_store.record_frame_statuses(self.batch_id, self._pending)
+
+        if not self._looked_up:
+            try:
+                self._eval_req_id = get_evaluation_request_id(self.batch_id)
+                self._looked_up = True
+            except Exception as e:
+                print(f"Warning: Failed to load evaluationRequest for batch {self.batch_id}: {e}")
+                return
+
+        if not self._eval_req_id:
+            self._pending = {}
+            return
+
+        try:
+            merge_frame_statuses(self._eval_req_id, self._pending)
+            self._pending = {}
+        except Exception as e:
+            print(f"Warning: Failed to write progress for batch {self.batch_id}: {e}")
@@ -1,14 +1,18 @@
 # app/services/evaluation_service.py
 
-from typing import Dict, List
+from typing import Dict, List, Optional
 from datetime import datetime
 from app.config import settings
+from app.services.detection_codec import expand_detections
 
 
-def evaluate_maturity(detections: List[Dict]) -> Dict:
+def evaluate_maturity(detections: List[Dict], threshold: Optional[float] = None) -> Dict:
     """
     Evaluate egg maturity based on detections (rule-based)
     
+    Detections are stored down to MODEL_SCORE_FLOOR; only those with
+    confidence >= threshold count.
+    
     Rule:
     - If oocyte has polar body ("polarbody") -> MII (likely reproducible)
     - If oocyte has no polar body -> MI (unlikely reproducible)
@@ -17,7 +21,8 @@ def evaluate_maturity(detections: List[Dict]) -> Dict:
     Only "polarbody" class is used for MI/MII evaluation.
     
     Args:
-        detections: List of detection dicts with "class" field
+        detections: List of detection dicts with "class" and "confidence" fields
+        threshold: Operating confidence threshold (default: settings.MODEL_CONFIDENCE_THRESHOLD)
         
     Returns:
         {
@@ -25,10 +30,16 @@ def evaluate_maturity(detections: List[Dict]) -> Dict:
             "quality": "likely reproducible" | "unlikely reproducible"
         }
     """
+    if threshold is None:
+        threshold = settings.MODEL_CONFIDENCE_THRESHOLD
+    
     has_oocyte = False
     has_polar_body = False
     
     for detection in detections:
+        if detection.get("confidence", 1.0) < threshold:
+            continue
+        
         class_name = detection.get("class", "").lower()
         
         if class_name == "oocyte":
@@ -54,28 +65,35 @@ def evaluate_maturity(detections: List[Dict]) -> Dict:
         }
 
 
-def create_evaluation_result(detection_results: Dict) -> Dict:
+def create_evaluation_result(detection_results: Dict, threshold: Optional[float] = None) -> Dict:
     """
     Create evaluationResult from detectionResults
     
+    Pure function of the stored detections, so it can be re-run with a new
+    threshold without touching the model (see rethreshold_batch).
+    
     Args:
-        detection_results: {
-            "detections": [...],
-            "inferenceTimestamp": "..."
-        }
+        detection_results: compact columnar detectionResults (or legacy
+            {"detections": [...], "inferenceTimestamp": "..."})
+        threshold: Operating confidence threshold (default: settings.MODEL_CONFIDENCE_THRESHOLD)
         
     Returns:
         {
             "maturity": "MII" | "MI",
             "quality": "likely reproducible" | "unlikely reproducible",
+            "threshold": float,
             "evaluatedAt": datetime
         }
     """
-    detections = detection_results.get("detections", [])
-    evaluation = evaluate_maturity(detections)
+    if threshold is None:
+        threshold = settings.MODEL_CONFIDENCE_THRESHOLD
+    
+    detections = expand_detections(detection_results)
+    evaluation = evaluate_maturity(detections, threshold)
     
     return {
         "maturity": evaluation["maturity"],
         "quality": evaluation["quality"],
+        "threshold": threshold,
         "evaluatedAt": datetime.utcnow()
     }
\ No newline at end of file
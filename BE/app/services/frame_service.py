@@ -1,48 +1,104 @@
 # app/services/frame_service.py
 
 import os
+import cv2
+import numpy as np
 from datetime import datetime
 from fastapi import UploadFile, HTTPException
+from app.config import settings
 from app.core.firebase import db
 from app.schemas.frame_schema import FrameUpdate
+from app.services.detection_codec import expand_detection_results
 
 STORAGE_DIR = os.getenv("LOCAL_STORAGE_DIR", "storage")
 
 
 # Save file to local storage
-def save_frame_file(batch_id: str, frame_id: str, file: UploadFile) -> str:
+def save_frame_file(batch_id: str, frame_id: str, file: UploadFile) -> dict:
+    """
+    Decode the upload once, downscale to MAX_IMAGE_WIDTH and store a
+    canonical JPEG (this is the copy served and used for inference)
+    
+    Returns:
+        {
+            "path": str,               # canonical JPEG
+            "width": int, "height": int,
+            "originalWidth": int, "originalHeight": int,
+            "originalPath": str | None  # only if KEEP_ORIGINAL_UPLOADS
+        }
+    """
     # Ensure batch directory exists
     batch_dir = os.path.join(STORAGE_DIR, batch_id)
     os.makedirs(batch_dir, exist_ok=True)
 
-    # Only jpg allowed
+    # Only jpg/png allowed (always stored as jpg)
     ext = os.path.splitext(file.filename)[1].lower()
     if ext not in [".jpg", ".jpeg", ".png"]:
         raise HTTPException(400, "Invalid file format")
 
+    raw = file.file.read()
+    img = cv2.imdecode(np.frombuffer(raw, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise HTTPException(400, "Invalid image file")
+
+    original_height, original_width = img.shape[:2]
+
+    # Downscale (never upscale) to the configured width
+    if settings.MAX_IMAGE_WIDTH and original_width > settings.MAX_IMAGE_WIDTH:
+        scale = settings.MAX_IMAGE_WIDTH / original_width
+        img = cv2.resize(
+            img,
+            (settings.MAX_IMAGE_WIDTH, max(1, round(original_height * scale))),
+            interpolation=cv2.INTER_AREA
+        )
+
+    ok, encoded = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, settings.UPLOAD_JPEG_QUALITY])
+    if not ok:
+        raise HTTPException(500, "Failed to encode image")
+
     final_path = os.path.join(batch_dir, f"{frame_id}.jpg")
 
     # Save file
     with open(final_path, "wb") as buffer:
-        buffer.write(file.file.read())
-
-    return final_path
+        buffer.write(encoded.tobytes())
+
+    original_path = None
+    if settings.KEEP_ORIGINAL_UPLOADS:
+        original_path = os.path.join(batch_dir, f"{frame_id}_original{ext}")
+        with open(original_path, "wb") as buffer:
+            buffer.write(raw)
+
+    height, width = img.shape[:2]
+    return {
+        "path": final_path,
+        "width": width,
+        "height": height,
+        "originalWidth": original_width,
+        "originalHeight": original_height,
+        "originalPath": original_path,
+    }
 
 
 # Create frame
 def create_frame(batch_id: str, patient_id: str, user_id: str, file: UploadFile):
     frame_ref = db.collection("frames").document()
 
-    local_file_path = save_frame_file(batch_id, frame_ref.id, file)
+    saved = save_frame_file(batch_id, frame_ref.id, file)
 
     frame_data = {
         "batchId": batch_id,
         "patientId": patient_id,
         "uploadedBy": user_id,
         "uploadedAt": datetime.utcnow(),
-        "frameURL": local_file_path,  # store actual local path
+        "frameURL": saved["path"],  # store actual local path
+        "width": saved["width"],
+        "height": saved["height"],
+        "originalWidth": saved["originalWidth"],
+        "originalHeight": saved["originalHeight"],
         "evaluationResult": None
     }
+    if saved["originalPath"]:
+        frame_data["originalURL"] = saved["originalPath"]
 
     frame_ref.set(frame_data)
     return {"id": frame_ref.id, **frame_data}
@@ -59,6 +115,13 @@ def get_frames_by_batch(batch_id: str):
         if "status" in data:
             del data["status"]
         
+        # Stored detections are packed column-wise and kept down to the score
+        # floor; expand to the API schema at the threshold the frame was evaluated with
+        if data.get("detectionResults"):
+            eval_result = data.get("evaluationResult") or {}
+            threshold = eval_result.get("threshold", settings.MODEL_CONFIDENCE_THRESHOLD)
+            data["detectionResults"] = expand_detection_results(data["detectionResults"], threshold)
+        
         # Extract maturity from evaluationResult if exists
         maturity = None
         if "evaluationResult" in data and data["evaluationResult"]:
@@ -101,5 +164,9 @@ def delete_frame(frame_id: str):
     if os.path.exists(file_path):
         os.remove(file_path)
 
+    original_path = data.get("originalURL")
+    if original_path and os.path.exists(original_path):
+        os.remove(original_path)
+
     db.collection("frames").document(frame_id).delete()
     return {"status": "deleted"}
\ No newline at end of file
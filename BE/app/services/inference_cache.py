@@ -0,0 +1,245 @@
+# app/services/inference_cache.py
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from typing import Dict, Optional
+from app.config import settings
+from app.services.detection_codec import json_default, json_object_hook
+
+# One connection per process (SQLite connections must not cross a fork)
+_conn: Optional[sqlite3.Connection] = None
+_conn_pid: Optional[int] = None
+_lock = threading.Lock()
+
+# Hits / misses and LRU touches are buffered per process and written in one
+# transaction every _ACCESS_FLUSH_ENTRIES lookups or _ACCESS_FLUSH_SECONDS,
+# so lookups never take SQLite's (node-wide) writer lock
+_ACCESS_FLUSH_ENTRIES = 64
+_ACCESS_FLUSH_SECONDS = 5.0
+_pending_access: Dict[str, float] = {}
+_pending_counters: Dict[str, int] = {}
+_last_access_flush = 0.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries(last_access);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS weights (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    digest TEXT NOT NULL
+);
+"""
+
+
+def is_enabled() -> bool:
+    return settings.INFERENCE_CACHE_ENABLED
+
+
+def _get_conn() -> sqlite3.Connection:
+    """Open (or reopen after fork) the cache database"""
+    global _conn, _conn_pid
+
+    if _conn is not None and _conn_pid == os.getpid():
+        return _conn
+
+    cache_dir = os.path.dirname(settings.INFERENCE_CACHE_PATH)
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+
+    # Shared by every worker process on the node -> WAL + busy timeout
+    conn = sqlite3.connect(settings.INFERENCE_CACHE_PATH, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    with conn:
+        # Running byte total, kept up to date by put() (seeded once for older cache files)
+        conn.execute(
+            "INSERT OR IGNORE INTO counters(name, value) "
+            "SELECT 'bytes', COALESCE(SUM(size), 0) FROM entries"
+        )
+
+    # Buffered accesses of the parent process belong to the parent
+    _pending_access.clear()
+    _pending_counters.clear()
+
+    _conn = conn
+    _conn_pid = os.getpid()
+    return _conn
+
+
+def _add_counter(conn: sqlite3.Connection, name: str, delta: int) -> None:
+    conn.execute(
+        "INSERT INTO counters(name, value) VALUES (?, ?) "
+        "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+        (name, delta)
+    )
+
+
+def _flush_access(conn: sqlite3.Connection) -> None:
+    """Write buffered LRU touches and hit/miss counts (caller holds _lock, inside a transaction)"""
+    global _last_access_flush
+
+    if _pending_access:
+        conn.executemany(
+            "UPDATE entries SET last_access = MAX(last_access, ?) WHERE key = ?",
+            [(accessed, key) for key, accessed in _pending_access.items()]
+        )
+        _pending_access.clear()
+    for name, delta in _pending_counters.items():
+        if delta:
+            _add_counter(conn, name, delta)
+    _pending_counters.clear()
+    _last_access_flush = time.monotonic()
+
+
+def _record_access(conn: sqlite3.Connection, counter: str, key: Optional[str] = None) -> None:
+    """Buffer a lookup; flushes when the buffer is full or old enough (caller holds _lock)"""
+    _pending_counters[counter] = _pending_counters.get(counter, 0) + 1
+    if key is not None:
+        _pending_access[key] = time.time()
+
+    if (
+        len(_pending_access) >= _ACCESS_FLUSH_ENTRIES
+        or time.monotonic() - _last_access_flush >= _ACCESS_FLUSH_SECONDS
+    ):
+        with conn:
+            _flush_access(conn)
+
+
+def weights_digest(path: str) -> str:
+    """
+    sha256 of the model weights file
+
+    Stored per (path, mtime, size) so each worker process doesn't re-hash
+    a few hundred MB on start.
+    """
+    stat = os.stat(path)
+
+    with _lock:
+        conn = _get_conn()
+        row = conn.execute(
+            "SELECT mtime, size, digest FROM weights WHERE path = ?", (path,)
+        ).fetchone()
+        if row and row[0] == stat.st_mtime and row[1] == stat.st_size:
+            return row[2]
+
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    digest = sha.hexdigest()
+
+    with _lock:
+        conn = _get_conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO weights(path, mtime, size, digest) VALUES (?, ?, ?, ?)",
+                (path, stat.st_mtime, stat.st_size, digest)
+            )
+    return digest
+
+
+def make_key(image_digest: str, namespace: str) -> str:
+    """
+    Cache key = image content hash + model namespace
+    (model version, weights hash, threshold, input size)
+    """
+    return f"{namespace}:{image_digest}"
+
+
+def get(key: str) -> Optional[Dict]:
+    """
+    Look up stored detectionResults
+
+    A plain read; the LRU position and hit/miss counters are updated in
+    batches (see _record_access).
+
+    Returns:
+        Stored detectionResults dict, or None on miss
+    """
+    with _lock:
+        conn = _get_conn()
+        row = conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        _record_access(conn, "hits" if row is not None else "misses", key if row is not None else None)
+    if row is None:
+        return None
+    return json.loads(row[0], object_hook=json_object_hook)
+
+
+def put(key: str, detection_results: Dict):
+    """
+    Store detectionResults and evict least recently used entries over the size cap
+
+    The total size is a running counter ("bytes"), so a put only scans the
+    table when the cap is actually exceeded.
+    """
+    value = json.dumps(detection_results, default=json_default)
+    max_bytes = settings.INFERENCE_CACHE_MAX_MB * 1024 * 1024
+
+    with _lock:
+        conn = _get_conn()
+        with conn:
+            # Pending LRU touches first, so eviction sees recent hits
+            _flush_access(conn)
+
+            old = conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries(key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, len(value), time.time())
+            )
+            _add_counter(conn, "bytes", len(value) - (old[0] if old else 0))
+
+            total = conn.execute("SELECT value FROM counters WHERE name = 'bytes'").fetchone()[0]
+            if total <= max_bytes:
+                return
+
+            # Evict oldest entries down to 90% of the cap (avoids evicting on every put)
+            target = int(max_bytes * 0.9)
+            evicted = 0
+            evicted_bytes = 0
+            for old_key, size in conn.execute(
+                "SELECT key, size FROM entries ORDER BY last_access ASC"
+            ).fetchall():
+                if total - evicted_bytes <= target:
+                    break
+                evicted_bytes += size
+                evicted += 1
+                conn.execute("DELETE FROM entries WHERE key = ?", (old_key,))
+            _add_counter(conn, "bytes", -evicted_bytes)
+            _add_counter(conn, "evictions", evicted)
+
+
+def get_stats() -> Dict:
+    """
+    Returns:
+        {"hits": int, "misses": int, "evictions": int, "entries": int, "sizeBytes": int}
+    """
+    with _lock:
+        conn = _get_conn()
+        with conn:
+            _flush_access(conn)
+        counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        entries = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        size = counters.get("bytes", 0)
+
+    return {
+        "hits": counters.get("hits", 0),
+        "misses": counters.get("misses", 0),
+        "evictions": counters.get("evictions", 0),
+        "entries": entries,
+        "sizeBytes": size,
+    }
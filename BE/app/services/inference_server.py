@@ -0,0 +1,338 @@
+# app/services/inference_server.py
+#
+# Optional node-local inference server: one process holds the model and
+# micro-batches requests from every Celery child on the node.
+#
+#   python -m app.services.inference_server --port 8765
+#
+# Workers use it when INFERENCE_SERVER_URL is set (e.g. http://127.0.0.1:8765);
+# run_inference / iter_inference_batch then become thin HTTP clients and the
+# worker processes never load the model themselves. Image paths are sent, not
+# pixels, so the server must see the same LOCAL_STORAGE_DIR.
+#
+# Backpressure: at most INFERENCE_SERVER_MAX_QUEUED images wait on the server
+# (more -> 503, the client backs off and retries), and every request has a
+# deadline of request_timeout(n) seconds on both sides (server -> 504).
+
+import argparse
+import json
+import queue
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple, Union
+from app.config import settings
+from app.services.detection_codec import json_default, json_object_hook
+
+# Exceptions that keep their type across the wire (everything else -> RuntimeError)
+_ERROR_TYPES = {
+    "ValueError": ValueError,
+    "FileNotFoundError": FileNotFoundError,
+}
+
+# Attempts per request while the server answers 503 (queue full)
+_BUSY_RETRIES = 3
+
+
+class ServerBusy(Exception):
+    """The server queue is full; the request was not accepted"""
+
+
+def request_timeout(image_count: int) -> float:
+    """Seconds a request for `image_count` images may take (queueing included)"""
+    return settings.INFERENCE_SERVER_TIMEOUT + image_count * settings.INFERENCE_SERVER_TIMEOUT_PER_IMAGE
+
+
+class _PendingRequest:
+    """One HTTP request waiting for the batcher (all its paths share one key)"""
+
+    def __init__(self, image_paths: List[str], key: Tuple[bool, Optional[str], bool, Optional[float]]):
+        self.image_paths = image_paths
+        self.key = key  # (with_masks, model_version, cascade, threshold)
+        self.results: List[Union[Dict, Exception]] = [None] * len(image_paths)
+        self.done = threading.Event()
+        self.cancelled = False  # The caller stopped waiting (deadline passed)
+
+
+class MicroBatcher:
+    """
+    Collects concurrent requests into shared forward passes
+
+    The first queued request opens a window; more requests are added until
+    the window (INFERENCE_SERVER_BATCH_WINDOW_MS) closes or
+    INFERENCE_SERVER_MAX_BATCH images are collected. Requests are then
+    grouped by (with_masks, model_version, cascade, threshold) and each group goes
+    through the local iter_inference_batch (cache, prefetch, resolution
+    sorting and batched forward passes included). A single thread runs the
+    model, so only one forward pass is in flight at a time.
+
+    Admission is bounded: a request that would bring the images waiting
+    above `max_queued` is rejected with ServerBusy (one request is always
+    accepted when nothing is waiting, however large).
+    """
+
+    def __init__(
+        self,
+        window_ms: Optional[int] = None,
+        max_batch: Optional[int] = None,
+        max_queued: Optional[int] = None
+    ):
+        self.window = (window_ms if window_ms is not None else settings.INFERENCE_SERVER_BATCH_WINDOW_MS) / 1000
+        self.max_batch = max(1, max_batch or settings.INFERENCE_SERVER_MAX_BATCH)
+        self.max_queued = max(1, max_queued or settings.INFERENCE_SERVER_MAX_QUEUED)
+        self._queue: "queue.Queue[_PendingRequest]" = queue.Queue()
+        self._queued = 0  # Images submitted and not yet finished
+        self._queued_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def submit(
+        self,
+        image_paths: List[str],
+        with_masks: bool = False,
+        model_version: Optional[str] = None,
+        cascade: Optional[bool] = None,
+        threshold: Optional[float] = None
+    ) -> List[Union[Dict, Exception]]:
+        """
+        Queue images and wait (at most request_timeout(len(image_paths)))
+        until their results are ready
+
+        Returns:
+            List aligned with image_paths (result dict or Exception per image)
+
+        Raises:
+            ServerBusy: If the queue is full
+            TimeoutError: If the results were not ready before the deadline
+        """
+        with self._queued_lock:
+            if self._queued and self._queued + len(image_paths) > self.max_queued:
+                raise ServerBusy(f"{self._queued} images queued (max {self.max_queued})")
+            self._queued += len(image_paths)
+
+        if cascade is None:
+            cascade = settings.INFERENCE_CASCADE_ENABLED
+        if threshold is None or not cascade:
+            # Only the cascade depends on the threshold
+            threshold = settings.MODEL_CONFIDENCE_THRESHOLD
+        request = _PendingRequest(image_paths, (with_masks, model_version, cascade, threshold))
+        self._queue.put(request)
+        if not request.done.wait(request_timeout(len(image_paths))):
+            # Not started yet -> skipped by the batcher; running -> results dropped
+            request.cancelled = True
+            raise TimeoutError(f"Inference of {len(image_paths)} images did not finish in time")
+        return request.results
+
+    def _run(self):
+        while True:
+            pending = [self._queue.get()]
+            count = len(pending[0].image_paths)
+            deadline = time.monotonic() + self.window
+
+            while count < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                pending.append(request)
+                count += len(request.image_paths)
+
+            self._process(pending)
+
+    def _process(self, pending: List[_PendingRequest]):
+        from app.services.model_service import _iter_local_inference_batch
+
+        groups: Dict[Tuple[bool, Optional[str], bool, Optional[float]], List[_PendingRequest]] = {}
+        for request in pending:
+            if request.cancelled:
+                self._finish(request)
+                continue
+            groups.setdefault(request.key, []).append(request)
+
+        for (with_masks, model_version, cascade, threshold), requests in groups.items():
+            # Flatten the group, remembering where each image came from
+            image_paths = []
+            owners = []
+            for request in requests:
+                for i, path in enumerate(request.image_paths):
+                    image_paths.append(path)
+                    owners.append((request, i))
+
+            try:
+                for index, result in _iter_local_inference_batch(
+                    image_paths, with_masks=with_masks, model_version=model_version,
+                    cascade=cascade, threshold=threshold
+                ):
+                    request, i = owners[index]
+                    request.results[i] = result
+            except Exception as e:
+                # Model could not be loaded / unknown version: fail the whole group
+                for request, i in owners:
+                    if request.results[i] is None:
+                        request.results[i] = e
+
+            for request in requests:
+                self._finish(request)
+
+    def _finish(self, request: _PendingRequest):
+        with self._queued_lock:
+            self._queued -= len(request.image_paths)
+        request.done.set()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """POST /infer {"paths", "withMasks", "modelVersion", "cascade", "threshold"}; GET /health"""
+
+    def do_GET(self):
+        if self.path != "/health":
+            self._send(404, {"detail": "Not found"})
+            return
+        from app.services.model_service import get_model_status
+        self._send(200, get_model_status())
+
+    def do_POST(self):
+        if self.path != "/infer":
+            self._send(404, {"detail": "Not found"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length))
+            image_paths = payload["paths"]
+        except (ValueError, KeyError) as e:
+            self._send(400, {"detail": f"Invalid request: {e}"})
+            return
+
+        try:
+            results = self.server.batcher.submit(
+                image_paths,
+                with_masks=bool(payload.get("withMasks", False)),
+                model_version=payload.get("modelVersion"),
+                cascade=payload.get("cascade"),
+                threshold=payload.get("threshold"),
+            )
+        except ServerBusy as e:
+            self._send(503, {"detail": f"Inference server busy: {e}"})
+            return
+        except TimeoutError as e:
+            self._send(504, {"detail": str(e)})
+            return
+        self._send(200, {"results": [_encode_result(result) for result in results]})
+
+    def _send(self, status: int, body: Dict):
+        data = json.dumps(body, default=json_default).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # One line per request is too noisy at batch rates
+        pass
+
+
+def _encode_result(result: Union[Dict, Exception]) -> Dict:
+    if isinstance(result, Exception):
+        return {"error": str(result), "errorType": type(result).__name__}
+    return {"result": result}
+
+
+def _decode_result(item: Dict) -> Union[Dict, Exception]:
+    if "error" in item:
+        return _ERROR_TYPES.get(item.get("errorType"), RuntimeError)(item["error"])
+    return item["result"]
+
+
+def request_inference(
+    image_paths: List[str],
+    with_masks: bool = False,
+    model_version: Optional[str] = None,
+    cascade: Optional[bool] = None,
+    threshold: Optional[float] = None
+) -> List[Union[Dict, Exception]]:
+    """
+    Send images to the inference server at settings.INFERENCE_SERVER_URL
+
+    The timeout grows with the number of images (request_timeout). While the
+    server is busy (503) the request is retried with backoff, up to
+    _BUSY_RETRIES attempts.
+
+    Returns:
+        List aligned with image_paths; each item is a run_inference()-shaped
+        dict, or the Exception raised for that image on the server
+
+    Raises:
+        RuntimeError: If the server cannot be reached or rejects the request
+    """
+    url = settings.INFERENCE_SERVER_URL.rstrip("/") + "/infer"
+    payload = json.dumps({
+        "paths": image_paths,
+        "withMasks": with_masks,
+        "modelVersion": model_version,
+        "cascade": cascade,
+        "threshold": threshold,
+    }).encode("utf-8")
+    request = urllib.request.Request(url, data=payload, headers={"Content-Type": "application/json"})
+    # A little over the server's own deadline, so its 504 arrives first
+    timeout = request_timeout(len(image_paths)) + 5
+
+    for attempt in range(_BUSY_RETRIES):
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                body = json.loads(response.read(), object_hook=json_object_hook)
+            break
+        except urllib.error.HTTPError as e:
+            detail = e.read().decode('utf-8', 'replace')
+            if e.code == 503 and attempt < _BUSY_RETRIES - 1:
+                time.sleep(2 ** attempt)
+                continue
+            raise RuntimeError(f"Inference server error {e.code}: {detail}")
+        except urllib.error.URLError as e:
+            raise RuntimeError(f"Inference server unreachable at {url}: {e.reason}")
+        except (TimeoutError, socket.timeout) as e:
+            # Read timeouts are not wrapped in URLError
+            raise RuntimeError(f"Inference server timed out after {timeout:.0f}s at {url}: {e}")
+        except ConnectionError as e:
+            raise RuntimeError(f"Inference server connection lost at {url}: {e}")
+
+    return [_decode_result(item) for item in body["results"]]
+
+
+def serve(host: Optional[str] = None, port: Optional[int] = None):
+    """Load + warm up the model, then serve until interrupted"""
+    from app.services.model_service import warm_up_model
+
+    host = host or settings.INFERENCE_SERVER_HOST
+    port = port or settings.INFERENCE_SERVER_PORT
+
+    warm_up_model(settings.INFERENCE_RETURN_MASKS)
+
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.batcher = MicroBatcher().start()
+    print(f"Inference server listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Node-local micro-batching inference server")
+    parser.add_argument("--host", default=settings.INFERENCE_SERVER_HOST)
+    parser.add_argument("--port", type=int, default=settings.INFERENCE_SERVER_PORT)
+    args = parser.parse_args()
+
+    serve(args.host, args.port)
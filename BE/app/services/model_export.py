@@ -0,0 +1,222 @@
+# app/services/model_export.py
+#
+# Export model_final.pth to ONNX for the onnxruntime backend:
+#
+#   python -m app.services.model_export --output app/models/model_final.onnx
+#
+# Needs detectron2 + torch (run once on a build machine); workers using
+# MODEL_BACKEND=onnxruntime only need onnxruntime.
+#
+# After exporting, the graph is run against the torch model on the sample
+# image and the result is written to <output>.parity.json. OnnxRuntimeBackend
+# refuses graphs without a passed record (MODEL_ONNX_REQUIRE_PARITY), so a
+# failed export cannot be selected. Re-check an existing graph with:
+#
+#   python -m app.services.model_export --verify-only
+
+import argparse
+import json
+import sys
+import cv2
+import numpy as np
+from datetime import datetime
+from typing import Dict
+from app.config import settings
+from app.services import inference_cache
+from app.services.detection_codec import decode_arrays
+from app.services.model_service import (
+    build_detectron2_cfg,
+    parity_record_path,
+    Detectron2Backend,
+    OnnxRuntimeBackend,
+    _resize_shape,
+    INPUT_MIN_SIZE_TEST,
+    INPUT_MAX_SIZE_TEST,
+)
+
+SAMPLE_IMAGE = "templates/normal.jpg"
+
+# Parity tolerances (scores in [0, 1], boxes in original image pixels)
+PARITY_SCORE_ATOL = 1e-3
+PARITY_BOX_ATOL = 1.0
+
+
+def export_onnx(
+    model_path: str,
+    output_path: str,
+    sample_image: str = SAMPLE_IMAGE,
+    opset: int = 16,
+    score_thresh: float = None
+):
+    """
+    Trace the Detectron2 model (box outputs only) and save it as ONNX
+
+    Low-score boxes stay in the graph (down to score_thresh);
+    OnnxRuntimeBackend applies MODEL_SCORE_FLOOR at runtime.
+
+    Args:
+        model_path: Detectron2 weights (.pth)
+        output_path: Where to write the .onnx graph
+        sample_image: Image used for tracing
+        opset: ONNX opset version
+        score_thresh: Score threshold baked into the graph
+            (default settings.MODEL_EXPORT_SCORE_THRESH)
+    """
+    import torch
+    from detectron2.modeling import build_model
+    from detectron2.checkpoint import DetectionCheckpointer
+    from detectron2.export import TracingAdapter
+
+    if score_thresh is None:
+        score_thresh = settings.MODEL_EXPORT_SCORE_THRESH
+    if settings.MODEL_SCORE_FLOOR < score_thresh:
+        print(
+            f"Warning: MODEL_SCORE_FLOOR={settings.MODEL_SCORE_FLOOR} is below the export threshold "
+            f"{score_thresh}; the ONNX backend will miss detections in between"
+        )
+
+    cfg = build_detectron2_cfg(model_path, "cpu", with_masks=False)
+    cfg.MODEL.ROI_HEADS.SCORE_THRESH_TEST = score_thresh
+
+    model = build_model(cfg)
+    DetectionCheckpointer(model).load(model_path)
+    model.eval()
+
+    img = cv2.imread(sample_image)
+    if img is None:
+        raise ValueError(f"Could not read sample image: {sample_image}")
+    new_h, new_w = _resize_shape(img.shape[0], img.shape[1], INPUT_MIN_SIZE_TEST, INPUT_MAX_SIZE_TEST)
+    resized = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    sample = torch.as_tensor(np.ascontiguousarray(resized.astype(np.float32).transpose(2, 0, 1)))
+
+    # image (CHW float32, resized) -> Instances before postprocess (resized
+    # coordinates); TracingAdapter flattens its fields in name order:
+    # pred_boxes, pred_classes, scores
+    def inference(model, inputs):
+        return model.inference(inputs, do_postprocess=False)[0]
+
+    adapter = TracingAdapter(model, [{"image": sample}], inference_func=inference)
+
+    with torch.no_grad():
+        torch.onnx.export(
+            adapter,
+            adapter.flattened_inputs,
+            output_path,
+            opset_version=opset,
+            input_names=["image"],
+            output_names=["boxes", "classes", "scores"],
+            dynamic_axes={
+                "image": {1: "height", 2: "width"},
+                "boxes": {0: "detections"},
+                "classes": {0: "detections"},
+                "scores": {0: "detections"},
+            },
+        )
+    print(f"Exported {model_path} -> {output_path} (score threshold {score_thresh})")
+    return score_thresh
+
+
+def _match_detections(reference: Dict, candidate: Dict):
+    """
+    Pair each reference detection with the closest unused candidate of the same class
+
+    Returns:
+        (all matched, max score difference, max box coordinate difference)
+    """
+    ref_classes, ref_scores, ref_boxes = decode_arrays(reference)
+    cand_classes, cand_scores, cand_boxes = decode_arrays(candidate)
+    if len(ref_classes) != len(cand_classes):
+        return False, float("inf"), float("inf")
+
+    used = np.zeros(len(cand_classes), dtype=bool)
+    max_score_diff = 0.0
+    max_box_diff = 0.0
+    for i in np.argsort(-ref_scores):
+        candidates = np.flatnonzero((cand_classes == ref_classes[i]) & ~used)
+        if not len(candidates):
+            return False, float("inf"), float("inf")
+        box_diffs = np.abs(cand_boxes[candidates] - ref_boxes[i]).max(axis=1)
+        j = candidates[int(np.argmin(box_diffs))]
+        used[j] = True
+        max_score_diff = max(max_score_diff, float(abs(cand_scores[j] - ref_scores[i])))
+        max_box_diff = max(max_box_diff, float(box_diffs.min()))
+    return True, max_score_diff, max_box_diff
+
+
+def verify_onnx_parity(
+    model_path: str,
+    onnx_path: str,
+    sample_image: str = SAMPLE_IMAGE,
+    score_thresh: float = None,
+    score_atol: float = PARITY_SCORE_ATOL,
+    box_atol: float = PARITY_BOX_ATOL
+) -> Dict:
+    """
+    Check that the ONNX graph gives the same boxes and scores as the torch model
+
+    Both backends run the sample image with the configured MODEL_SCORE_FLOOR.
+    The outcome is written to parity_record_path(onnx_path), which
+    OnnxRuntimeBackend.load() requires before the graph can be used.
+
+    Args:
+        model_path: Detectron2 weights (.pth) the graph was exported from
+        onnx_path: Exported .onnx graph
+        sample_image: Image both models are run on
+        score_thresh: Threshold the graph was exported with
+            (default settings.MODEL_EXPORT_SCORE_THRESH)
+        score_atol / box_atol: Allowed score / box coordinate (pixel) difference
+
+    Returns:
+        The parity record
+    """
+    if score_thresh is None:
+        score_thresh = settings.MODEL_EXPORT_SCORE_THRESH
+
+    img = cv2.imread(sample_image)
+    if img is None:
+        raise ValueError(f"Could not read sample image: {sample_image}")
+
+    reference = Detectron2Backend(model_path, "cpu").load().predict(img)
+    candidate = OnnxRuntimeBackend(onnx_path).open_session().predict(img)
+
+    matched, max_score_diff, max_box_diff = _match_detections(reference, candidate)
+    passed = matched and max_score_diff <= score_atol and max_box_diff <= box_atol
+
+    record = {
+        "passed": passed,
+        "onnxSha256": inference_cache.weights_digest(onnx_path),
+        "weightsSha256": inference_cache.weights_digest(model_path),
+        "scoreThresh": score_thresh,
+        "scoreFloor": settings.MODEL_SCORE_FLOOR,
+        "sampleImage": sample_image,
+        "torchDetections": len(decode_arrays(reference)[0]),
+        "onnxDetections": len(decode_arrays(candidate)[0]),
+        "maxScoreDiff": max_score_diff if matched else None,
+        "maxBoxDiff": max_box_diff if matched else None,
+        "checkedAt": datetime.utcnow().isoformat(),
+    }
+    with open(parity_record_path(onnx_path), "w") as f:
+        json.dump(record, f, indent=2)
+
+    print(
+        f"Parity {'passed' if passed else 'FAILED'} for {onnx_path}: "
+        f"{record['torchDetections']} torch vs {record['onnxDetections']} onnx detections, "
+        f"max score diff {record['maxScoreDiff']}, max box diff {record['maxBoxDiff']}"
+    )
+    return record
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export Detectron2 weights to ONNX")
+    parser.add_argument("--weights", default=settings.MODEL_PATH)
+    parser.add_argument("--output", default=settings.MODEL_ONNX_PATH)
+    parser.add_argument("--sample-image", default=SAMPLE_IMAGE)
+    parser.add_argument("--opset", type=int, default=16)
+    parser.add_argument("--score-thresh", type=float, default=settings.MODEL_EXPORT_SCORE_THRESH)
+    parser.add_argument("--verify-only", action="store_true", help="Only re-run the parity check")
+    args = parser.parse_args()
+
+    if not args.verify_only:
+        export_onnx(args.weights, args.output, args.sample_image, args.opset, args.score_thresh)
+    record = verify_onnx_parity(args.weights, args.output, args.sample_image, args.score_thresh)
+    sys.exit(0 if record["passed"] else 1)
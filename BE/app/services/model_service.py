@@ -2,26 +2,40 @@
 
 import os
 import cv2
-import torch
+import hashlib
 import numpy as np
-from typing import Dict, Optional
+import gc
+import json
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
 from app.config import settings
+from app.core.metrics import StageTimer, time_stage
+from app.services import inference_cache
+from app.services.detection_codec import (  # noqa: F401 (CLASS_* re-exported)
+    CLASS_NAMES,
+    CLASS_MAPPING,
+    encode_detections,
+    expand_detections,
+)
+from app.services.evaluation_service import evaluate_maturity
 from datetime import datetime
 
-# Global model instance (singleton)
-_predictor: Optional[object] = None
+# Model registry: loaded backends keyed by (model version, mask mode), least
+# recently used first; capped by estimated resident size (MODEL_REGISTRY_MAX_MB)
+# and optionally by count (MODEL_REGISTRY_MAX_LOADED)
+_predictors: "OrderedDict[Tuple[str, bool], InferenceBackend]" = OrderedDict()
 
-# Model class names (4 classes from training)
-CLASS_NAMES = ["Polar-Body", "cytoplasm", "oocyte", "polarbody"]
+# Inference cache namespaces per (model version, mask mode, cascade), computed once per process
+_cache_namespaces: Dict[Tuple[str, bool, bool, Optional[float]], str] = {}
 
-# Mapping for normalized class names
-CLASS_MAPPING = {
-    "Polar-Body": "polar-body",  # Original image, not actual PB
-    "polarbody": "polarbody",     # Actual polar body for MI/MII evaluation
-    "cytoplasm": "cytoplasm",
-    "oocyte": "oocyte"
-}
+# Set once a warm-up inference has completed in this process
+_model_ready: bool = False
 
+# Test-time input resize (also part of the inference cache key)
+INPUT_MIN_SIZE_TEST = 1024
+INPUT_MAX_SIZE_TEST = 1600
 
 def _import_detectron2():
     """Lazy import detectron2 - only when needed"""
@@ -37,106 +51,948 @@ def _import_detectron2():
         )
 
 
-def load_model():
+def _import_onnxruntime():
+    """Lazy import onnxruntime - only when the ONNX backend is used"""
+    try:
+        import onnxruntime
+        return onnxruntime
+    except ImportError:
+        raise ImportError(
+            "onnxruntime is not installed. "
+            "Please install it in the Celery worker environment to use MODEL_BACKEND=onnxruntime."
+        )
+
+
+def build_detectron2_cfg(model_path: str, device: str, with_masks: bool = False):
     """
-    Load Detectron2 model (singleton pattern)
-    Model is loaded once and reused for all inference requests
+    Build the Detectron2 config used for training-compatible inference
+    (shared by the Detectron2 backend and the ONNX export command)
     
-    Returns:
-        DefaultPredictor instance
+    The checkpoint is Mask R-CNN, but maturity evaluation only needs boxes,
+    so the mask head is disabled unless with_masks is set (its weights are
+    simply not loaded).
     """
-    global _predictor
-    
-    if _predictor is not None:
-        return _predictor
-    
-    # Lazy import detectron2
-    get_cfg, DefaultPredictor, model_zoo = _import_detectron2()
-    
-    if not os.path.exists(settings.MODEL_PATH):
-        raise FileNotFoundError(f"Model not found: {settings.MODEL_PATH}")
+    get_cfg, _, model_zoo = _import_detectron2()
     
     cfg = get_cfg()
     cfg.merge_from_file(
         model_zoo.get_config_file("COCO-InstanceSegmentation/mask_rcnn_R_101_FPN_3x.yaml")
     )
     
+    cfg.MODEL.MASK_ON = with_masks
     cfg.MODEL.ROI_HEADS.NUM_CLASSES = 4
-    cfg.MODEL.ROI_HEADS.SCORE_THRESH_TEST = settings.MODEL_CONFIDENCE_THRESHOLD
-    cfg.MODEL.WEIGHTS = settings.MODEL_PATH
-    cfg.MODEL.DEVICE = settings.MODEL_DEVICE
-    cfg.INPUT.MIN_SIZE_TEST = 1024
-    cfg.INPUT.MAX_SIZE_TEST = 1600
+    # Keep everything above the floor; the operating threshold
+    # (MODEL_CONFIDENCE_THRESHOLD) is applied at evaluation time
+    cfg.MODEL.ROI_HEADS.SCORE_THRESH_TEST = settings.MODEL_SCORE_FLOOR
+    cfg.MODEL.WEIGHTS = model_path
+    cfg.MODEL.DEVICE = device
+    cfg.INPUT.MIN_SIZE_TEST = INPUT_MIN_SIZE_TEST
+    cfg.INPUT.MAX_SIZE_TEST = INPUT_MAX_SIZE_TEST
+    return cfg
+
+
+def _resolve_device(device: str) -> str:
+    """Fall back to CPU when CUDA is requested but not available on this node"""
+    if device.startswith("cuda"):
+        import torch
+        if not torch.cuda.is_available():
+            print(f"Warning: MODEL_DEVICE={device} but CUDA is not available, using cpu")
+            return "cpu"
+    return device
+
+
+def _resize_shape(height: int, width: int, min_size: int, max_size: int) -> Tuple[int, int]:
+    """Output (height, width) of Detectron2's ResizeShortestEdge for test-time input"""
+    scale = min_size / min(height, width)
+    if max(height, width) * scale > max_size:
+        scale = max_size / max(height, width)
+    return int(height * scale + 0.5), int(width * scale + 0.5)
+
+
+def _mask_to_rle(mask: np.ndarray) -> Dict:
+    """
+    Encode a binary mask as uncompressed COCO-style RLE
+    (column-major run lengths, starting with a run of zeros)
+    """
+    flat = np.asarray(mask, dtype=np.uint8).ravel(order="F")
+    change_idx = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    counts = np.diff(np.concatenate([[0], change_idx, [flat.size]])).tolist()
+    if flat.size and flat[0]:
+        counts = [0] + counts
+    return {"size": [int(mask.shape[0]), int(mask.shape[1])], "counts": counts}
+
+
+class InferenceBackend:
+    """
+    Inference engine interface
+    
+    Backends take BGR images (as read by cv2) and return detections packed in
+    the compact columnar form (see detection_codec.encode_detections), with
+    boxes in original image coordinates. Backends loaded with_masks also add
+    "masks": one RLE per detection. Given a StageTimer, predict_batch records
+    the preprocess / forward / postprocess time of the whole call in it.
+    """
+    name = "base"
+    supports_masks = False
+    version: Optional[str] = None  # set by the model registry
+    loaded_bytes: int = 0  # memory_bytes() at load time, set by the model registry
+    
+    def __init__(self, weights_path: str, with_masks: bool = False):
+        if with_masks and not self.supports_masks:
+            raise ValueError(f"Backend '{self.name}' cannot produce masks")
+        self.weights_path = weights_path
+        self.with_masks = with_masks
+    
+    def load(self):
+        raise NotImplementedError
+    
+    def memory_bytes(self) -> int:
+        """Estimated resident size of the loaded model (default: size of the weights file)"""
+        try:
+            return os.path.getsize(self.weights_path)
+        except OSError:
+            return 0
+    
+    def predict(
+        self,
+        image: np.ndarray,
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None
+    ) -> Dict:
+        return self.predict_batch([image], min_size, max_size)[0]
+    
+    def predict_batch(
+        self,
+        images: List[np.ndarray],
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        timer: Optional[StageTimer] = None
+    ) -> List[Dict]:
+        """
+        Args:
+            images: BGR images
+            min_size / max_size: Override the test-time resize
+                (default INPUT_MIN_SIZE_TEST / INPUT_MAX_SIZE_TEST)
+            timer: Collects preprocess / forward / postprocess seconds
+        """
+        raise NotImplementedError
+
+
+class Detectron2Backend(InferenceBackend):
+    """Eager PyTorch Mask R-CNN through Detectron2 (the training stack)"""
+    name = "detectron2"
+    supports_masks = True
+    
+    def __init__(self, weights_path: str, device: str, with_masks: bool = False):
+        super().__init__(weights_path, with_masks)
+        self.device = device
+        self.predictor = None
+    
+    def load(self):
+        _, DefaultPredictor, _ = _import_detectron2()
+        
+        if not os.path.exists(self.weights_path):
+            raise FileNotFoundError(f"Model not found: {self.weights_path}")
+        
+        cfg = build_detectron2_cfg(self.weights_path, _resolve_device(self.device), self.with_masks)
+        self.predictor = DefaultPredictor(cfg)
+        return self
+    
+    def memory_bytes(self) -> int:
+        """Parameters and buffers of the model (count x dtype size), on whichever device"""
+        if self.predictor is None:
+            return 0
+        model = self.predictor.model
+        return sum(
+            tensor.numel() * tensor.element_size()
+            for tensor in list(model.parameters()) + list(model.buffers())
+        )
+    
+    def predict_batch(
+        self,
+        images: List[np.ndarray],
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        timer: Optional[StageTimer] = None
+    ) -> List[Dict]:
+        """
+        Run ONE forward pass over several images
+        
+        Mirrors DefaultPredictor.__call__ (input format, resize, tensor layout)
+        but feeds all images to the model as a single list so the backbone
+        processes them together.
+        """
+        import torch
+        
+        predictor = self.predictor
+        aug = predictor.aug
+        if min_size or max_size:
+            from detectron2.data import transforms as T
+            min_size = min_size or INPUT_MIN_SIZE_TEST
+            aug = T.ResizeShortestEdge([min_size, min_size], max_size or INPUT_MAX_SIZE_TEST)
+        
+        inputs = []
+        with torch.no_grad():
+            with time_stage(timer, "preprocess"):
+                for img in images:
+                    if predictor.input_format == "RGB":
+                        img = img[:, :, ::-1]
+                    height, width = img.shape[:2]
+                    image = aug.get_transform(img).apply_image(img)
+                    image = torch.as_tensor(image.astype("float32").transpose(2, 0, 1))
+                    image = image.to(predictor.cfg.MODEL.DEVICE)
+                    inputs.append({"image": image, "height": height, "width": width})
+            
+            with time_stage(timer, "forward"):
+                outputs = predictor.model(inputs)
+                # CUDA runs asynchronously: wait so the kernels count as forward
+                if timer is not None and torch.cuda.is_available() and inputs and inputs[0]["image"].is_cuda:
+                    torch.cuda.synchronize()
+        
+        results = []
+        with time_stage(timer, "postprocess"):
+            for out in outputs:
+                instances = out["instances"].to("cpu")
+                detections = encode_detections(
+                    instances.pred_classes.numpy(),
+                    instances.scores.numpy(),
+                    instances.pred_boxes.tensor.numpy(),
+                )
+                if self.with_masks:
+                    detections["masks"] = [_mask_to_rle(mask) for mask in instances.pred_masks.numpy()]
+                results.append(detections)
+        return results
+
+
+class OnnxRuntimeBackend(InferenceBackend):
+    """
+    Exported graph on ONNX Runtime (CPU), no detectron2/torch needed
+    
+    The graph is produced by `python -m app.services.model_export`: input is a
+    float32 CHW BGR image already resized like ResizeShortestEdge, outputs are
+    boxes (in resized coordinates), class ids and scores (box-only, no masks).
+    Resize and box rescaling happen here.
+    
+    The export compares the graph with the torch model on a sample image and
+    records the result next to it (<graph>.parity.json); with
+    MODEL_ONNX_REQUIRE_PARITY, a graph without a passed record is not loaded.
+    """
+    name = "onnxruntime"
+    
+    def __init__(self, weights_path: str, with_masks: bool = False):
+        super().__init__(weights_path, with_masks)
+        self.session = None
+    
+    def load(self):
+        if not os.path.exists(self.weights_path):
+            raise FileNotFoundError(
+                f"ONNX model not found: {self.weights_path} "
+                "(export it with `python -m app.services.model_export`)"
+            )
+        if settings.MODEL_ONNX_REQUIRE_PARITY:
+            self._check_parity_record()
+        return self.open_session()
+    
+    def _check_parity_record(self):
+        """
+        Raises:
+            ValueError: If the graph has no passed parity record, or the record
+                belongs to another file
+        """
+        record_path = parity_record_path(self.weights_path)
+        try:
+            with open(record_path) as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            record = None
+        
+        if (
+            not record
+            or not record.get("passed")
+            or record.get("onnxSha256") != inference_cache.weights_digest(self.weights_path)
+        ):
+            raise ValueError(
+                f"ONNX model {self.weights_path} has not passed the parity check against the torch "
+                f"model ({record_path}); re-export it with `python -m app.services.model_export`"
+            )
+        if settings.MODEL_SCORE_FLOOR < record.get("scoreThresh", 0.0):
+            print(
+                f"Warning: MODEL_SCORE_FLOOR={settings.MODEL_SCORE_FLOOR} is below the export threshold "
+                f"{record['scoreThresh']} of {self.weights_path}; detections in between are missing"
+            )
+    
+    def open_session(self):
+        """Create the ONNX Runtime session (no parity check; used by the export's own check)"""
+        ort = _import_onnxruntime()
+        
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if settings.ORT_INTRA_OP_THREADS > 0:
+            options.intra_op_num_threads = settings.ORT_INTRA_OP_THREADS
+        
+        self.session = ort.InferenceSession(
+            self.weights_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_name = self.session.get_inputs()[0].name
+        return self
+    
+    def predict_batch(
+        self,
+        images: List[np.ndarray],
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        timer: Optional[StageTimer] = None
+    ) -> List[Dict]:
+        # Exported graph takes one image; ORT parallelizes inside each run
+        min_size = min_size or INPUT_MIN_SIZE_TEST
+        max_size = max_size or INPUT_MAX_SIZE_TEST
+        return [self._predict_one(img, min_size, max_size, timer) for img in images]
+    
+    def _predict_one(
+        self,
+        img: np.ndarray,
+        min_size: int,
+        max_size: int,
+        timer: Optional[StageTimer] = None
+    ) -> Dict:
+        with time_stage(timer, "preprocess"):
+            height, width = img.shape[:2]
+            new_h, new_w = _resize_shape(height, width, min_size, max_size)
+            resized = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+            tensor = np.ascontiguousarray(resized.astype(np.float32).transpose(2, 0, 1))
+        
+        with time_stage(timer, "forward"):
+            boxes, classes, scores = self.session.run(None, {self.input_name: tensor})
+        
+        with time_stage(timer, "postprocess"):
+            # Graph keeps scores down to MODEL_EXPORT_SCORE_THRESH: apply the configured floor here
+            keep = scores >= settings.MODEL_SCORE_FLOOR
+            boxes, classes, scores = boxes[keep], classes[keep], scores[keep]
+            
+            # Back to original image coordinates (same as detectron2 postprocess)
+            boxes = boxes * np.array([width / new_w, height / new_h, width / new_w, height / new_h], dtype=np.float32)
+            boxes[:, 0::2] = boxes[:, 0::2].clip(0, width)
+            boxes[:, 1::2] = boxes[:, 1::2].clip(0, height)
+            
+            return encode_detections(classes, scores, boxes)
+
+
+def parity_record_path(onnx_path: str) -> str:
+    """Where model_export records the ONNX / torch parity check of a graph"""
+    return onnx_path + ".parity.json"
+
+
+def get_model_specs() -> Dict[str, Dict]:
+    """
+    Available model versions
+    
+    The default version (MODEL_VERSION / MODEL_BACKEND / MODEL_PATH or
+    MODEL_ONNX_PATH) is always present; MODEL_REGISTRY adds more as JSON:
+        {"v2.0": {"path": "app/models/v2.onnx", "backend": "onnxruntime"}}
+    
+    Returns:
+        {version: {"path": str, "backend": "detectron2" | "onnxruntime"}}
+    """
+    default_path = settings.MODEL_ONNX_PATH if settings.MODEL_BACKEND == "onnxruntime" else settings.MODEL_PATH
+    specs = {settings.MODEL_VERSION: {"path": default_path, "backend": settings.MODEL_BACKEND}}
+    
+    if settings.MODEL_REGISTRY:
+        for version, spec in json.loads(settings.MODEL_REGISTRY).items():
+            specs[version] = {
+                "path": spec["path"],
+                "backend": spec.get("backend", "detectron2"),
+            }
+    return specs
+
+
+def _get_model_spec(model_version: Optional[str]) -> Tuple[str, Dict]:
+    """
+    Raises:
+        ValueError: If model_version is not registered
+    """
+    version = model_version or settings.MODEL_VERSION
+    specs = get_model_specs()
+    if version not in specs:
+        raise ValueError(f"Unknown model version: {version}")
+    return version, specs[version]
+
+
+def _create_backend(model_version: Optional[str] = None, with_masks: bool = False) -> InferenceBackend:
+    """Instantiate the backend registered for model_version (not loaded yet)"""
+    version, spec = _get_model_spec(model_version)
+    
+    if spec["backend"] == "onnxruntime":
+        backend = OnnxRuntimeBackend(spec["path"], with_masks)
+    elif spec["backend"] == "detectron2":
+        backend = Detectron2Backend(spec["path"], settings.MODEL_DEVICE, with_masks)
+    else:
+        raise ValueError(f"Unknown model backend: {spec['backend']}")
+    
+    backend.version = version
+    return backend
+
+
+def load_model(with_masks: bool = False, model_version: Optional[str] = None) -> InferenceBackend:
+    """
+    Get a loaded inference backend from the model registry
+    Each model is loaded once and reused for all inference requests. Least
+    recently used models are dropped while the loaded ones together exceed
+    MODEL_REGISTRY_MAX_MB (estimated, see InferenceBackend.memory_bytes) or
+    their number exceeds MODEL_REGISTRY_MAX_LOADED (if set); the model just
+    requested is always kept. A version loaded in both mask modes holds two
+    copies and counts twice.
+    
+    Args:
+        with_masks: Load with the mask head enabled (box-only by default)
+        model_version: Registered model version (default: settings.MODEL_VERSION)
+    
+    Returns:
+        InferenceBackend instance (backend.version is the version actually used)
+    """
+    key = (model_version or settings.MODEL_VERSION, with_masks)
+    
+    if key in _predictors:
+        _predictors.move_to_end(key)
+        return _predictors[key]
+    
+    backend = _create_backend(*key).load()
+    backend.loaded_bytes = backend.memory_bytes()
+    _predictors[key] = backend
+    
+    max_bytes = settings.MODEL_REGISTRY_MAX_MB * 1024 * 1024
+    max_loaded = settings.MODEL_REGISTRY_MAX_LOADED
+    while len(_predictors) > 1 and (
+        (max_bytes > 0 and sum(b.loaded_bytes for b in _predictors.values()) > max_bytes)
+        or (max_loaded > 0 and len(_predictors) > max_loaded)
+    ):
+        evicted_key, evicted = _predictors.popitem(last=False)
+        print(
+            f"Unloaded model {evicted_key[0]} ({'masks' if evicted_key[1] else 'boxes'}, "
+            f"~{evicted.loaded_bytes / (1024 * 1024):.0f} MB) from registry"
+        )
+        del evicted
+        gc.collect()
+    
+    return backend
+
+
+def preload_model(with_masks: bool = False):
+    """
+    Load weights before the Celery pool forks so children share them
+    copy-on-write (called from the worker_init signal in the parent)
+    
+    Torch is limited to one thread here: if the parent started an OpenMP
+    thread pool, forked children could deadlock on first use. warm_up_model
+    restores the thread count in each child.
+    
+    ONNX Runtime sessions own thread pools that don't survive fork, so that
+    backend is only loaded in the children. Neither does a CUDA context, so
+    with MODEL_DEVICE=cuda nothing is preloaded either (the device is not
+    probed here: even torch.cuda.is_available() initializes the driver).
+    """
+    if settings.MODEL_BACKEND != "detectron2":
+        return
+    if settings.MODEL_DEVICE.startswith("cuda"):
+        print("Model preload skipped: MODEL_DEVICE is cuda, each worker child loads its own copy")
+        return
+    
+    import torch
+    torch.set_num_threads(1)
+    load_model(with_masks)
+
+
+def warm_up_model(with_masks: bool = False):
+    """
+    Run one real inference so first-frame latency matches steady state
+    (called from the worker_process_init signal in each child)
+    
+    Bypasses the inference cache so the model is actually exercised.
+    """
+    global _model_ready
+    
+    if settings.MODEL_BACKEND == "detectron2":
+        import torch
+        torch.set_num_threads(settings.TORCH_NUM_THREADS or os.cpu_count() or 1)
+    
+    backend = load_model(with_masks)
+    
+    img = cv2.imread(settings.INFERENCE_WARMUP_IMAGE)
+    if img is None:
+        raise ValueError(f"Could not read warm-up image: {settings.INFERENCE_WARMUP_IMAGE}")
+    backend.predict(img)
+    
+    _model_ready = True
+
+
+def is_model_ready() -> bool:
+    """True once this process has loaded and warmed up the model"""
+    return _model_ready
+
+
+def get_model_status() -> Dict:
+    """
+    Returns:
+        {"ready": bool, "backend": str, "modelVersion": str, "loaded": ["version:mode"],
+         "loadedMb": estimated size of the loaded models, "pid": int,
+         "server": INFERENCE_SERVER_URL or None}
+    """
+    return {
+        "server": settings.INFERENCE_SERVER_URL or None,
+        "ready": _model_ready,
+        "backend": settings.MODEL_BACKEND,
+        "modelVersion": settings.MODEL_VERSION,
+        "loaded": [
+            f"{version}:{'masks' if with_masks else 'boxes'}" for version, with_masks in _predictors
+        ],
+        "loadedMb": round(sum(b.loaded_bytes for b in _predictors.values()) / (1024 * 1024), 1),
+        "pid": os.getpid(),
+    }
+
+
+class _LoadedFrame(NamedTuple):
+    """A frame read from disk: either a cache hit or a decoded image"""
+    cache_key: Optional[str]
+    image: Optional[np.ndarray]
+    cached: Optional[Dict]
+    timings: StageTimer  # read (incl. hash + cache lookup) / decode
+
+
+def _get_cache_namespace(
+    with_masks: bool = False,
+    model_version: Optional[str] = None,
+    cascade: bool = False,
+    threshold: Optional[float] = None
+) -> str:
+    """
+    Everything besides the image bytes that changes the model output:
+    model version, backend, weights hash, score floor, test input size,
+    mask mode, cascade settings (and the threshold the cascade decided on)
+    """
+    version, spec = _get_model_spec(model_version)
+    if not cascade:
+        threshold = None
+    key = (version, with_masks, cascade, threshold)
+    if key not in _cache_namespaces:
+        _cache_namespaces[key] = "|".join([
+            version,
+            spec["backend"],
+            inference_cache.weights_digest(spec["path"]),
+            f"floor{settings.MODEL_SCORE_FLOOR}",
+            f"{INPUT_MIN_SIZE_TEST}x{INPUT_MAX_SIZE_TEST}",
+            "masks" if with_masks else "boxes",
+            (
+                f"cascade{settings.INFERENCE_CASCADE_MIN_SIZE}x{settings.INFERENCE_CASCADE_MAX_SIZE}"
+                f"~{settings.INFERENCE_CASCADE_MARGIN}@{threshold}"
+            ) if cascade else "single",
+        ])
+    return _cache_namespaces[key]
+
+
+def _load_frame(
+    image_path: str,
+    with_masks: bool = False,
+    model_version: Optional[str] = None,
+    cascade: bool = False,
+    threshold: Optional[float] = None
+) -> _LoadedFrame:
+    """
+    Read an image once: hash the bytes for the inference cache and only
+    decode them (BGR array) on a cache miss
+    
+    Raises:
+        ValueError: If image cannot be read
+    """
+    timer = StageTimer()
+    with timer.stage("read"):
+        try:
+            with open(image_path, "rb") as f:
+                data = f.read()
+        except OSError:
+            raise ValueError(f"Could not read image: {image_path}")
+        
+        cache_key = None
+        if inference_cache.is_enabled():
+            cache_key = inference_cache.make_key(
+                hashlib.sha256(data).hexdigest(), _get_cache_namespace(with_masks, model_version, cascade, threshold)
+            )
+            cached = inference_cache.get(cache_key)
+            if cached is not None:
+                return _LoadedFrame(cache_key, None, cached, timer)
+    
+    with timer.stage("decode"):
+        img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError(f"Could not read image: {image_path}")
+    return _LoadedFrame(cache_key, img, None, timer)
+
+
+def _prefetch_frames(
+    image_paths: List[str],
+    with_masks: bool = False,
+    model_version: Optional[str] = None,
+    cascade: bool = False,
+    threshold: Optional[float] = None,
+    depth: Optional[int] = None,
+    threads: Optional[int] = None
+) -> Iterator[Tuple[int, Union[_LoadedFrame, Exception]]]:
+    """
+    Read + decode images on a small thread pool ahead of the consumer
+    
+    At most `depth` images are in flight (queued or decoded but not yet
+    consumed), so memory stays bounded no matter how many paths are given.
+    File reads, hashing and cv2.imdecode release the GIL, so decoding
+    overlaps with model inference running on the consumer thread.
+    
+    Args:
+        image_paths: Paths to image files
+        with_masks: Mask mode (selects the inference cache namespace)
+        model_version: Model version (selects the inference cache namespace)
+        cascade: Cascade mode (selects the inference cache namespace)
+        threshold: Cascade threshold (selects the inference cache namespace)
+        depth: Max images decoded ahead (default: settings.INFERENCE_PREFETCH_DEPTH)
+        threads: Decode threads (default: settings.INFERENCE_DECODE_THREADS)
+        
+    Yields:
+        (index, frame) in input order; frame is the Exception raised if the
+        file could not be read
+    """
+    depth = max(1, depth or settings.INFERENCE_PREFETCH_DEPTH)
+    threads = max(1, threads or settings.INFERENCE_DECODE_THREADS)
     
-    _predictor = DefaultPredictor(cfg)
-    return _predictor
+    executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="frame-decode")
+    pending = deque()
+    next_index = 0
+    try:
+        while next_index < len(image_paths) or pending:
+            # Keep the queue topped up to `depth` images
+            while next_index < len(image_paths) and len(pending) < depth:
+                pending.append((next_index, executor.submit(
+                    _load_frame, image_paths[next_index], with_masks, model_version, cascade, threshold
+                )))
+                next_index += 1
+            
+            index, future = pending.popleft()
+            try:
+                yield index, future.result()
+            except Exception as e:
+                yield index, e
+    finally:
+        for _, future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+def _build_result(
+    detections: Dict,
+    model_version: str,
+    cascade_pass: Optional[str] = None,
+    timings: Optional[StageTimer] = None
+) -> Dict:
+    result = {
+        **detections,
+        "inferenceTimestamp": datetime.utcnow().isoformat() + "Z",
+        "modelVersion": model_version,
+        "scoreFloor": settings.MODEL_SCORE_FLOOR
+    }
+    if cascade_pass:
+        result["cascadePass"] = cascade_pass
+    if timings is not None:
+        result["timings"] = timings.as_ms()
+    return result
+
 
+def _cached_result(frame: _LoadedFrame) -> Dict:
+    """A cache hit, with the timings of this read (not of the original inference)"""
+    return {**frame.cached, "timings": frame.timings.as_ms()}
 
-def run_inference(image_path: str) -> Dict:
+
+def _is_ambiguous(packed: Dict, threshold: float) -> bool:
+    """
+    Whether a low-resolution result is not trustworthy enough to keep
+    
+    Ambiguous when no oocyte was found above the threshold, or when the
+    evaluate_maturity decision changes anywhere within
+    INFERENCE_CASCADE_MARGIN of the threshold (raw detections are kept
+    down to MODEL_SCORE_FLOOR, so near-miss polar bodies are visible here).
+    
+    Args:
+        packed: Packed detections of the low-resolution pass
+        threshold: Operating threshold the frame will be evaluated at
+    """
+    detections = expand_detections(packed)
+    margin = settings.INFERENCE_CASCADE_MARGIN
+    
+    if not any(d.get("class") == "oocyte" and d.get("confidence", 0.0) >= threshold for d in detections):
+        return True
+    
+    return (
+        evaluate_maturity(detections, max(0.0, threshold - margin))["maturity"]
+        != evaluate_maturity(detections, min(1.0, threshold + margin))["maturity"]
+    )
+
+
+def _predict_cascade(
+    backend: InferenceBackend,
+    images: List[np.ndarray],
+    cascade: bool,
+    threshold: Optional[float] = None
+) -> List[Tuple[Dict, Optional[str], Dict[str, float]]]:
+    """
+    Predict a group of images, optionally as a two-pass resolution cascade
+    
+    With cascade, every image first runs at INFERENCE_CASCADE_MIN_SIZE /
+    MAX_SIZE; only images whose result is ambiguous at `threshold` (default:
+    settings.MODEL_CONFIDENCE_THRESHOLD, see _is_ambiguous) are re-run at
+    full resolution.
+    
+    Returns:
+        [(packed detections, pass, stage seconds)] aligned with images; pass is
+        "low" | "full" with cascade, None without. Stage seconds are the
+        image's share of each forward pass it took part in.
+    """
+    timer = StageTimer()
+    if not cascade:
+        outputs = backend.predict_batch(images, timer=timer)
+        share = {name: seconds / len(images) for name, seconds in timer.seconds.items()}
+        return [(detections, None, share) for detections in outputs]
+    
+    if threshold is None:
+        threshold = settings.MODEL_CONFIDENCE_THRESHOLD
+    outputs = backend.predict_batch(
+        images, settings.INFERENCE_CASCADE_MIN_SIZE, settings.INFERENCE_CASCADE_MAX_SIZE, timer=timer
+    )
+    with timer.stage("postprocess"):
+        ambiguous = [i for i, detections in enumerate(outputs) if _is_ambiguous(detections, threshold)]
+    share = {name: seconds / len(images) for name, seconds in timer.seconds.items()}
+    results = [(detections, "low", dict(share)) for detections in outputs]
+    
+    if ambiguous:
+        full_timer = StageTimer()
+        full = backend.predict_batch([images[i] for i in ambiguous], timer=full_timer)
+        for i, detections in zip(ambiguous, full):
+            seconds = results[i][2]
+            for name, value in full_timer.seconds.items():
+                seconds[name] = seconds.get(name, 0.0) + value / len(ambiguous)
+            results[i] = (detections, "full", seconds)
+    
+    return results
+
+
+def run_inference(
+    image_path: str,
+    with_masks: bool = False,
+    model_version: Optional[str] = None,
+    cascade: Optional[bool] = None,
+    threshold: Optional[float] = None
+) -> Dict:
     """
     Run inference on a single image
     
     Args:
         image_path: Path to image file
+        with_masks: Also return a "mask" (RLE) per detection. Off by default:
+            maturity evaluation only uses classes/scores/boxes, so the mask
+            head is skipped.
+        model_version: Registered model version (default: settings.MODEL_VERSION)
+        cascade: Low-resolution pass first, full resolution only if the
+            maturity decision is ambiguous (default: settings.INFERENCE_CASCADE_ENABLED)
+        threshold: Operating threshold the result will be evaluated at; decides
+            what is ambiguous in the cascade (default: settings.MODEL_CONFIDENCE_THRESHOLD)
         
     Returns:
         {
-            "detections": [
-                {
-                    "class": "oocyte" | "pb" | "polarbody" | "cytoplasm" | "polar-body",
-                    "confidence": float,
-                    "bbox": {"x1": float, "y1": float, "x2": float, "y2": float}
-                }
-            ],
-            "inferenceTimestamp": datetime ISO string
+            # Detections packed column-wise (detection_codec); expand with
+            # detection_codec.expand_detection_results for the API schema
+            "format": "columnar-v1",
+            "count": int,
+            "classIds": bytes, "scores": bytes, "boxes": bytes, "boxScale": int,
+            "inferenceTimestamp": datetime ISO string,
+            "modelVersion": version of the model that produced the detections,
+            "cascadePass": "low" | "full",  # only with cascade
+            "timings": {"read", "decode", "preprocess", "forward", "postprocess"}  # ms
+                # (cache hits: read only)
         }
         
     Raises:
-        ValueError: If image cannot be read
+        ValueError: If image cannot be read or model_version is unknown
         FileNotFoundError: If model not found
+        RuntimeError: If INFERENCE_SERVER_URL is set and the server is unreachable
     """
-    predictor = load_model()
+    if settings.INFERENCE_SERVER_URL:
+        from app.services.inference_server import request_inference
+        result = request_inference([image_path], with_masks, model_version, cascade, threshold)[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
     
-    # Read image
-    img = cv2.imread(image_path)
-    if img is None:
-        raise ValueError(f"Could not read image: {image_path}")
+    # Read image (returns stored results if this exact image was already inferred)
+    if cascade is None:
+        cascade = settings.INFERENCE_CASCADE_ENABLED
+    if threshold is None:
+        threshold = settings.MODEL_CONFIDENCE_THRESHOLD
+    
+    frame = _load_frame(image_path, with_masks, model_version, cascade, threshold)
+    if frame.cached is not None:
+        return _cached_result(frame)
     
-    img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    backend = load_model(with_masks, model_version)
     
     # Run inference
-    outputs = predictor(img)
-    instances = outputs["instances"].to("cpu")
-    
-    # Extract detections
-    detections = []
-    pred_classes = instances.pred_classes.numpy()
-    scores = instances.scores.numpy()
-    boxes = instances.pred_boxes.tensor.numpy()
-    
-    for i in range(len(instances)):
-        class_id = pred_classes[i]
-        class_name = CLASS_NAMES[class_id]
-        
-        # Normalize class name using mapping
-        normalized_class = CLASS_MAPPING.get(class_name, class_name.lower())
-        
-        # Get bounding box (x1, y1, x2, y2)
-        box = boxes[i]
-        x1, y1, x2, y2 = float(box[0]), float(box[1]), float(box[2]), float(box[3])
-        
-        detections.append({
-            "class": normalized_class,
-            "confidence": float(scores[i]),
-            "bbox": {
-                "x1": x1,
-                "y1": y1,
-                "x2": x2,
-                "y2": y2
-            }
-        })
+    detections, cascade_pass, seconds = _predict_cascade(backend, [frame.image], cascade, threshold)[0]
+    frame.timings.merge(seconds)
+    result = _build_result(detections, backend.version, cascade_pass, frame.timings)
+    if frame.cache_key:
+        inference_cache.put(frame.cache_key, result)
+    return result
+
+
+def iter_inference_batch(
+    image_paths: List[str],
+    batch_size: Optional[int] = None,
+    with_masks: bool = False,
+    model_version: Optional[str] = None,
+    cascade: Optional[bool] = None,
+    threshold: Optional[float] = None
+) -> Iterator[Tuple[int, Union[Dict, Exception]]]:
+    """
+    Run batched inference over many images, yielding results as they finish
     
-    return {
-        "detections": detections,
-        "inferenceTimestamp": datetime.utcnow().isoformat() + "Z"
-    }
\ No newline at end of file
+    Images are decoded in background threads (see _prefetch_frames) and
+    collected in windows of `batch_size * INFERENCE_BATCH_WINDOW`, sorted by
+    resolution inside the window so that images of similar size share a
+    forward pass (less padding), then run `batch_size` at a time. While a
+    window is in the model, the next frames are already being decoded.
+    Frames found in the inference cache are yielded without touching the model.
+    
+    Args:
+        image_paths: Paths to image files
+        batch_size: Images per forward pass (default: settings.INFERENCE_BATCH_SIZE)
+        with_masks: Also return a "mask" (RLE) per detection (see run_inference)
+        model_version: Registered model version (default: settings.MODEL_VERSION)
+        cascade: Two-pass resolution cascade (see run_inference)
+        threshold: Operating threshold for the cascade (see run_inference)
+        
+    Yields:
+        (index, result): index into image_paths; result has the same shape as
+        run_inference() or is the Exception raised for that image (e.g. unreadable file)
+        
+    Raises:
+        FileNotFoundError: If model not found
+    """
+    if settings.INFERENCE_SERVER_URL:
+        yield from _iter_remote_inference_batch(
+            image_paths, batch_size, with_masks, model_version, cascade, threshold
+        )
+    else:
+        yield from _iter_local_inference_batch(
+            image_paths, batch_size, with_masks, model_version, cascade, threshold
+        )
+
+
+def _iter_remote_inference_batch(
+    image_paths: List[str],
+    batch_size: Optional[int] = None,
+    with_masks: bool = False,
+    model_version: Optional[str] = None,
+    cascade: Optional[bool] = None,
+    threshold: Optional[float] = None
+) -> Iterator[Tuple[int, Union[Dict, Exception]]]:
+    """
+    iter_inference_batch through the inference server: one request per
+    window so results still stream back while later windows are running
+    """
+    from app.services.inference_server import request_inference
+    
+    batch_size = max(1, batch_size or settings.INFERENCE_BATCH_SIZE)
+    window_size = batch_size * max(1, settings.INFERENCE_BATCH_WINDOW)
+    
+    for start in range(0, len(image_paths), window_size):
+        chunk = image_paths[start:start + window_size]
+        try:
+            results = request_inference(chunk, with_masks, model_version, cascade, threshold)
+        except Exception as e:
+            results = [e] * len(chunk)
+        for offset, result in enumerate(results):
+            yield start + offset, result
+
+
+def _iter_local_inference_batch(
+    image_paths: List[str],
+    batch_size: Optional[int] = None,
+    with_masks: bool = False,
+    model_version: Optional[str] = None,
+    cascade: Optional[bool] = None,
+    threshold: Optional[float] = None
+) -> Iterator[Tuple[int, Union[Dict, Exception]]]:
+    """iter_inference_batch with the model in this process (also used by the inference server)"""
+    if cascade is None:
+        cascade = settings.INFERENCE_CASCADE_ENABLED
+    if threshold is None:
+        threshold = settings.MODEL_CONFIDENCE_THRESHOLD
+    
+    backend = load_model(with_masks, model_version)
+    batch_size = max(1, batch_size or settings.INFERENCE_BATCH_SIZE)
+    window_size = batch_size * max(1, settings.INFERENCE_BATCH_WINDOW)
+    
+    decoded = _prefetch_frames(image_paths, with_masks, model_version, cascade, threshold)
+    for start in range(0, len(image_paths), window_size):
+        window = []
+        for index, frame in islice(decoded, window_size):
+            if isinstance(frame, Exception):
+                yield index, frame
+            elif frame.cached is not None:
+                yield index, _cached_result(frame)
+            else:
+                window.append((index, frame))
+        
+        # Group similar resolutions together to minimize padding
+        window.sort(key=lambda item: item[1].image.shape[:2])
+        
+        for i in range(0, len(window), batch_size):
+            chunk = window[i:i + batch_size]
+            try:
+                chunk_detections = _predict_cascade(
+                    backend, [frame.image for _, frame in chunk], cascade, threshold
+                )
+            except Exception as e:
+                for index, _ in chunk:
+                    yield index, e
+                continue
+            
+            for (index, frame), (detections, cascade_pass, seconds) in zip(chunk, chunk_detections):
+                frame.timings.merge(seconds)
+                result = _build_result(detections, backend.version, cascade_pass, frame.timings)
+                if frame.cache_key:
+                    inference_cache.put(frame.cache_key, result)
+                yield index, result
+
+
+def run_inference_batch(
+    image_paths: List[str],
+    batch_size: Optional[int] = None,
+    with_masks: bool = False,
+    model_version: Optional[str] = None,
+    cascade: Optional[bool] = None,
+    threshold: Optional[float] = None
+) -> List[Union[Dict, Exception]]:
+    """
+    Run batched inference on a list of images
+    
+    Args:
+        image_paths: Paths to image files
+        batch_size: Images per forward pass (default: settings.INFERENCE_BATCH_SIZE)
+        with_masks: Also return a "mask" (RLE) per detection (see run_inference)
+        model_version: Registered model version (default: settings.MODEL_VERSION)
+        cascade: Two-pass resolution cascade (see run_inference)
+        threshold: Operating threshold for the cascade (see run_inference)
+        
+    Returns:
+        List aligned with image_paths; each item is a run_inference()-shaped
+        dict, or the Exception raised for that image
+    """
+    results: List[Union[Dict, Exception]] = [None] * len(image_paths)
+    for index, result in iter_inference_batch(
+        image_paths, batch_size, with_masks, model_version, cascade, threshold
+    ):
+        results[index] = result
+    return results
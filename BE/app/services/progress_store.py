@@ -0,0 +1,287 @@
+# app/services/progress_store.py
+#
+# Hot copy of evaluation progress in Redis, served to the status endpoint
+# before Firestore:
+#
+#   eval:{batch_id}:progress  hash    evaluationRequestId, status, batchStatus,
+#                                     totalFrames, completedFrames, failedFrames, updatedAt
+#   eval:{batch_id}:frames    hash    frameId -> status
+#   eval:{batch_id}:events    stream  run-started, frame-completed, frame-failed,
+#                                     batch-completed, batch-failed (for SSE clients)
+#
+# Firestore stays the source of truth: every write here swallows Redis
+# errors (with a warning) and readers fall back to Firestore on a miss.
+
+import json
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from app.config import settings
+from app.core.redis_client import get_redis, get_async_redis
+
+# Move completed/failed counters only when a frame's status actually changes,
+# and append one event per change; frames that are not part of the current
+# run (no entry) are ignored
+# KEYS: progress hash, frames hash, events stream
+# ARGV: ttl, updatedAt, events maxlen, frame_id, status, frame_id, status, ...
+_RECORD_STATUSES_LUA = """
+local counters = {completed = "completedFrames", done = "completedFrames", failed = "failedFrames"}
+local events = {completed = "frame-completed", done = "frame-completed", failed = "frame-failed"}
+if redis.call("EXISTS", KEYS[1]) == 0 then
+    return 0
+end
+for i = 4, #ARGV, 2 do
+    local old = redis.call("HGET", KEYS[2], ARGV[i])
+    local new = ARGV[i + 1]
+    if old and old ~= new then
+        if counters[old] then
+            redis.call("HINCRBY", KEYS[1], counters[old], -1)
+        end
+        if counters[new] then
+            redis.call("HINCRBY", KEYS[1], counters[new], 1)
+        end
+        redis.call("HSET", KEYS[2], ARGV[i], new)
+        redis.call(
+            "XADD", KEYS[3], "MAXLEN", "~", ARGV[3], "*",
+            "event", events[new] or "frame-status",
+            "data", cjson.encode({frameId = ARGV[i], status = new})
+        )
+    end
+end
+redis.call("HSET", KEYS[1], "updatedAt", ARGV[2])
+redis.call("EXPIRE", KEYS[1], ARGV[1])
+redis.call("EXPIRE", KEYS[2], ARGV[1])
+redis.call("EXPIRE", KEYS[3], ARGV[1])
+return 1
+"""
+
+_record_statuses_script = None
+
+_COUNTER_FIELDS = ("totalFrames", "completedFrames", "failedFrames")
+_STATUS_COUNTERS = {"completed": "completedFrames", "done": "completedFrames", "failed": "failedFrames"}
+
+# Events after which a batch's event stream ends
+TERMINAL_EVENTS = ("batch-completed", "batch-failed")
+
+
+def is_enabled() -> bool:
+    return settings.PROGRESS_STORE_ENABLED
+
+
+def _progress_key(batch_id: str) -> str:
+    return f"eval:{batch_id}:progress"
+
+
+def _frames_key(batch_id: str) -> str:
+    return f"eval:{batch_id}:frames"
+
+
+def _events_key(batch_id: str) -> str:
+    return f"eval:{batch_id}:events"
+
+
+def _add_event(pipe, batch_id: str, event: str, data: Dict):
+    pipe.xadd(
+        _events_key(batch_id),
+        {"event": event, "data": json.dumps(data)},
+        maxlen=settings.PROGRESS_EVENTS_MAXLEN,
+        approximate=True,
+    )
+    pipe.expire(_events_key(batch_id), settings.PROGRESS_STORE_TTL)
+
+
+def start_run(batch_id: str, eval_req_id: str, frame_list: List[Dict]):
+    """
+    Replace the stored progress of a batch with a fresh run
+
+    Args:
+        batch_id: Batch ID
+        eval_req_id: evaluationRequest ID
+        frame_list: [{"frameId", "status", ...}] as written to Firestore
+    """
+    if not is_enabled():
+        return
+
+    counts = {"completedFrames": 0, "failedFrames": 0}
+    frames = {}
+    for item in frame_list:
+        status = item.get("status", "pending")
+        frames[item["frameId"]] = status
+        if status in _STATUS_COUNTERS:
+            counts[_STATUS_COUNTERS[status]] += 1
+
+    try:
+        pipe = get_redis().pipeline(transaction=True)
+        pipe.delete(_progress_key(batch_id), _frames_key(batch_id))
+        pipe.hset(_progress_key(batch_id), mapping={
+            "evaluationRequestId": eval_req_id,
+            "status": "processing",
+            "batchStatus": "processing",
+            "totalFrames": len(frame_list),
+            **counts,
+            "updatedAt": datetime.utcnow().isoformat() + "Z",
+        })
+        if frames:
+            pipe.hset(_frames_key(batch_id), mapping=frames)
+        pipe.expire(_progress_key(batch_id), settings.PROGRESS_STORE_TTL)
+        pipe.expire(_frames_key(batch_id), settings.PROGRESS_STORE_TTL)
+        _add_event(pipe, batch_id, "run-started", {
+            "evaluationRequestId": eval_req_id,
+            "totalFrames": len(frame_list),
+            **counts,
+        })
+        pipe.execute()
+    except Exception as e:
+        print(f"Warning: Failed to store progress for batch {batch_id} in Redis: {e}")
+
+
+def record_frame_statuses(batch_id: str, frame_statuses: Dict[str, str]):
+    """
+    Apply {frame_id: status}, adjust the counters and emit frame events
+    (no-op if the run is not stored)
+    """
+    global _record_statuses_script
+
+    if not is_enabled() or not frame_statuses:
+        return
+
+    args = [settings.PROGRESS_STORE_TTL, datetime.utcnow().isoformat() + "Z", settings.PROGRESS_EVENTS_MAXLEN]
+    for frame_id, status in frame_statuses.items():
+        args.extend([frame_id, status])
+
+    try:
+        client = get_redis()
+        if _record_statuses_script is None:
+            _record_statuses_script = client.register_script(_RECORD_STATUSES_LUA)
+        # Current process's client: the script may have been registered before a fork
+        _record_statuses_script(
+            keys=[_progress_key(batch_id), _frames_key(batch_id), _events_key(batch_id)], args=args,
+            client=client
+        )
+    except Exception as e:
+        print(f"Warning: Failed to record frame progress for batch {batch_id} in Redis: {e}")
+
+
+def set_status(batch_id: str, status: Optional[str] = None, batch_status: Optional[str] = None):
+    """
+    Update the evaluation and/or batch status of a stored run (no-op if not
+    stored); a final evaluation status also emits batch-completed / batch-failed
+    """
+    if not is_enabled():
+        return
+
+    fields = {"updatedAt": datetime.utcnow().isoformat() + "Z"}
+    if status:
+        fields["status"] = status
+    if batch_status:
+        fields["batchStatus"] = batch_status
+
+    try:
+        client = get_redis()
+        if not client.exists(_progress_key(batch_id)):
+            return
+        client.hset(_progress_key(batch_id), mapping=fields)
+
+        if status in ("completed", "failed"):
+            counts = dict(zip(_COUNTER_FIELDS, client.hmget(_progress_key(batch_id), *_COUNTER_FIELDS)))
+            pipe = client.pipeline(transaction=True)
+            _add_event(pipe, batch_id, f"batch-{status}", {
+                "status": status,
+                **{field: int(value or 0) for field, value in counts.items()},
+            })
+            pipe.execute()
+    except Exception as e:
+        print(f"Warning: Failed to store status for batch {batch_id} in Redis: {e}")
+
+
+def clear(batch_id: str):
+    """
+    Drop the stored run (readers go to Firestore until the next start_run);
+    the event stream is kept so connected clients can still resume
+    """
+    if not is_enabled():
+        return
+    try:
+        get_redis().delete(_progress_key(batch_id), _frames_key(batch_id))
+    except Exception as e:
+        print(f"Warning: Failed to clear progress for batch {batch_id} in Redis: {e}")
+
+
+def get_progress(batch_id: str) -> Optional[Dict]:
+    """
+    Returns:
+        {"evaluationRequestId", "status", "batchStatus", "totalFrames",
+         "completedFrames", "failedFrames", "updatedAt"}, or None if the run
+        is not in Redis (or Redis is unavailable)
+    """
+    if not is_enabled():
+        return None
+
+    try:
+        data = get_redis().hgetall(_progress_key(batch_id))
+    except Exception as e:
+        print(f"Warning: Failed to read progress for batch {batch_id} from Redis: {e}")
+        return None
+
+    if not data or "totalFrames" not in data:
+        return None
+
+    for field in _COUNTER_FIELDS:
+        data[field] = int(data.get(field, 0))
+    return data
+
+
+def get_last_event_id(batch_id: str) -> Optional[str]:
+    """
+    ID of the newest event of a batch ("0-0" if there is none yet), to
+    follow the stream from a known point with iter_events
+
+    Returns:
+        Stream ID, or None if Redis is unavailable
+    """
+    if not is_enabled():
+        return None
+
+    try:
+        latest = get_redis().xrevrange(_events_key(batch_id), count=1)
+    except Exception as e:
+        print(f"Warning: Failed to read events for batch {batch_id} from Redis: {e}")
+        return None
+    return latest[0][0] if latest else "0-0"
+
+
+async def iter_events(
+    batch_id: str,
+    last_event_id: Optional[str] = None,
+    block_ms: int = 15000
+) -> AsyncIterator[Optional[Tuple[str, str, Dict]]]:
+    """
+    Follow a batch's event stream (XREAD BLOCK on an asyncio client)
+
+    Args:
+        batch_id: Batch ID
+        last_event_id: Resume after this stream ID (SSE Last-Event-ID);
+            None = only events from now on
+        block_ms: Max wait per XREAD
+
+    Yields:
+        (event_id, event, data), or None after block_ms without events
+        (lets the caller send a keep-alive and notice disconnects)
+    """
+    client = get_async_redis()
+    key = _events_key(batch_id)
+    try:
+        if not last_event_id:
+            latest = await client.xrevrange(key, count=1)
+            last_event_id = latest[0][0] if latest else "0-0"
+
+        while True:
+            response = await client.xread({key: last_event_id}, count=100, block=block_ms)
+            if not response:
+                yield None
+                continue
+            for _, entries in response:
+                for event_id, fields in entries:
+                    last_event_id = event_id
+                    yield event_id, fields.get("event", "message"), json.loads(fields.get("data") or "{}")
+    finally:
+        await client.aclose()
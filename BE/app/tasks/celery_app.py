@@ -1,6 +1,8 @@
 # app/tasks/celery_app.py
 
 from celery import Celery
+from kombu import Queue
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown
 from app.config import settings
 
 celery_app = Celery(
@@ -20,7 +22,84 @@ celery_app.conf.update(
     task_soft_time_limit=240,  # 4 minutes soft limit
     worker_prefetch_multiplier=1,  # Process one task at a time per worker
     worker_max_tasks_per_child=50,  # Restart worker after 50 tasks to prevent memory leaks
+    # worker_process_init runs the model warm-up (weights load on ONNX, one
+    # forward pass), far longer than the 4 s default the pool waits for a child
+    worker_proc_alive_timeout=settings.INFERENCE_WARMUP_TIMEOUT,
     include=['app.tasks.inference_tasks'],  # Import tasks when worker starts
+    # Two lanes so a single frame never waits behind a full re-evaluation.
+    # A worker started without -Q consumes both; run a dedicated
+    # `-Q interactive` worker to keep the interactive lane free.
+    task_queues=(
+        Queue(settings.CELERY_INTERACTIVE_QUEUE),
+        Queue(settings.CELERY_BULK_QUEUE),
+    ),
+    task_default_queue=settings.CELERY_BULK_QUEUE,
+    task_routes={
+        "process_single_frame": {"queue": settings.CELERY_INTERACTIVE_QUEUE},
+        "inference_model_status": {"queue": settings.CELERY_INTERACTIVE_QUEUE},
+        # Orchestrators only scan Firestore; they pick the lane of the frames they dispatch
+        "evaluate_batch": {"queue": settings.CELERY_INTERACTIVE_QUEUE},
+        "re_evaluate_batch": {"queue": settings.CELERY_INTERACTIVE_QUEUE},
+        "process_batch_frames": {"queue": settings.CELERY_BULK_QUEUE},
+        "finalize_batch_evaluation": {"queue": settings.CELERY_BULK_QUEUE},
+        "fail_batch_evaluation": {"queue": settings.CELERY_INTERACTIVE_QUEUE},
+        "rethreshold_batch": {"queue": settings.CELERY_BULK_QUEUE},
+    },
 )
 
+
+# --------------------------------------------------
+# Model preloading / warm-up (worker processes only)
+# --------------------------------------------------
+@worker_init.connect
+def preload_inference_model(**kwargs):
+    """Parent process, before the pool forks: load weights once (shared copy-on-write)"""
+    # With an inference server the model lives there, not in the workers
+    if not settings.INFERENCE_PRELOAD_MODEL or settings.INFERENCE_SERVER_URL:
+        return
+    try:
+        from app.services.model_service import preload_model
+        preload_model(settings.INFERENCE_RETURN_MASKS)
+    except Exception as e:
+        # Children will still load lazily on first task
+        print(f"Warning: Failed to preload model in worker parent: {e}")
+
+
+@worker_process_init.connect
+def warm_up_inference_model(**kwargs):
+    """Each child (including recycled ones): warm-up inference, then mark ready"""
+    if not settings.INFERENCE_PRELOAD_MODEL or settings.INFERENCE_SERVER_URL:
+        return
+    try:
+        from app.services.model_service import warm_up_model
+        warm_up_model(settings.INFERENCE_RETURN_MASKS)
+    except Exception as e:
+        print(f"Warning: Model warm-up failed in worker child: {e}")
+
+
+# --------------------------------------------------
+# Stage metrics (METRICS_PORT set)
+# --------------------------------------------------
+@worker_init.connect
+def start_worker_metrics(**kwargs):
+    """Parent process, before the pool forks: serve /metrics for all children"""
+    if not settings.METRICS_PORT:
+        return
+    try:
+        from app.core.metrics import start_metrics_server
+        start_metrics_server()
+    except Exception as e:
+        print(f"Warning: Failed to start metrics server: {e}")
+
+
+@worker_process_shutdown.connect
+def release_worker_metrics(pid=None, **kwargs):
+    if not settings.METRICS_PORT:
+        return
+    try:
+        from app.core.metrics import mark_process_dead
+        mark_process_dead(pid)
+    except Exception as e:
+        print(f"Warning: Failed to release metrics of worker child {pid}: {e}")
+
 # Tasks will be imported when Celery worker starts
\ No newline at end of file
@@ -1,16 +1,28 @@
 # app/tasks/inference_tasks.py
 
 import os
-from typing import Dict, List
+import time
+from typing import Dict, List, Tuple
 from datetime import datetime
-from celery import Task
+from celery import Task, chord, group
+from celery.exceptions import SoftTimeLimitExceeded
+from firebase_admin import firestore
 from app.tasks.celery_app import celery_app
 from app.core.firebase import db
+from app.core.firestore_batch import BufferedWriter
+from app.core import metrics
 from app.config import settings
 
 # Import services (model_service will lazy import detectron2)
-from app.services.model_service import run_inference
+from app.services.model_service import run_inference, iter_inference_batch, get_model_status
 from app.services.evaluation_service import create_evaluation_result
+from app.services.evaluation_progress import (
+    ProgressWriter,
+    get_evaluation_request_id,
+    merge_frame_statuses,
+    reset_frame_statuses,
+)
+from app.services import batch_lock, inference_cache, progress_store
 
 
 class InferenceTask(Task):
@@ -28,30 +40,66 @@ class InferenceTask(Task):
                 pass
 
 
-@celery_app.task(base=InferenceTask, name="process_single_frame")
-def process_single_frame(frame_id: str, frame_path: str, force: bool = False):
+@celery_app.task(bind=True, base=InferenceTask, name="process_single_frame")
+def process_single_frame(
+    self,
+    frame_id: str,
+    frame_path: str = None,
+    force: bool = False,
+    model_version: str = None
+):
     """
     Process a single frame: inference + evaluation
     
+    Routed to the interactive queue. The frame's batch threshold is applied,
+    and the batch's evaluation progress, eggRecord and eligibility are
+    refreshed afterwards. The task holds the batch lock (job id = this
+    task's id) while it runs, and does nothing while another job holds it.
+    
     Args:
         frame_id: Firestore frame document ID
-        frame_path: Local path to frame image
+        frame_path: Local path to frame image (default: from the frame's frameURL)
         force: If True, overwrite existing results
+        model_version: Registered model version (default: settings.MODEL_VERSION)
         
     Returns:
         {
             "frame_id": str,
-            "status": "completed",
-            "maturity": "MII" | "MI"
+            "status": "completed" | "skipped",
+            "maturity": "MII" | "MI",
+            "running_job": str  # only when skipped: job holding the batch
         }
     """
+    frame_doc = db.collection("frames").document(frame_id).get()
+    if not frame_doc.exists:
+        raise ValueError(f"Frame {frame_id} not found")
+    frame_data = frame_doc.to_dict() or {}
+    batch_id = frame_data.get("batchId")
+    previous_maturity = (frame_data.get("evaluationResult") or {}).get("maturity")
+    
+    # Job id = this task's id (the route took the batch lock with it; taken here otherwise)
+    job_id = self.request.id
+    if batch_id and not batch_lock.refresh(batch_id, job_id):
+        return {
+            "frame_id": frame_id,
+            "status": "skipped",
+            "running_job": batch_lock.get_holder(batch_id)
+        }
+    
     try:
+        if frame_path is None:
+            frame_path = _frame_url_to_path(frame_data.get("frameURL", ""))
+        threshold = _get_batch_threshold(batch_id) if batch_id else None
+        
         # Run inference (detectron2 will be imported here)
-        detection_results = run_inference(frame_path)
-        detection_results["modelVersion"] = settings.MODEL_VERSION
+        # modelVersion is set by model_service from the model actually used
+        detection_results = run_inference(
+            frame_path, with_masks=settings.INFERENCE_RETURN_MASKS, model_version=model_version,
+            threshold=threshold
+        )
         
         # Create evaluation result
-        evaluation_result = create_evaluation_result(detection_results)
+        evaluation_result = _evaluate_frame(detection_results, threshold)
         
         # Determine maturity status
         maturity = evaluation_result["maturity"]
@@ -66,6 +114,9 @@ def process_single_frame(frame_id: str, frame_path: str, force: bool = False):
         
         db.collection("frames").document(frame_id).update(update_data)
         
+        if batch_id:
+            _refresh_batch_after_frame(batch_id, frame_id, "completed", previous_maturity, maturity)
+        
         return {
             "frame_id": frame_id,
             "status": "completed",
@@ -78,122 +129,595 @@ def process_single_frame(frame_id: str, frame_path: str, force: bool = False):
             "error": str(e),
             "updatedAt": datetime.utcnow()
         })
+        if batch_id:
+            _refresh_batch_after_frame(batch_id, frame_id, "failed")
         raise
+    finally:
+        if batch_id:
+            batch_lock.release(batch_id, job_id)
+
+
+@celery_app.task(name="inference_model_status")
+def inference_model_status():
+    """
+    Readiness of the model in the worker process that runs this task
+    
+    Returns:
+        {"ready": bool, "backend": str, "modelVersion": str, "loaded": [...], "pid": int}
+    """
+    return get_model_status()
 
 
-@celery_app.task(name="process_batch_frames")
-def process_batch_frames(batch_id: str, frame_ids: List[str], force: bool = False):
+@celery_app.task(bind=True, name="process_batch_frames")
+def process_batch_frames(
+    self,
+    batch_id: str,
+    frame_ids: List[str],
+    force: bool = False,
+    finalize: bool = True,
+    model_version: str = None,
+    frame_paths: Dict[str, str] = None,
+    prior_counts: Dict[str, int] = None,
+    carry: Dict = None,
+    job_id: str = None
+):
     """
     Process all frames in a batch at once (faster than processing one by one)
-    Model is loaded once and reused for all frames
+    Model is loaded once and reused for all frames; frames are fed to the
+    model INFERENCE_BATCH_SIZE at a time (one forward pass per group)
+    
+    Runs for at most INFERENCE_TASK_TIME_BUDGET seconds (or until the soft
+    time limit): finished frames are committed, then the task replaces
+    itself with a continuation for the remaining frames, carrying counts and
+    statuses along. Replacement keeps the same place in a chord, so the
+    chord callback still runs once after every chunk is done.
     
     Args:
         batch_id: Batch ID
         frame_ids: List of frame IDs to process
         force: If True, overwrite existing results
+        finalize: If True, update frame statuses/eggRecord/eligibility/status when done.
+            Chunks dispatched as a chord leave this to finalize_batch_evaluation.
+        model_version: Registered model version (default: settings.MODEL_VERSION)
+        frame_paths: {frame_id: local path} already known by the caller; these
+            frames are processed without reading their documents again
+        prior_counts: Maturity counts of batch frames not passed in frame_ids
+            (already processed, counted by the caller); added to this task's counts
+        carry: Counters and frame_statuses of previous runs (set on continuations)
+        job_id: Task id of the job holding the batch lock (refreshed here,
+            released when the batch is finalized); if another job holds the
+            batch, nothing is processed
         
     Returns:
         {
             "batch_id": str,
             "processed_count": int,
             "success_count": int,
-            "failed_count": int
+            "failed_count": int,
+            "frame_statuses": {frame_id: "completed" | "failed"},
+            "maturity_counts": {"MII": int, "MI": int, "total": int},
+            "running_job": str  # only when another job holds the batch
         }
     """
+    deadline = time.monotonic() + settings.INFERENCE_TASK_TIME_BUDGET
+    if not batch_lock.refresh(batch_id, job_id):
+        # Another job took the batch over: leave its frames and status alone
+        return {
+            "batch_id": batch_id,
+            "processed_count": 0,
+            "success_count": 0,
+            "failed_count": 0,
+            "frame_statuses": {},
+            "maturity_counts": _count_maturities([]),
+            "running_job": batch_lock.get_holder(batch_id)
+        }
+    carry = carry or {}
+    processed_count = carry.get("processed_count", 0)
+    success_count = carry.get("success_count", 0)
+    failed_count = carry.get("failed_count", 0)
+    frame_statuses: Dict[str, str] = dict(carry.get("frame_statuses") or {})
+    # Maturity per batch frame handled here (None = failed / not evaluated)
+    frame_maturities: Dict[str, str] = {}
+    threshold = _get_batch_threshold(batch_id)
+    
+    # Resolve frame paths and check which frames need processing:
+    # paths passed by the caller are used as-is, the rest are read in bulk
+    frame_paths = dict(frame_paths or {})
+    frames_to_process = []
+    
+    unknown_ids = [frame_id for frame_id in frame_ids if frame_id not in frame_paths]
+    frame_info = _prefetch_frame_docs(unknown_ids) if unknown_ids else {}
+    
+    for frame_id in frame_ids:
+        if frame_id not in frame_paths:
+            if frame_id not in frame_info:
+                # Missing frame doc: count as failed instead of aborting the whole chunk
+                print(f"Warning: Failed to resolve frame {frame_id}: Frame {frame_id} not found")
+                failed_count += 1
+                frame_statuses[frame_id] = "failed"
+                continue
+            path, needs_processing, maturity = frame_info[frame_id]
+            if not force and not needs_processing:
+                processed_count += 1
+                frame_maturities[frame_id] = maturity
+                continue
+            frame_paths[frame_id] = path
+        frames_to_process.append(frame_id)
+    
+    # Process frames in batched forward passes (model will be loaded once via singleton)
+    # Frame writes are buffered and committed as WriteBatches (see BufferedWriter)
+    batch_paths = [frame_paths[frame_id] for frame_id in frames_to_process]
+    # Only frame result writes feed the per-frame "persist" stage metric
+    writer = BufferedWriter(metric_stage="persist")
+    
+    def commit_frames():
+        writer.flush()
+        return writer.failed_ids
+    
+    # Frame statuses reach the evaluationRequest every few frames/seconds,
+    # each time right after the frame documents they refer to are committed
+    progress = ProgressWriter(batch_id, before_flush=commit_frames)
+    handled = set()
+    results = iter_inference_batch(
+        batch_paths,
+        settings.INFERENCE_BATCH_SIZE,
+        with_masks=settings.INFERENCE_RETURN_MASKS,
+        model_version=model_version,
+        threshold=threshold
+    )
+    try:
+        for index, detection_results in results:
+            frame_id = frames_to_process[index]
+            frame_ref = db.collection("frames").document(frame_id)
+            try:
+                # Inference failures (e.g. unreadable image) come back as exceptions
+                if isinstance(detection_results, Exception):
+                    raise detection_results
+                
+                # Create evaluation result (threshold applied here, not in the model)
+                evaluation_result = _evaluate_frame(detection_results, threshold)
+                
+                # Update frame in Firestore
+                update_data = {
+                    "detectionResults": detection_results,
+                    "evaluationResult": evaluation_result,
+                    "updatedAt": datetime.utcnow()
+                }
+                
+                writer.update(frame_ref, update_data)
+                success_count += 1
+                frame_statuses[frame_id] = "completed"
+                frame_maturities[frame_id] = evaluation_result["maturity"]
+                progress.record(frame_id, "completed")
+            
+            except SoftTimeLimitExceeded:
+                raise
+            except Exception as e:
+                # Update frame with error
+                writer.update(frame_ref, {
+                    "error": str(e),
+                    "updatedAt": datetime.utcnow()
+                })
+                failed_count += 1
+                frame_statuses[frame_id] = "failed"
+                frame_maturities[frame_id] = None
+                progress.record(frame_id, "failed")
+            
+            handled.add(index)
+            if time.monotonic() >= deadline:
+                break
+    except SoftTimeLimitExceeded:
+        print(f"Warning: Soft time limit reached in batch {batch_id}, checkpointing")
+    except Exception as e:
+        # The inference iterator itself failed (model could not be loaded,
+        # unknown version, ...): every frame not yielded yet fails, and the
+        # batch is still finalized below
+        print(f"Error: Batch inference failed for batch {batch_id}: {e}")
+        for index, frame_id in enumerate(frames_to_process):
+            if index in handled:
+                continue
+            writer.update(db.collection("frames").document(frame_id), {
+                "error": str(e),
+                "updatedAt": datetime.utcnow()
+            })
+            failed_count += 1
+            frame_statuses[frame_id] = "failed"
+            frame_maturities[frame_id] = None
+            progress.record(frame_id, "failed")
+            handled.add(index)
+    finally:
+        results.close()
+    
+    progress.flush()
+    success_count, failed_count = _apply_write_failures(
+        writer.failed_ids, frame_statuses, success_count, failed_count
+    )
+    for frame_id in writer.failed_ids:
+        frame_maturities[frame_id] = None
+    
+    maturity_counts = _merge_counts(_count_maturities(frame_maturities.values()), prior_counts)
+    
+    # Out of time: everything handled so far is committed, continue with the rest
+    remaining_ids = [frame_id for index, frame_id in enumerate(frames_to_process) if index not in handled]
+    if remaining_ids:
+        print(f"Batch {batch_id}: time budget used, continuing {len(remaining_ids)} frames in a new task")
+        continuation = process_batch_frames.s(
+            batch_id,
+            remaining_ids,
+            force=force,
+            finalize=finalize,
+            model_version=model_version,
+            frame_paths={frame_id: frame_paths[frame_id] for frame_id in remaining_ids},
+            prior_counts=maturity_counts,
+            carry={
+                "processed_count": processed_count,
+                "success_count": success_count,
+                "failed_count": failed_count,
+                "frame_statuses": frame_statuses,
+            },
+            job_id=job_id
+        )
+        # Stay in the lane this batch was dispatched to
+        queue = (self.request.delivery_info or {}).get("routing_key")
+        if queue:
+            continuation = continuation.set(queue=queue)
+        raise self.replace(continuation)
+    
+    if inference_cache.is_enabled():
+        try:
+            print(f"Inference cache stats after batch {batch_id}: {inference_cache.get_stats()}")
+        except Exception as e:
+            print(f"Warning: Failed to read inference cache stats: {e}")
+    
+    if finalize:
+        _finalize_batch(batch_id, success_count, failed_count, frame_statuses, maturity_counts, job_id=job_id)
+    
+    return {
+        "batch_id": batch_id,
+        "processed_count": processed_count,
+        "success_count": success_count,
+        "failed_count": failed_count,
+        "frame_statuses": frame_statuses,
+        "maturity_counts": maturity_counts
+    }
+
+
+@celery_app.task(name="finalize_batch_evaluation")
+def finalize_batch_evaluation(
+    chunk_results: List[Dict],
+    batch_id: str,
+    prior_counts: Dict[str, int] = None,
+    job_id: str = None
+):
+    """
+    Chord callback: merge the results of all process_batch_frames chunks
+    and finalize the batch once
+    
+    Args:
+        chunk_results: Return values of the process_batch_frames chunks
+        batch_id: Batch ID
+        prior_counts: Maturity counts of batch frames that were not dispatched
+        job_id: Task id of the job holding the batch lock (released here;
+            the batch is not finalized if another job holds it)
+        
+    Returns:
+        Same shape as process_batch_frames (summed over chunks)
+    """
+    if not batch_lock.refresh(batch_id, job_id):
+        return {
+            "batch_id": batch_id,
+            "processed_count": 0,
+            "success_count": 0,
+            "failed_count": 0,
+            "frame_statuses": {},
+            "maturity_counts": _count_maturities([]),
+            "running_job": batch_lock.get_holder(batch_id)
+        }
+    
     processed_count = 0
     success_count = 0
     failed_count = 0
+    frame_statuses: Dict[str, str] = {}
+    maturity_counts = _merge_counts(_count_maturities([]), prior_counts)
+    
+    for result in chunk_results:
+        if not result:
+            continue
+        processed_count += result.get("processed_count", 0)
+        success_count += result.get("success_count", 0)
+        failed_count += result.get("failed_count", 0)
+        frame_statuses.update(result.get("frame_statuses") or {})
+        maturity_counts = _merge_counts(maturity_counts, result.get("maturity_counts"))
+    
+    _finalize_batch(batch_id, success_count, failed_count, frame_statuses, maturity_counts, job_id=job_id)
+    
+    return {
+        "batch_id": batch_id,
+        "processed_count": processed_count,
+        "success_count": success_count,
+        "failed_count": failed_count,
+        "frame_statuses": frame_statuses,
+        "maturity_counts": maturity_counts
+    }
 
-    # Try to load evaluation request once so we can update per-frame status for progress
-    eval_req_id = None
-    eval_frame_list: List[Dict] = []
+
+@celery_app.task(name="fail_batch_evaluation")
+def fail_batch_evaluation(request, exc, traceback, batch_id: str, job_id: str = None):
+    """
+    Errback of the dispatched frame tasks: a chunk (or the single task)
+    raised, so the batch will not be finalized normally
+    
+    Marks the evaluationRequest and the batch failed and releases the batch
+    lock, unless another job holds the batch by now. Frames committed
+    before the failure keep their results.
+    
+    Args:
+        request, exc, traceback: Failed task's request and error (passed by Celery)
+        batch_id: Batch ID
+        job_id: Task id of the job holding the batch lock
+    """
+    print(f"Error: Evaluation of batch {batch_id} failed in task {getattr(request, 'id', None)}: {exc}")
+    if not batch_lock.refresh(batch_id, job_id):
+        return
+    
     try:
-        eval_req_stream = db.collection("evaluationRequests").where(
-            "batchId", "==", batch_id
-        ).limit(1).stream()
-        for req in eval_req_stream:
-            eval_req_id = req.id
-            data = req.to_dict() or {}
-            eval_frame_list = data.get("frameList", []) or []
-            break
+        eval_req_id = get_evaluation_request_id(batch_id)
+        if eval_req_id:
+            db.collection("evaluationRequests").document(eval_req_id).update({
+                "status": "failed",
+                "errorLog": str(exc),
+                "updatedAt": datetime.utcnow()
+            })
+        db.collection("retrievalBatches").document(batch_id).update({
+            "status": "failed",
+            "updatedAt": datetime.utcnow()
+        })
     except Exception as e:
-        print(f"Warning: Failed to load evaluationRequest for batch {batch_id}: {e}")
+        print(f"Warning: Failed to mark batch {batch_id} as failed: {e}")
+    progress_store.set_status(batch_id, status="failed", batch_status="failed")
+    batch_lock.release(batch_id, job_id)
+
+
+@celery_app.task(bind=True, name="rethreshold_batch")
+def rethreshold_batch(self, batch_id: str, threshold: float = None):
+    """
+    Re-apply a confidence threshold to a batch without running the model
     
-    # Pre-load frame paths and check which frames need processing
-    frame_paths = {}
-    frames_to_process = []
+    Workers store every detection down to MODEL_SCORE_FLOOR, so maturity can
+    be recomputed from the stored detectionResults alone. The threshold is
+    saved on the batch (confidenceThreshold) and used by later evaluations.
+    Frames stored before the score floor existed only have detections above
+    the threshold that was active at the time.
     
-    if not force:
-        for frame_id in frame_ids:
-            frame_doc = db.collection("frames").document(frame_id).get()
-            if frame_doc.exists:
-                frame_data = frame_doc.to_dict()
-                if "detectionResults" in frame_data:
-                    processed_count += 1
-                    continue
-            frames_to_process.append(frame_id)
-            frame_paths[frame_id] = get_frame_path(frame_id)
-    else:
-        frames_to_process = frame_ids
-        for frame_id in frame_ids:
-            frame_paths[frame_id] = get_frame_path(frame_id)
+    Args:
+        batch_id: Batch ID
+        threshold: New operating threshold. None removes the batch's
+            confidenceThreshold (back to settings.MODEL_CONFIDENCE_THRESHOLD,
+            including later changes of it) and re-scores at the global value.
+        
+    Returns:
+        {
+            "batch_id": str,
+            "threshold": float,
+            "success_count": int,
+            "failed_count": int,
+            "skipped_count": int  # frames without detectionResults
+        }
+    """
+    # No threshold: drop the batch's own value, so it follows the global one again
+    stored_threshold = threshold if threshold is not None else firestore.DELETE_FIELD
+    if threshold is None:
+        threshold = settings.MODEL_CONFIDENCE_THRESHOLD
     
-    # Process all frames in batch (model will be loaded once via singleton)
-    for frame_id in frames_to_process:
-        try:
-            frame_path = frame_paths[frame_id]
-            
-            # Run inference (reuses loaded model)
-            detection_results = run_inference(frame_path)
-            detection_results["modelVersion"] = settings.MODEL_VERSION
-            
-            # Create evaluation result
-            evaluation_result = create_evaluation_result(detection_results)
-            
-            # Update frame in Firestore
-            update_data = {
-                "detectionResults": detection_results,
-                "evaluationResult": evaluation_result,
-                "updatedAt": datetime.utcnow()
-            }
+    # Job id = this task's id (the route took the batch lock with it)
+    job_id = self.request.id
+    if not batch_lock.refresh(batch_id, job_id):
+        return {
+            "batch_id": batch_id,
+            "threshold": threshold,
+            "success_count": 0,
+            "failed_count": 0,
+            "skipped_count": 0,
+            "running_job": batch_lock.get_holder(batch_id)
+        }
+    
+    db.collection("retrievalBatches").document(batch_id).update({
+        "confidenceThreshold": stored_threshold,
+        "updatedAt": datetime.utcnow()
+    })
+    
+    success_count = 0
+    failed_count = 0
+    skipped_count = 0
+    frame_statuses: Dict[str, str] = {}
+    frame_maturities: Dict[str, str] = {}
+    
+    with BufferedWriter() as writer:
+        for frame in db.collection("frames").where("batchId", "==", batch_id).stream():
+            frame_data = frame.to_dict() or {}
+            detection_results = frame_data.get("detectionResults")
+            frame_maturities[frame.id] = None
+            if not detection_results:
+                skipped_count += 1
+                continue
             
-            db.collection("frames").document(frame_id).update(update_data)
-            success_count += 1
-
-            # Update in-memory frameList (don't write to DB yet - optimize: write once at the end)
-            if eval_req_id and eval_frame_list:
-                for item in eval_frame_list:
-                    if item.get("frameId") == frame_id:
-                        item["status"] = "completed"
-                        break
-                        
-        except Exception as e:
-            # Update frame with error
             try:
-                db.collection("frames").document(frame_id).update({
-                    "error": str(e),
+                evaluation_result = create_evaluation_result(detection_results, threshold)
+                writer.update(frame.reference, {
+                    "evaluationResult": evaluation_result,
                     "updatedAt": datetime.utcnow()
                 })
-            except Exception:
-                pass
+                success_count += 1
+                frame_statuses[frame.id] = "completed"
+                frame_maturities[frame.id] = evaluation_result["maturity"]
+            except Exception as e:
+                print(f"Warning: Failed to re-threshold frame {frame.id}: {e}")
+                failed_count += 1
+                frame_statuses[frame.id] = "failed"
+    
+    success_count, failed_count = _apply_write_failures(
+        writer.failed_ids, frame_statuses, success_count, failed_count
+    )
+    for frame_id in writer.failed_ids:
+        frame_maturities[frame_id] = None
+    
+    _finalize_batch(
+        batch_id, success_count, failed_count, frame_statuses,
+        _count_maturities(frame_maturities.values()),
+        job_id=job_id
+    )
+    
+    return {
+        "batch_id": batch_id,
+        "threshold": threshold,
+        "success_count": success_count,
+        "failed_count": failed_count,
+        "skipped_count": skipped_count
+    }
+
+
+def _evaluate_frame(detection_results: Dict, threshold: float = None) -> Dict:
+    """
+    create_evaluation_result, timed: adds "evaluate" to detectionResults.timings
+    and records the frame's stage timings in the stage metrics
+    (persist is recorded by BufferedWriter when the frame is committed)
+    """
+    start = time.perf_counter()
+    evaluation_result = create_evaluation_result(detection_results, threshold)
+    timings = dict(detection_results.get("timings") or {})
+    timings["evaluate"] = round((time.perf_counter() - start) * 1000, 2)
+    detection_results["timings"] = timings
+    metrics.observe_timings(timings)
+    return evaluation_result
+
+
+def _apply_write_failures(
+    failed_ids,
+    frame_statuses: Dict[str, str],
+    success_count: int,
+    failed_count: int
+):
+    """
+    Mark frames whose buffered write never committed as failed
+    
+    Returns:
+        (success_count, failed_count) adjusted
+    """
+    for frame_id in failed_ids:
+        if frame_statuses.get(frame_id) == "completed":
+            success_count -= 1
             failed_count += 1
+        frame_statuses[frame_id] = "failed"
+    return success_count, failed_count
 
-            # Update in-memory frameList (don't write to DB yet)
-            if eval_req_id and eval_frame_list:
-                for item in eval_frame_list:
-                    if item.get("frameId") == frame_id:
-                        item["status"] = "failed"
-                        break
+
+def _count_maturities(maturities) -> Dict[str, int]:
+    """{"MII", "MI", "total"} over an iterable of per-frame maturities (None = not evaluated)"""
+    counts = {"MII": 0, "MI": 0, "total": 0}
+    for maturity in maturities:
+        counts["total"] += 1
+        if maturity in ("MII", "MI"):
+            counts[maturity] += 1
+    return counts
+
+
+def _merge_counts(counts: Dict[str, int], other: Dict[str, int] = None) -> Dict[str, int]:
+    if not other:
+        return counts
+    return {key: counts.get(key, 0) + other.get(key, 0) for key in ("MII", "MI", "total")}
+
+
+def _get_batch_threshold(batch_id: str) -> float:
+    """Operating threshold for a batch: its confidenceThreshold if re-thresholded, else the global one"""
+    try:
+        batch_doc = db.collection("retrievalBatches").document(batch_id).get()
+        if batch_doc.exists:
+            threshold = (batch_doc.to_dict() or {}).get("confidenceThreshold")
+            if threshold is not None:
+                return threshold
+    except Exception as e:
+        print(f"Warning: Failed to load threshold for batch {batch_id}: {e}")
+    return settings.MODEL_CONFIDENCE_THRESHOLD
+
+
+def _refresh_batch_after_frame(
+    batch_id: str,
+    frame_id: str,
+    status: str,
+    previous_maturity: str = None,
+    maturity: str = None
+):
+    """
+    Bring the batch aggregates up to date after one frame was (re-)evaluated
+    
+    The frame's status goes to the evaluationRequest and the progress store.
+    On success the eggRecord counts are moved from previous_maturity to
+    maturity (the frame was already counted in total), so the batch is not
+    re-scanned; without an existing eggRecord the frames are counted once.
+    The counts are read and written in one transaction (concurrent frames
+    of the same batch don't overwrite each other's change), and eligibility
+    is recomputed from the new counts.
+    """
+    try:
+        eval_req_id = get_evaluation_request_id(batch_id)
+        if eval_req_id:
+            merge_frame_statuses(eval_req_id, {frame_id: status})
+    except Exception as e:
+        print(f"Warning: Failed to update evaluationRequest frame status: {e}")
+    progress_store.record_frame_statuses(batch_id, {frame_id: status})
+    
+    if status != "completed":
+        return
+    
+    maturity_delta = {"MII": 0, "MI": 0}
+    if previous_maturity in maturity_delta:
+        maturity_delta[previous_maturity] -= 1
+    if maturity in maturity_delta:
+        maturity_delta[maturity] += 1
     
-    # OPTIMIZATION: Update evaluationRequest only ONCE after all frames processed
-    if eval_req_id and eval_frame_list:
+    try:
+        _write_batch_summary(batch_id, maturity_delta=maturity_delta)
+    except Exception as e:
+        print(f"Warning: Failed to refresh batch summary for {batch_id}: {e}")
+
+
+def _finalize_batch(
+    batch_id: str,
+    success_count: int,
+    failed_count: int,
+    frame_statuses: Dict[str, str],
+    maturity_counts: Dict[str, int] = None,
+    job_id: str = None
+):
+    """
+    Write everything that depends on the whole batch being done:
+    evaluationRequest frame statuses, batch status, eggRecord and eligibility,
+    then release the batch lock
+    
+    Args:
+        batch_id: Batch ID
+        success_count: Frames inferred successfully in this job
+        failed_count: Frames that failed in this job
+        frame_statuses: {frame_id: "completed" | "failed"} for frames handled in this job
+        maturity_counts: {"MII", "MI", "total"} over ALL frames of the batch, as
+            aggregated by the job; the frames are re-scanned only if omitted
+        job_id: Task id of the job holding the batch lock
+    """
+    # Load evaluation request once (frame statuses + final status)
+    eval_req_id = None
+    try:
+        eval_req_id = get_evaluation_request_id(batch_id)
+    except Exception as e:
+        print(f"Warning: Failed to load evaluationRequest for batch {batch_id}: {e}")
+    
+    # Final merge of every frame status of the job (progress flushes may have
+    # missed some, e.g. a failed write or frames resolved before inference)
+    if eval_req_id:
         try:
-            db.collection("evaluationRequests").document(eval_req_id).update({
-                "frameList": eval_frame_list,
-                "updatedAt": datetime.utcnow(),
-            })
+            merge_frame_statuses(eval_req_id, frame_statuses)
         except Exception as e:
             print(f"Warning: Failed to update evaluationRequest frame status: {e}")
+    progress_store.record_frame_statuses(batch_id, frame_statuses)
     
     batch_status = "pending"
     if failed_count == 0 and success_count > 0:
@@ -210,106 +734,19 @@ def process_batch_frames(batch_id: str, frame_ids: List[str], force: bool = Fals
         })
     except Exception as e:
         print(f"Warning: Failed to update batch status: {e}")
+    progress_store.set_status(batch_id, batch_status=batch_status)
     
     if batch_status == "completed" and success_count > 0:
         try:
-            batch_doc = db.collection("retrievalBatches").document(batch_id).get()
-            batch_data = batch_doc.to_dict() if batch_doc.exists else {}
-            patient_id = batch_data.get("patientId")
-            
-            if not patient_id:
-                print(f"Warning: No patientId found for batch {batch_id}")
-            else:
-                patient_doc = db.collection("patients").document(patient_id).get()
-                patient_role = None
-                if patient_doc.exists:
-                    patient_role = patient_doc.to_dict().get("role")
-                
-                frames_for_count = db.collection("frames").where("batchId", "==", batch_id).stream()
-                mii_count = 0
-                mi_count = 0
-                total_frames = 0
-                for frame in frames_for_count:
-                    total_frames += 1
-                    frame_data = frame.to_dict()
-                    eval_result = frame_data.get("evaluationResult")
-                    if eval_result and isinstance(eval_result, dict):
-                        maturity = eval_result.get("maturity")
-                        if maturity == "MII":
-                            mii_count += 1
-                        elif maturity == "MI":
-                            mi_count += 1
-                
-                if total_frames > 0:
-                    eligibility_percentage = None
-                    suggested_eligibility = None
-                    
-                    if patient_role:
-                        if patient_role == "donor":
-                            eligibility_percentage = (mii_count / total_frames) * 100
-                            suggested_eligibility = "eligible" if eligibility_percentage >= 70 else "notEligible"
-                        elif patient_role == "recipient":
-                            eligibility_percentage = (mi_count / total_frames) * 100
-                            suggested_eligibility = "eligible" if eligibility_percentage >= 90 else "notEligible"
-                        
-                        if suggested_eligibility:
-                            try:
-                                db.collection("retrievalBatches").document(batch_id).update({
-                                    "suggestedEligibility": suggested_eligibility,
-                                    "eligibilityPercentage": eligibility_percentage,
-                                    "eligibilityStatus": "pending"
-                                })
-                            except Exception as e:
-                                print(f"Warning: Failed to update batch suggestedEligibility: {e}")
-                    
-                    existing_records = db.collection("eggRecords").where("batchId", "==", batch_id).stream()
-                    record_list = list(existing_records)
-                    
-                    try:
-                        if record_list:
-                            record_id = record_list[0].id
-                            update_data = {
-                                "miiEggs": mii_count,
-                                "miEggs": mi_count,
-                                "total": total_frames,
-                                "eligibilityStatus": "pending",
-                                "updatedAt": datetime.utcnow()
-                            }
-                            if suggested_eligibility:
-                                update_data["suggestedEligibility"] = suggested_eligibility
-                            db.collection("eggRecords").document(record_id).update(update_data)
-                            print(f"Updated eggRecord {record_id} for batch {batch_id}")
-                        else:
-                            from app.schemas.egg_record_schema import EggRecordCreate
-                            record_data = {
-                                "patientId": patient_id,
-                                "batchId": batch_id,
-                                "miiEggs": mii_count,
-                                "miEggs": mi_count,
-                                "total": total_frames,
-                                "eligibilityStatus": "pending"
-                            }
-                            if suggested_eligibility:
-                                record_data["suggestedEligibility"] = suggested_eligibility
-                            from app.services.egg_record_service import create_egg_record
-                            result = create_egg_record(EggRecordCreate(**record_data))
-                            print(f"Created eggRecord {result.get('id')} for batch {batch_id}")
-                    except Exception as e:
-                        print(f"Error: Failed to create/update eggRecord for batch {batch_id}: {e}")
-                        import traceback
-                        traceback.print_exc()
+            if maturity_counts is None:
+                maturity_counts = _scan_batch_maturities(batch_id)
+            _write_batch_summary(batch_id, maturity_counts)
         except Exception as e:
             print(f"Error: Failed to process batch completion for {batch_id}: {e}")
             import traceback
             traceback.print_exc()
     
     try:
-        eval_req = db.collection("evaluationRequests").where("batchId", "==", batch_id).limit(1).stream()
-        eval_req_id = None
-        for req in eval_req:
-            eval_req_id = req.id
-            break
-        
         if eval_req_id:
             if failed_count == 0 and success_count > 0:
                 status = "completed"
@@ -324,25 +761,250 @@ def process_batch_frames(batch_id: str, frame_ids: List[str], force: bool = Fals
                 "status": status,
                 "updatedAt": datetime.utcnow()
             })
+            progress_store.set_status(batch_id, status=status)
     except Exception as e:
         print(f"Warning: Failed to update evaluationRequest status: {e}")
     
-    return {
-        "batch_id": batch_id,
-        "processed_count": processed_count,
-        "success_count": success_count,
-        "failed_count": failed_count
-    }
+    batch_lock.release(batch_id, job_id)
 
 
-@celery_app.task(name="evaluate_batch")
-def evaluate_batch(batch_id: str):
+def _prefetch_frame_docs(frame_ids: List[str]) -> Dict[str, Tuple[str, bool, str]]:
+    """
+    Read frame documents in bulk (db.get_all, field-masked) instead of one
+    get() per frame
+    
+    Only frameURL, detectionResults.inferenceTimestamp and
+    evaluationResult.maturity are fetched, so stored detections are not
+    downloaded just to check that they exist.
+    
+    Returns:
+        {frame_id: (local path, needs_processing, stored maturity or None)};
+        frames whose document does not exist are left out
+    """
+    frames_ref = db.collection("frames")
+    frame_info: Dict[str, Tuple[str, bool, str]] = {}
+    
+    chunk_size = max(1, settings.FIRESTORE_READ_BATCH_SIZE)
+    for start in range(0, len(frame_ids), chunk_size):
+        refs = [frames_ref.document(frame_id) for frame_id in frame_ids[start:start + chunk_size]]
+        field_paths = ["frameURL", "detectionResults.inferenceTimestamp", "evaluationResult.maturity"]
+        for snapshot in db.get_all(refs, field_paths=field_paths):
+            if not snapshot.exists:
+                continue
+            frame_data = snapshot.to_dict() or {}
+            frame_info[snapshot.id] = (
+                _frame_url_to_path(frame_data.get("frameURL", "")),
+                "detectionResults" not in frame_data,
+                (frame_data.get("evaluationResult") or {}).get("maturity"),
+            )
+    return frame_info
+
+
+def _scan_batch_maturities(batch_id: str) -> Dict[str, int]:
+    """Count MII/MI over every frame of the batch (fallback when no job counts are available)"""
+    frames = db.collection("frames").where("batchId", "==", batch_id).stream()
+    return _count_maturities(
+        ((frame.to_dict() or {}).get("evaluationResult") or {}).get("maturity") for frame in frames
+    )
+
+
+def _write_batch_summary(
+    batch_id: str,
+    maturity_counts: Dict[str, int] = None,
+    maturity_delta: Dict[str, int] = None
+):
+    """
+    Write the eggRecord counts and the batch's suggested eligibility together
+    in one Firestore transaction
+    
+    Eligibility: donor needs MII >= 70% of frames, recipient MI >= 90%.
+    
+    Args:
+        batch_id: Batch ID
+        maturity_counts: {"MII", "MI", "total"} to store
+        maturity_delta: Instead of maturity_counts, {"MII", "MI"} changes to
+            the existing eggRecord's counts, read inside the transaction;
+            without an eggRecord the batch is scanned
+    """
+    batch_ref = db.collection("retrievalBatches").document(batch_id)
+    batch_doc = batch_ref.get()
+    batch_data = batch_doc.to_dict() if batch_doc.exists else {}
+    patient_id = batch_data.get("patientId")
+    
+    if not patient_id:
+        print(f"Warning: No patientId found for batch {batch_id}")
+        return
+    
+    patient_doc = db.collection("patients").document(patient_id).get()
+    patient_role = None
+    if patient_doc.exists:
+        patient_role = patient_doc.to_dict().get("role")
+    
+    @firestore.transactional
+    def write_summary(transaction):
+        records_query = db.collection("eggRecords").where("batchId", "==", batch_id).limit(1)
+        existing_records = list(transaction.get(records_query))
+        
+        counts = maturity_counts
+        if maturity_delta is not None:
+            if existing_records:
+                record_data = existing_records[0].to_dict() or {}
+                counts = {
+                    "MII": record_data.get("miiEggs", 0) + maturity_delta.get("MII", 0),
+                    "MI": record_data.get("miEggs", 0) + maturity_delta.get("MI", 0),
+                    "total": record_data.get("total", 0),
+                }
+            else:
+                counts = _scan_batch_maturities(batch_id)
+        
+        mii_count = counts.get("MII", 0)
+        mi_count = counts.get("MI", 0)
+        total_frames = counts.get("total", 0)
+        if total_frames <= 0:
+            return None, False
+        
+        eligibility_percentage = None
+        suggested_eligibility = None
+        if patient_role == "donor":
+            eligibility_percentage = (mii_count / total_frames) * 100
+            suggested_eligibility = "eligible" if eligibility_percentage >= 70 else "notEligible"
+        elif patient_role == "recipient":
+            eligibility_percentage = (mi_count / total_frames) * 100
+            suggested_eligibility = "eligible" if eligibility_percentage >= 90 else "notEligible"
+        
+        if suggested_eligibility:
+            transaction.update(batch_ref, {
+                "suggestedEligibility": suggested_eligibility,
+                "eligibilityPercentage": eligibility_percentage,
+                "eligibilityStatus": "pending"
+            })
+        
+        if existing_records:
+            update_data = {
+                "miiEggs": mii_count,
+                "miEggs": mi_count,
+                "total": total_frames,
+                "eligibilityStatus": "pending",
+                "updatedAt": datetime.utcnow()
+            }
+            if suggested_eligibility:
+                update_data["suggestedEligibility"] = suggested_eligibility
+            transaction.update(existing_records[0].reference, update_data)
+            return existing_records[0].id, False
+        
+        # Same document shape as egg_record_service.create_egg_record
+        from app.schemas.egg_record_schema import EggRecordCreate
+        record = EggRecordCreate(
+            patientId=patient_id,
+            batchId=batch_id,
+            miiEggs=mii_count,
+            miEggs=mi_count,
+            total=total_frames,
+            suggestedEligibility=suggested_eligibility,
+            eligibilityStatus="pending"
+        )
+        record_ref = db.collection("eggRecords").document()
+        transaction.set(record_ref, {
+            **record.dict(),
+            "createdAt": datetime.utcnow(),
+            "updatedAt": datetime.utcnow()
+        })
+        return record_ref.id, True
+    
+    record_id, created = write_summary(db.transaction())
+    if record_id is None:
+        return
+    print(f"{'Created' if created else 'Updated'} eggRecord {record_id} for batch {batch_id}")
+
+
+def _chunk_frame_ids(frame_ids: List[str]) -> List[List[str]]:
+    """
+    Split frame IDs into at most INFERENCE_MAX_WORKERS contiguous chunks
+    (never smaller than one inference batch, so tiny batches stay in one task)
+    """
+    workers = max(1, settings.INFERENCE_MAX_WORKERS)
+    chunk_size = max(settings.INFERENCE_BATCH_SIZE, -(-len(frame_ids) // workers))
+    return [frame_ids[i:i + chunk_size] for i in range(0, len(frame_ids), chunk_size)]
+
+
+def _dispatch_batch_frames(
+    batch_id: str,
+    frame_ids: List[str],
+    force: bool,
+    model_version: str = None,
+    frame_paths: Dict[str, str] = None,
+    prior_counts: Dict[str, int] = None,
+    job_id: str = None
+):
+    """
+    Fan frames out across workers
+    
+    A single chunk runs as one process_batch_frames task (finalizes itself).
+    Several chunks run as a Celery group; finalize_batch_evaluation runs once
+    as the chord callback after every chunk has finished. If a task raises
+    instead, fail_batch_evaluation marks the batch failed and releases the
+    lock (the chord callback would never run). Up to
+    INTERACTIVE_MAX_FRAMES frames go to the interactive queue, larger jobs
+    to the bulk queue.
+    
+    Args:
+        frame_paths: {frame_id: local path} known from the caller's frame scan;
+            each chunk only receives the paths of its own frames
+        prior_counts: Maturity counts of the batch frames that are not dispatched
+        job_id: Task id of the job holding the batch lock (passed to every task)
+    
+    Returns:
+        AsyncResult of the task/chord
+    """
+    frame_paths = frame_paths or {}
+    if len(frame_ids) <= settings.INTERACTIVE_MAX_FRAMES:
+        queue = settings.CELERY_INTERACTIVE_QUEUE
+    else:
+        queue = settings.CELERY_BULK_QUEUE
+    
+    on_error = fail_batch_evaluation.s(batch_id, job_id=job_id)
+    chunks = _chunk_frame_ids(frame_ids)
+    if len(chunks) <= 1:
+        return process_batch_frames.apply_async(
+            args=[batch_id, frame_ids],
+            kwargs={
+                "force": force,
+                "model_version": model_version,
+                "frame_paths": {
+                    frame_id: frame_paths[frame_id] for frame_id in frame_ids if frame_id in frame_paths
+                },
+                "prior_counts": prior_counts,
+                "job_id": job_id,
+            },
+            queue=queue,
+            link_error=on_error
+        )
+    
+    header = group(
+        process_batch_frames.s(
+            batch_id, chunk, force=force, finalize=False, model_version=model_version,
+            frame_paths={frame_id: frame_paths[frame_id] for frame_id in chunk if frame_id in frame_paths},
+            job_id=job_id
+        ).set(queue=queue)
+        for chunk in chunks
+    )
+    callback = finalize_batch_evaluation.s(batch_id, prior_counts=prior_counts, job_id=job_id)
+    # A failing chunk fails the chord, which calls the callback's errbacks
+    return chord(header)(callback.set(queue=queue).on_error(on_error))
+
+
+@celery_app.task(bind=True, name="evaluate_batch")
+def evaluate_batch(self, batch_id: str, model_version: str = None):
     """
     Evaluate entire batch: process all frames and generate summary
     Only processes frames that don't have detectionResults yet
     
+    This task's id is the job id: it holds the batch lock until the batch
+    is finalized. If another job holds the batch, nothing is done.
+    
     Args:
         batch_id: Batch ID
+        model_version: Registered model version (default: settings.MODEL_VERSION)
         
     Returns:
         {
@@ -351,6 +1013,16 @@ def evaluate_batch(batch_id: str):
             "total_frames": int
         }
     """
+    job_id = self.request.id
+    if not batch_lock.refresh(batch_id, job_id):
+        return {
+            "batch_id": batch_id,
+            "frames_to_process": 0,
+            "total_frames": 0,
+            "running_job": batch_lock.get_holder(batch_id)
+        }
+    
+    eval_req_id = None
     try:
         # Get all frames for batch
         frames_ref = db.collection("frames")
@@ -358,6 +1030,9 @@ def evaluate_batch(batch_id: str):
         
         frame_list = []
         frame_ids = []
+        frame_paths = {}
+        # Maturities of frames that are already processed (not dispatched)
+        prior_maturities = []
         
         for frame in frames:
             frame_data = frame.to_dict()
@@ -366,6 +1041,9 @@ def evaluate_batch(batch_id: str):
             # Check if frame needs processing (only if no detectionResults)
             if "detectionResults" not in frame_data:
                 frame_ids.append(frame_id)
+                frame_paths[frame_id] = _frame_url_to_path(frame_data.get("frameURL", ""))
+            else:
+                prior_maturities.append((frame_data.get("evaluationResult") or {}).get("maturity"))
             
             # Determine status from evaluationResult
             status = "pending"
@@ -380,7 +1058,7 @@ def evaluate_batch(batch_id: str):
                 "status": status
             })
         
-        # Update evaluation request with frame list
+        # Write per-frame statuses of this run (evaluationRequests/{id}/frames)
         eval_req = db.collection("evaluationRequests").where("batchId", "==", batch_id).limit(1).stream()
         eval_req_id = None
         for req in eval_req:
@@ -388,8 +1066,9 @@ def evaluate_batch(batch_id: str):
             break
         
         if eval_req_id:
+            reset_frame_statuses(eval_req_id, frame_list)
+            progress_store.start_run(batch_id, eval_req_id, frame_list)
             db.collection("evaluationRequests").document(eval_req_id).update({
-                "frameList": frame_list,
                 "status": "processing",
                 "updatedAt": datetime.utcnow()
             })
@@ -405,7 +1084,10 @@ def evaluate_batch(batch_id: str):
         
         # Process frames that need inference
         if frame_ids:
-            process_batch_frames.delay(batch_id, frame_ids, force=False)
+            _dispatch_batch_frames(
+                batch_id, frame_ids, force=False, model_version=model_version, frame_paths=frame_paths,
+                prior_counts=_count_maturities(prior_maturities), job_id=job_id
+            )
         elif len(frame_list) > 0:
             # All frames already processed, mark as completed
             try:
@@ -418,9 +1100,14 @@ def evaluate_batch(batch_id: str):
                         "status": "completed",
                         "updatedAt": datetime.utcnow()
                     })
+                progress_store.set_status(batch_id, status="completed", batch_status="completed")
             except Exception as e:
                 print(f"Warning: Failed to update batch status: {e}")
         
+        if not frame_ids:
+            # Nothing dispatched, so no task will finalize (and release) the batch
+            batch_lock.release(batch_id, job_id)
+        
         return {
             "batch_id": batch_id,
             "frames_to_process": len(frame_ids),
@@ -435,16 +1122,21 @@ def evaluate_batch(batch_id: str):
                 "errorLog": str(e),
                 "updatedAt": datetime.utcnow()
             })
+        progress_store.set_status(batch_id, status="failed")
+        batch_lock.release(batch_id, job_id)
         raise
 
 
-@celery_app.task(name="re_evaluate_batch")
-def re_evaluate_batch(batch_id: str):
+@celery_app.task(bind=True, name="re_evaluate_batch")
+def re_evaluate_batch(self, batch_id: str, model_version: str = None):
     """
     Re-evaluate entire batch: process ALL frames and overwrite existing results
     
+    Locked like evaluate_batch (this task's id is the job id).
+    
     Args:
         batch_id: Batch ID
+        model_version: Registered model version (default: settings.MODEL_VERSION)
         
     Returns:
         {
@@ -453,6 +1145,16 @@ def re_evaluate_batch(batch_id: str):
             "total_frames": int
         }
     """
+    job_id = self.request.id
+    if not batch_lock.refresh(batch_id, job_id):
+        return {
+            "batch_id": batch_id,
+            "frames_to_process": 0,
+            "total_frames": 0,
+            "running_job": batch_lock.get_holder(batch_id)
+        }
+    
+    eval_req_id = None
     try:
         # Get all frames for batch
         frames_ref = db.collection("frames")
@@ -460,6 +1162,7 @@ def re_evaluate_batch(batch_id: str):
         
         frame_list = []
         frame_ids = []
+        frame_paths = {}
         
         for frame in frames:
             frame_data = frame.to_dict()
@@ -467,6 +1170,7 @@ def re_evaluate_batch(batch_id: str):
             
             # Re-process ALL frames (force=True)
             frame_ids.append(frame_id)
+            frame_paths[frame_id] = _frame_url_to_path(frame_data.get("frameURL", ""))
             
             frame_list.append({
                 "frameId": frame_id,
@@ -474,7 +1178,7 @@ def re_evaluate_batch(batch_id: str):
                 "status": "pending"  # Status for evaluation request tracking
             })
         
-        # Update evaluation request with frame list
+        # Write per-frame statuses of this run (evaluationRequests/{id}/frames)
         eval_req = db.collection("evaluationRequests").where("batchId", "==", batch_id).limit(1).stream()
         eval_req_id = None
         for req in eval_req:
@@ -482,15 +1186,21 @@ def re_evaluate_batch(batch_id: str):
             break
         
         if eval_req_id:
+            reset_frame_statuses(eval_req_id, frame_list)
+            progress_store.start_run(batch_id, eval_req_id, frame_list)
             db.collection("evaluationRequests").document(eval_req_id).update({
-                "frameList": frame_list,
                 "status": "processing",
                 "updatedAt": datetime.utcnow()
             })
         
         # Process ALL frames with force=True to overwrite
         if frame_ids:
-            process_batch_frames.delay(batch_id, frame_ids, force=True)
+            _dispatch_batch_frames(
+                batch_id, frame_ids, force=True, model_version=model_version, frame_paths=frame_paths,
+                job_id=job_id
+            )
+        else:
+            batch_lock.release(batch_id, job_id)
         
         return {
             "batch_id": batch_id,
@@ -507,6 +1217,8 @@ def re_evaluate_batch(batch_id: str):
                 "errorLog": str(e),
                 "updatedAt": datetime.utcnow()
             })
+        progress_store.set_status(batch_id, status="failed")
+        batch_lock.release(batch_id, job_id)
         raise
 
 
@@ -525,9 +1237,11 @@ def get_frame_path(frame_id: str) -> str:
         raise ValueError(f"Frame {frame_id} not found")
     
     frame_data = frame_doc.to_dict()
-    frame_url = frame_data.get("frameURL", "")
-    
-    # Convert storage path to local path if needed
+    return _frame_url_to_path(frame_data.get("frameURL", ""))
+
+
+def _frame_url_to_path(frame_url: str) -> str:
+    """Convert a stored frameURL ("storage/...") to a local file path"""
     if frame_url.startswith("storage/"):
         return os.path.join(settings.LOCAL_STORAGE_DIR, frame_url.replace("storage/", ""))
     
@@ -0,0 +1,12 @@
+# benchmarks/__init__.py
+#
+# Inference throughput benchmarks (run from the BE directory):
+#
+#   python -m benchmarks --frames 200                 # stub predictor
+#   python -m benchmarks --frames 200 --model real    # registered model (MODEL_*)
+#   python -m benchmarks --scenarios process_batch_frames --output after.json
+#
+# Firestore is replaced by an in-memory stand-in (benchmarks.fake_firestore),
+# Redis progress, the batch lock and the inference cache are off, and the
+# frames are copies of templates/normal.jpg and abnormal.jpg. Each scenario
+# reports frames/s, p50/p95 per stage and peak RSS, written as JSON.
@@ -0,0 +1,85 @@
+# benchmarks/__main__.py
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from benchmarks import runner
+
+SCENARIOS = ("run_inference", "create_evaluation_result", "process_batch_frames")
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Inference throughput benchmarks")
+    parser.add_argument("--frames", type=int, default=64, help="Frames per scenario (templates replicated)")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--model", choices=("stub", "real"), default="stub",
+                        help="stub: deterministic predictor; real: the registered default model")
+    parser.add_argument("--forward-ms", type=float, default=0.0, help="Simulated model time per image (stub only)")
+    parser.add_argument("--batch-size", type=int, default=None, help="INFERENCE_BATCH_SIZE override")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON report path")
+    return parser.parse_args()
+
+
+def main():
+    args = _parse_args()
+    settings = runner.configure(args)
+
+    from benchmarks import scenarios
+
+    report = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "model": args.model,
+            "backend": None,
+            "modelVersion": None,
+            "frames": args.frames,
+            "forwardMs": args.forward_ms if args.model == "stub" else None,
+            "batchSize": settings.INFERENCE_BATCH_SIZE,
+            "batchWindow": settings.INFERENCE_BATCH_WINDOW,
+            "decodeThreads": settings.INFERENCE_DECODE_THREADS,
+            "cascade": settings.INFERENCE_CASCADE_ENABLED,
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "scenarios": {},
+    }
+
+    with tempfile.TemporaryDirectory(prefix="bench-frames-") as directory:
+        paths = scenarios.prepare_frames(args.frames, directory)
+
+        # One spawned process per scenario: ru_maxrss never goes down, so
+        # in a shared process every scenario would report the largest peak so far
+        context = multiprocessing.get_context("spawn")
+        for name in args.scenarios:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                result = executor.submit(runner.run_scenario, name, args, paths).result()
+
+            backend = result.pop("backend")
+            report["meta"]["backend"] = backend["name"]
+            report["meta"]["modelVersion"] = backend["modelVersion"]
+            report["scenarios"][name] = result
+            _print_scenario(name, result)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"\nWrote {args.output}")
+
+
+def _print_scenario(name: str, result: dict):
+    print(f"\n{name}: {result['frames']} frames in {result['elapsed_s']}s "
+          f"= {result['frames_per_s']} frames/s, peak RSS {result['peak_rss_mb']} MB "
+          f"({result['setup_rss_mb']} MB before the scenario)")
+    for stage, stats in result["stages"].items():
+        print(f"  {stage:<16} n={stats['count']:<6} p50={stats['p50_ms']:>9.3f}ms "
+              f"p95={stats['p95_ms']:>9.3f}ms total={stats['total_s']}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+# benchmarks/fake_firestore.py
+#
+# In-memory stand-in for the Firestore client, covering what the inference
+# tasks use: documents and subcollections, where / order_by / start_after /
+# limit / select queries, get_all with field paths, WriteBatch, transactions,
+# Increment and DELETE_FIELD.
+#
+# install() must run before anything imports app.core.firebase (i.e. before
+# app.tasks.*), so the tasks bind this db instead of a real client.
+
+import copy
+import sys
+import types
+import uuid
+from typing import Dict, Iterator, List, Optional
+
+_MISSING = object()
+
+
+def _get_field(data: Dict, field_path: str):
+    value = data
+    for part in field_path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _apply_update(data: Dict, updates: Dict) -> Dict:
+    """Apply update() semantics: dotted paths, Increment, DELETE_FIELD"""
+    from firebase_admin import firestore
+
+    for field_path, value in updates.items():
+        parts = field_path.split(".")
+        parent = data
+        for part in parts[:-1]:
+            if not isinstance(parent.get(part), dict):
+                parent[part] = {}
+            parent = parent[part]
+        key = parts[-1]
+
+        if value is firestore.DELETE_FIELD:
+            parent.pop(key, None)
+        elif isinstance(value, firestore.Increment):
+            parent[key] = (parent.get(key) or 0) + value.value
+        else:
+            parent[key] = copy.deepcopy(value)
+    return data
+
+
+def _project(data: Dict, field_paths: Optional[List[str]]) -> Dict:
+    if field_paths is None:
+        return copy.deepcopy(data)
+    projected: Dict = {}
+    for field_path in field_paths:
+        value = _get_field(data, field_path)
+        if value is not _MISSING:
+            _apply_update(projected, {field_path: value})
+    return projected
+
+
+class FakeDocumentSnapshot:
+    def __init__(self, reference: "FakeDocumentReference", data: Optional[Dict]):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self) -> Optional[Dict]:
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field_path: str):
+        value = _get_field(self._data or {}, field_path)
+        return None if value is _MISSING else value
+
+
+class FakeDocumentReference:
+    def __init__(self, client: "FakeFirestore", collection_path: str, doc_id: str):
+        self._client = client
+        self._collection_path = collection_path
+        self.id = doc_id
+        self.path = f"{collection_path}/{doc_id}"
+
+    def _store(self) -> Dict[str, Dict]:
+        return self._client._collections.setdefault(self._collection_path, {})
+
+    def collection(self, name: str) -> "FakeCollectionReference":
+        return FakeCollectionReference(self._client, f"{self.path}/{name}")
+
+    def get(self, field_paths: Optional[List[str]] = None, transaction=None) -> FakeDocumentSnapshot:
+        self._client.reads += 1
+        data = self._store().get(self.id)
+        return FakeDocumentSnapshot(self, None if data is None else _project(data, field_paths))
+
+    def set(self, data: Dict, merge: bool = False):
+        self._client.writes += 1
+        current = self._store().get(self.id, {}) if merge else {}
+        self._store()[self.id] = _apply_update(copy.deepcopy(current), data)
+
+    def update(self, data: Dict):
+        if self.id not in self._store():
+            raise KeyError(f"No document to update: {self.path}")
+        self._client.writes += 1
+        _apply_update(self._store()[self.id], data)
+
+    def delete(self):
+        self._client.writes += 1
+        self._store().pop(self.id, None)
+
+
+class FakeQuery:
+    def __init__(self, client: "FakeFirestore", collection_path: str):
+        self._client = client
+        self._collection_path = collection_path
+        self._filters = []
+        self._order = []
+        self._start_after = None
+        self._limit = None
+        self._fields = None
+
+    def _copy(self) -> "FakeQuery":
+        query = FakeQuery(self._client, self._collection_path)
+        query._filters = list(self._filters)
+        query._order = list(self._order)
+        query._start_after = self._start_after
+        query._limit = self._limit
+        query._fields = self._fields
+        return query
+
+    def where(self, field_path: str, op: str, value) -> "FakeQuery":
+        query = self._copy()
+        query._filters.append((field_path, op, value))
+        return query
+
+    def order_by(self, field_path: str, direction: str = "ASCENDING") -> "FakeQuery":
+        query = self._copy()
+        query._order.append((field_path, direction == "DESCENDING"))
+        return query
+
+    def start_after(self, values) -> "FakeQuery":
+        query = self._copy()
+        query._start_after = values.to_dict() if isinstance(values, FakeDocumentSnapshot) else values
+        return query
+
+    def limit(self, count: int) -> "FakeQuery":
+        query = self._copy()
+        query._limit = count
+        return query
+
+    def select(self, field_paths: List[str]) -> "FakeQuery":
+        query = self._copy()
+        query._fields = list(field_paths)
+        return query
+
+    def _matches(self, data: Dict) -> bool:
+        for field_path, op, value in self._filters:
+            actual = _get_field(data, field_path)
+            if actual is _MISSING:
+                return False
+            if op == "==" and not actual == value:
+                return False
+            if op == "!=" and not actual != value:
+                return False
+            if op == "in" and actual not in value:
+                return False
+            if op == "<" and not actual < value:
+                return False
+            if op == "<=" and not actual <= value:
+                return False
+            if op == ">" and not actual > value:
+                return False
+            if op == ">=" and not actual >= value:
+                return False
+        return True
+
+    def stream(self, transaction=None) -> Iterator[FakeDocumentSnapshot]:
+        documents = self._client._collections.get(self._collection_path, {})
+        matched = [(doc_id, data) for doc_id, data in documents.items() if self._matches(data)]
+
+        for field_path, descending in reversed(self._order):
+            matched = [item for item in matched if _get_field(item[1], field_path) is not _MISSING]
+            matched.sort(key=lambda item: _get_field(item[1], field_path), reverse=descending)
+
+        if self._start_after is not None and self._order:
+            field_path, descending = self._order[0]
+            cursor = _get_field(self._start_after, field_path)
+            matched = [
+                item for item in matched
+                if (_get_field(item[1], field_path) < cursor if descending else _get_field(item[1], field_path) > cursor)
+            ]
+
+        if self._limit is not None:
+            matched = matched[:self._limit]
+
+        for doc_id, data in matched:
+            self._client.reads += 1
+            reference = FakeDocumentReference(self._client, self._collection_path, doc_id)
+            yield FakeDocumentSnapshot(reference, _project(data, self._fields))
+
+    def get(self, transaction=None) -> List[FakeDocumentSnapshot]:
+        return list(self.stream())
+
+
+class FakeCollectionReference(FakeQuery):
+    def __init__(self, client: "FakeFirestore", collection_path: str):
+        super().__init__(client, collection_path)
+        self.id = collection_path.rsplit("/", 1)[-1]
+
+    def document(self, doc_id: Optional[str] = None) -> FakeDocumentReference:
+        return FakeDocumentReference(self._client, self._collection_path, doc_id or uuid.uuid4().hex[:20])
+
+    def add(self, data: Dict):
+        reference = self.document()
+        reference.set(data)
+        return None, reference
+
+
+class FakeWriteBatch:
+    def __init__(self, client: "FakeFirestore"):
+        self._client = client
+        self._ops = []
+
+    def set(self, reference: FakeDocumentReference, data: Dict, merge: bool = False):
+        self._ops.append(lambda: reference.set(data, merge=merge))
+
+    def update(self, reference: FakeDocumentReference, data: Dict):
+        self._ops.append(lambda: reference.update(data))
+
+    def delete(self, reference: FakeDocumentReference):
+        self._ops.append(reference.delete)
+
+    def commit(self):
+        self._client.commits += 1
+        ops, self._ops = self._ops, []
+        for op in ops:
+            op()
+
+
+class FakeTransaction(FakeWriteBatch):
+    """Reads go straight to the store; writes are applied on commit"""
+
+    def get_all(self, references: List[FakeDocumentReference]) -> Iterator[FakeDocumentSnapshot]:
+        return self._client.get_all(references)
+
+    def get(self, ref_or_query):
+        if isinstance(ref_or_query, FakeDocumentReference):
+            return iter([ref_or_query.get()])
+        return ref_or_query.stream()
+
+
+class FakeFirestore:
+    """The `db` object of app.core.firebase, in memory"""
+
+    def __init__(self):
+        # collection path -> {doc_id: data}
+        self._collections: Dict[str, Dict[str, Dict]] = {}
+        self.reads = 0
+        self.writes = 0
+        self.commits = 0
+
+    def collection(self, name: str) -> FakeCollectionReference:
+        return FakeCollectionReference(self, name)
+
+    def get_all(self, references, field_paths: Optional[List[str]] = None, transaction=None):
+        for reference in references:
+            yield reference.get(field_paths=field_paths)
+
+    def batch(self) -> FakeWriteBatch:
+        return FakeWriteBatch(self)
+
+    def transaction(self) -> FakeTransaction:
+        return FakeTransaction(self)
+
+    def stats(self) -> Dict[str, int]:
+        return {"reads": self.reads, "writes": self.writes, "commits": self.commits}
+
+
+def _transactional(func):
+    """firestore.transactional for FakeTransaction: run once, then commit"""
+    def wrapper(transaction, *args, **kwargs):
+        result = func(transaction, *args, **kwargs)
+        transaction.commit()
+        return result
+    return wrapper
+
+
+def install() -> FakeFirestore:
+    """
+    Register a FakeFirestore as app.core.firebase.db
+
+    Also swaps firebase_admin.firestore.transactional for a version that
+    drives FakeTransaction (the real one needs a server-side transaction).
+
+    Raises:
+        RuntimeError: If the tasks were already imported with the real client
+    """
+    if "app.tasks.inference_tasks" in sys.modules:
+        raise RuntimeError("install() must run before app.tasks.inference_tasks is imported")
+
+    db = FakeFirestore()
+    module = types.ModuleType("app.core.firebase")
+    module.db = db
+    sys.modules["app.core.firebase"] = module
+
+    from firebase_admin import firestore
+    firestore.transactional = _transactional
+    return db
@@ -0,0 +1,62 @@
+# benchmarks/runner.py
+#
+# Scenario process entry point. Lives outside benchmarks/__main__ because
+# spawned processes import the function by module name, and the __main__ of
+# a `python -m` package is not importable there.
+
+import os
+
+
+def configure(args):
+    """Settings overrides shared by the report and every scenario process"""
+    from app.config import settings
+    settings.INFERENCE_SERVER_URL = ""
+    settings.INFERENCE_CACHE_ENABLED = False  # replicated frames would all be cache hits
+    settings.PROGRESS_STORE_ENABLED = False
+    settings.INFERENCE_TASK_TIME_BUDGET = 10 ** 9  # one task, no continuations
+    if args.batch_size:
+        settings.INFERENCE_BATCH_SIZE = args.batch_size
+    return settings
+
+
+def run_scenario(name: str, args, paths: list) -> dict:
+    """
+    Set up and run one scenario; called in a fresh process per scenario, so
+    the peak RSS (ru_maxrss, a lifetime peak) belongs to this scenario alone
+    """
+    # Before anything imports app.core.firebase
+    from benchmarks.fake_firestore import install
+    db = install()
+    configure(args)
+
+    from app.services.model_service import load_model
+    from benchmarks import scenarios
+    from benchmarks.stages import StageRecorder, peak_rss_mb
+    from benchmarks.stub_backend import register_stub_backend
+
+    if args.model == "stub":
+        backend = register_stub_backend(args.forward_ms)
+    else:
+        backend = load_model(False)
+
+    # Warm-up outside the measurements (lazy init, first-call allocations)
+    import cv2
+    backend.predict(cv2.imread(os.path.join(scenarios.TEMPLATES_DIR, scenarios.TEMPLATE_NAMES[0])))
+    setup_rss_mb = peak_rss_mb()
+
+    recorder = StageRecorder()
+    if name == "run_inference":
+        result = scenarios.run_inference_scenario(paths, recorder, backend)
+    elif name == "create_evaluation_result":
+        result = scenarios.evaluation_scenario(paths, recorder, backend)
+    else:
+        result = scenarios.process_batch_frames_scenario(paths, recorder, backend, db)
+
+    elapsed = result["elapsed_s"]
+    result["frames_per_s"] = round(result["frames"] / elapsed, 2) if elapsed > 0 else None
+    result["stages"] = recorder.summary()
+    # Process peak (imports + model + scenario) and the part of it reached before the scenario ran
+    result["peak_rss_mb"] = peak_rss_mb()
+    result["setup_rss_mb"] = setup_rss_mb
+    result["backend"] = {"name": backend.name, "modelVersion": backend.version}
+    return result
@@ -0,0 +1,140 @@
+# benchmarks/scenarios.py
+#
+# Each scenario returns {"frames": int, "elapsed_s": float} and records its
+# latencies in the given StageRecorder. Import only after
+# fake_firestore.install() (the process_batch_frames scenario imports the tasks).
+
+import os
+import shutil
+import time
+from datetime import datetime
+from typing import Dict, List
+from benchmarks.stages import StageRecorder
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates")
+TEMPLATE_NAMES = ("normal.jpg", "abnormal.jpg")
+
+
+def prepare_frames(count: int, directory: str) -> List[str]:
+    """
+    Copy templates/normal.jpg and abnormal.jpg (alternating) to `count`
+    frame files, so every frame is a real file read
+
+    Returns:
+        Paths of the frame files
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(count):
+        template = TEMPLATE_NAMES[i % len(TEMPLATE_NAMES)]
+        path = os.path.join(directory, f"frame_{i:05d}_{template}")
+        shutil.copyfile(os.path.join(TEMPLATES_DIR, template), path)
+        paths.append(path)
+    return paths
+
+
+def _wrap_inference_stages(recorder: StageRecorder, backend):
+    from app.services import model_service
+    recorder.wrap(model_service, "_load_frame", "read_decode")
+    recorder.wrap(backend, "predict_batch", "forward_batch")
+
+
+def run_inference_scenario(paths: List[str], recorder: StageRecorder, backend) -> Dict:
+    """run_inference() once per frame (single-image path, one forward pass each)"""
+    from app.services.model_service import run_inference
+
+    _wrap_inference_stages(recorder, backend)
+    try:
+        start = time.perf_counter()
+        for path in paths:
+            with recorder.measure("run_inference"):
+                result = run_inference(path)
+            recorder.add_timings(result.get("timings"))
+        elapsed = time.perf_counter() - start
+    finally:
+        recorder.restore()
+    return {"frames": len(paths), "elapsed_s": round(elapsed, 4)}
+
+
+def evaluation_scenario(paths: List[str], recorder: StageRecorder, backend) -> Dict:
+    """create_evaluation_result() once per frame, on detections inferred up front"""
+    from app.services.evaluation_service import create_evaluation_result
+    from app.services.model_service import run_inference
+
+    # Frames are template copies: infer each template once
+    detections = {name: run_inference(os.path.join(TEMPLATES_DIR, name)) for name in TEMPLATE_NAMES}
+
+    start = time.perf_counter()
+    for i in range(len(paths)):
+        with recorder.measure("evaluate"):
+            create_evaluation_result(detections[TEMPLATE_NAMES[i % len(TEMPLATE_NAMES)]])
+    elapsed = time.perf_counter() - start
+    return {"frames": len(paths), "elapsed_s": round(elapsed, 4)}
+
+
+def _seed_batch(db, batch_id: str, paths: List[str]) -> List[str]:
+    """Patient, batch, evaluationRequest and frame documents as after evaluate_batch"""
+    from app.services.evaluation_progress import reset_frame_statuses
+
+    now = datetime.utcnow()
+    db.collection("patients").document("bench-patient").set({"role": "donor"})
+    db.collection("retrievalBatches").document(batch_id).set({
+        "patientId": "bench-patient",
+        "status": "processing",
+        "createdAt": now,
+    })
+    eval_req_ref = db.collection("evaluationRequests").document()
+    eval_req_ref.set({"batchId": batch_id, "status": "processing", "createdAt": now})
+
+    frame_ids = []
+    frame_list = []
+    for i, path in enumerate(paths):
+        frame_id = f"{batch_id}-frame-{i:05d}"
+        db.collection("frames").document(frame_id).set({
+            "batchId": batch_id,
+            "frameURL": path,
+            "createdAt": now,
+        })
+        frame_ids.append(frame_id)
+        frame_list.append({"frameId": frame_id, "frameURL": path, "status": "pending"})
+
+    reset_frame_statuses(eval_req_ref.id, frame_list)
+    return frame_ids
+
+
+def process_batch_frames_scenario(paths: List[str], recorder: StageRecorder, backend, db) -> Dict:
+    """
+    The full process_batch_frames task (run eagerly): bulk frame reads,
+    batched inference, evaluation, buffered frame writes, progress and
+    batch finalization (eggRecord + eligibility)
+    """
+    from app.tasks import inference_tasks
+    from benchmarks.fake_firestore import FakeWriteBatch
+
+    batch_id = f"bench-{int(time.time() * 1000)}"
+    frame_ids = _seed_batch(db, batch_id, paths)
+    db_before = db.stats()
+
+    _wrap_inference_stages(recorder, backend)
+    recorder.wrap(inference_tasks, "create_evaluation_result", "evaluate")
+    recorder.wrap(FakeWriteBatch, "commit", "persist_commit")
+    try:
+        start = time.perf_counter()
+        result = inference_tasks.process_batch_frames.apply(
+            args=[batch_id, frame_ids], kwargs={"force": True}, throw=True
+        ).get()
+        elapsed = time.perf_counter() - start
+    finally:
+        recorder.restore()
+
+    db_after = db.stats()
+    for snapshot in db.collection("frames").where("batchId", "==", batch_id).stream():
+        recorder.add_timings(((snapshot.to_dict() or {}).get("detectionResults") or {}).get("timings"))
+    return {
+        "frames": len(paths),
+        "elapsed_s": round(elapsed, 4),
+        "success_count": result["success_count"],
+        "failed_count": result["failed_count"],
+        "maturity_counts": result["maturity_counts"],
+        "firestore": {key: db_after[key] - db_before[key] for key in db_after},
+    }
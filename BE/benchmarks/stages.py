@@ -0,0 +1,85 @@
+# benchmarks/stages.py
+
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple
+import numpy as np
+
+
+class StageRecorder:
+    """
+    Collect latencies per stage, either explicitly (measure / add) or by
+    temporarily wrapping functions (wrap / restore)
+
+    Usage:
+        recorder = StageRecorder()
+        recorder.wrap(model_service, "_load_frame", "decode")
+        ...
+        recorder.restore()
+        recorder.summary()  # {"decode": {"count", "p50_ms", "p95_ms", ...}}
+    """
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self._patched: List[Tuple[object, str, Callable]] = []
+
+    def add(self, stage: str, seconds: float):
+        self.samples.setdefault(stage, []).append(seconds)
+
+    def add_timings(self, timings_ms: Dict[str, float], prefix: str = "frame."):
+        """Record a detectionResults.timings object ({stage: ms}) as frame.<stage> samples"""
+        for stage, ms in (timings_ms or {}).items():
+            self.add(prefix + stage, ms / 1000)
+
+    @contextmanager
+    def measure(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def wrap(self, owner, attribute: str, stage: str):
+        """Replace owner.attribute with a timed version until restore()"""
+        original = getattr(owner, attribute)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.add(stage, time.perf_counter() - start)
+
+        self._patched.append((owner, attribute, original))
+        setattr(owner, attribute, timed)
+
+    def restore(self):
+        while self._patched:
+            owner, attribute, original = self._patched.pop()
+            setattr(owner, attribute, original)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """{stage: {"count", "total_s", "mean_ms", "p50_ms", "p95_ms", "max_ms"}}"""
+        result = {}
+        for stage, samples in self.samples.items():
+            values = np.array(samples) * 1000
+            result[stage] = {
+                "count": int(values.size),
+                "total_s": round(float(values.sum()) / 1000, 4),
+                "mean_ms": round(float(values.mean()), 3),
+                "p50_ms": round(float(np.percentile(values, 50)), 3),
+                "p95_ms": round(float(np.percentile(values, 95)), 3),
+                "max_ms": round(float(values.max()), 3),
+            }
+        return result
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far (MB)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    if sys.platform == "darwin":
+        return round(peak / (1024 * 1024), 1)
+    return round(peak / 1024, 1)
@@ -0,0 +1,91 @@
+# benchmarks/stub_backend.py
+#
+# Deterministic stand-in for the model, so task and I/O overhead can be
+# measured without weights or a GPU.
+
+import time
+import zlib
+import cv2
+import numpy as np
+from typing import Dict, List, Optional
+from app.config import settings
+from app.core.metrics import StageTimer, time_stage
+from app.services import model_service
+from app.services.detection_codec import encode_detections
+
+# detection_codec.CLASS_NAMES ids
+_CYTOPLASM = 1
+_OOCYTE = 2
+_POLARBODY = 3
+
+
+class StubBackend(model_service.InferenceBackend):
+    """
+    Same interface and preprocessing as the real backends (test-time resize),
+    but the "forward pass" derives detections from a checksum of the image:
+    one oocyte and its cytoplasm always, a polar body for about half of the
+    images. The same image always gives the same result.
+
+    Args:
+        forward_ms: Simulated model time per image (sleep), 0 for none
+    """
+    name = "stub"
+
+    def __init__(self, forward_ms: float = 0.0):
+        super().__init__("stub", with_masks=False)
+        self.forward_ms = forward_ms
+
+    def load(self):
+        return self
+
+    def predict_batch(
+        self,
+        images: List[np.ndarray],
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        timer: Optional[StageTimer] = None
+    ) -> List[Dict]:
+        min_size = min_size or model_service.INPUT_MIN_SIZE_TEST
+        max_size = max_size or model_service.INPUT_MAX_SIZE_TEST
+
+        results = []
+        for image in images:
+            with time_stage(timer, "preprocess"):
+                height, width = image.shape[:2]
+                new_h, new_w = model_service._resize_shape(height, width, min_size, max_size)
+                resized = cv2.resize(image, (new_w, new_h))
+
+            with time_stage(timer, "forward"):
+                seed = zlib.crc32(np.ascontiguousarray(resized[::16, ::16]).tobytes())
+                if self.forward_ms:
+                    time.sleep(self.forward_ms / 1000)
+            rng = np.random.default_rng(seed)
+
+            cx, cy = width / 2, height / 2
+            radius = min(width, height) * rng.uniform(0.25, 0.4)
+            oocyte = [cx - radius, cy - radius, cx + radius, cy + radius]
+            inner = radius * 0.8
+            class_ids = [_OOCYTE, _CYTOPLASM]
+            scores = [rng.uniform(0.9, 0.99), rng.uniform(0.8, 0.95)]
+            boxes = [oocyte, [cx - inner, cy - inner, cx + inner, cy + inner]]
+
+            if seed % 2 == 0:
+                size = radius * 0.15
+                class_ids.append(_POLARBODY)
+                scores.append(rng.uniform(settings.MODEL_SCORE_FLOOR, 0.99))
+                boxes.append([cx + radius - size, cy - size, cx + radius + size, cy + size])
+
+            with time_stage(timer, "postprocess"):
+                results.append(encode_detections(np.array(class_ids), np.array(scores), np.array(boxes)))
+        return results
+
+
+def register_stub_backend(forward_ms: float = 0.0) -> StubBackend:
+    """
+    Put a StubBackend in the model registry as the default model version
+    (box mode), so run_inference / iter_inference_batch / the tasks use it
+    """
+    backend = StubBackend(forward_ms)
+    backend.version = settings.MODEL_VERSION
+    model_service._predictors[(settings.MODEL_VERSION, False)] = backend
+    return backend